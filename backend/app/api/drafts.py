@@ -16,6 +16,7 @@ from backend.app.status import run_status_store
 from inbox_copilot.app.run import load_gmail_config
 from inbox_copilot.config.paths import SECRETS_DIR
 from inbox_copilot.gmail.client import GmailClient
+from inbox_copilot.gmail.fields import MESSAGE_CONTENT_FIELDS
 from inbox_copilot.parsing.parser import extract_body_from_payload
 
 router = APIRouter()
@@ -152,7 +153,7 @@ def _hydrate_source_context(client: GmailClient, data: dict[str, Any]) -> dict[s
         return data
 
     try:
-        msg = client.get_message(message_id, fmt="full")
+        msg = client.get_message(message_id, fmt="full", fields=MESSAGE_CONTENT_FIELDS)
     except Exception:
         return data
 
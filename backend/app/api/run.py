@@ -1,16 +1,35 @@
 # backend/app/api/run.py
+import asyncio
 from pathlib import Path
-from typing import Any
-from fastapi import APIRouter
-from starlette.concurrency import run_in_threadpool
+from typing import Any, Optional
+from fastapi import APIRouter, HTTPException
 
-from inbox_copilot.app.run import run_once
+from inbox_copilot.app.run_async import run_once_async
+from inbox_copilot.storage.run_lock import RunInProgressError
 from backend.app.status import run_status_store
 
 router = APIRouter()
 
+# The run currently executing in this process; concurrent POST /run requests join it.
+_inflight_run: Optional["asyncio.Task[dict]"] = None
+
+
 @router.post("/run")
 async def run_endpoint() -> dict:
+    global _inflight_run
+    coalesced = _inflight_run is not None and not _inflight_run.done()
+    if not coalesced:
+        _inflight_run = asyncio.create_task(_run())
+    try:
+        # Shielded so a disconnecting client does not cancel the run others are waiting on.
+        summary = await asyncio.shield(_inflight_run)
+    except RunInProgressError as exc:
+        # A CLI run in another process holds the lock.
+        raise HTTPException(status_code=409, detail=str(exc)) from exc
+    return {"ok": True, "summary": summary, "coalesced": coalesced}
+
+
+async def _run() -> dict:
     repo_root = Path(__file__).resolve().parents[3]  # adjust if needed
     state_path = repo_root / ".state" / "state.json"
     logs_dir = repo_root / "logs"
@@ -44,9 +63,8 @@ async def run_endpoint() -> dict:
         run_status_store.update(**status_update)
 
     try:
-        # Run blocking Gmail processing in a worker thread so FastAPI stays responsive.
-        summary = await run_in_threadpool(
-            run_once,
+        # Gmail fetches run on the event loop; mails are processed in worker threads.
+        summary = await run_once_async(
             state_path=state_path,
             logs_dir=logs_dir,
             bootstrap_days=60,
@@ -69,7 +87,7 @@ async def run_endpoint() -> dict:
             "errors": summary.get("errors"),
         },
     )
-    return {"ok": True, "summary": summary}
+    return summary
 
 
 @router.get("/run/status")
@@ -0,0 +1,39 @@
+# scripts/apply_plan.py
+from pathlib import Path
+import argparse
+import json
+
+from inbox_copilot.app.apply_plan import apply_plan
+from inbox_copilot.storage.run_lock import RunInProgressError
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Apply an action plan written by `run_once.py --plan` in bulk."
+    )
+    parser.add_argument("plan", type=Path, help="Action plan file to apply.")
+    parser.add_argument(
+        "--quota-units-per-second",
+        type=float,
+        default=250.0,
+        help="Client-side Gmail quota budget (default: 250).",
+    )
+    args = parser.parse_args()
+
+    repo_root = Path(__file__).resolve().parents[1]
+    state_path = repo_root / ".state" / "state.json"
+
+    try:
+        summary = apply_plan(
+            state_path=state_path,
+            plan_path=args.plan,
+            quota_units_per_second=args.quota_units_per_second,
+            verbose=True,
+        )
+    except RunInProgressError as exc:
+        raise SystemExit(f"[apply] {exc}")
+
+    print("[summary]")
+    print(json.dumps(summary, indent=2))
+
+if __name__ == "__main__":
+    main()
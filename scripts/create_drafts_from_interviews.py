@@ -10,8 +10,9 @@ from pathlib import Path
 from dotenv import load_dotenv
 from openai import OpenAI
 
-from inbox_copilot.config.paths import LOGS_DIR, SECRETS_DIR
+from inbox_copilot.config.paths import LOGS_DIR, SECRETS_DIR, STATE_DIR
 from inbox_copilot.gmail.client import GmailClient, GmailClientConfig
+from inbox_copilot.gmail.fields import MESSAGE_CONTENT_FIELDS
 from inbox_copilot.parsing.parser import extract_body_from_payload
 
 SIGNATURE = "Mit freundlichen Grüßen\nFelix Zeiß"
@@ -31,6 +32,8 @@ def load_gmail_config() -> GmailClientConfig:
         credentials_path=cred,
         token_path=token,
         user_id="me",
+        # Same cache as the run pipeline, so source mails are usually not downloaded again.
+        message_cache_path=STATE_DIR / "messages.sqlite3",
     )
 
     if not cfg.credentials_path.exists():
@@ -115,7 +118,7 @@ def hydrate_source_context(client: GmailClient, data: dict) -> dict:
     if not message_id:
         return data
     try:
-        msg = client.get_message(message_id, fmt="full")
+        msg = client.get_message(message_id, fmt="full", fields=MESSAGE_CONTENT_FIELDS)
     except Exception:
         return data
 
@@ -1,22 +1,142 @@
 # scripts/run_once.py
 from pathlib import Path
+import argparse
+import asyncio
 import json
 
 from inbox_copilot.app.run import run_once
+from inbox_copilot.app.run_async import run_once_async
+from inbox_copilot.rules.patterns import RULE_PATTERNS
+from inbox_copilot.storage.run_lock import RunInProgressError
 
 def main() -> None:
+    parser = argparse.ArgumentParser(description="Run a single inbox-copilot processing pass.")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of threads loading message payloads concurrently (default: 1).",
+    )
+    parser.add_argument(
+        "--fetch-mode",
+        choices=("full", "metadata"),
+        default="full",
+        help="'metadata' downloads full payloads only when classification needs the body.",
+    )
+    parser.add_argument(
+        "--batch-modify",
+        action="store_true",
+        help="Apply labels in bulk with batchModify instead of one call per label.",
+    )
+    parser.add_argument(
+        "--quota-units-per-second",
+        type=float,
+        default=250.0,
+        help="Gmail quota budget shared by all workers (Gmail allows 250 units/s per user).",
+    )
+    parser.add_argument(
+        "--stream-window",
+        type=int,
+        default=None,
+        help="Process mails while loading, holding at most N loaded mails in memory.",
+    )
+    parser.add_argument(
+        "--process-workers",
+        type=int,
+        default=1,
+        help="Classify and label this many mails concurrently, in any order (default: 1).",
+    )
+    parser.add_argument(
+        "--checkpoint-every",
+        type=int,
+        default=500,
+        help="Save the state cursor after this many mails (0 disables, default: 500).",
+    )
+    parser.add_argument(
+        "--checkpoint-interval",
+        type=float,
+        default=60.0,
+        help="Also save it at least every N seconds (0 disables, default: 60).",
+    )
+    parser.add_argument(
+        "--plan",
+        type=Path,
+        default=None,
+        metavar="PATH",
+        help="Write the planned actions to PATH instead of applying them "
+        "(apply with scripts/apply_plan.py).",
+    )
+    parser.add_argument(
+        "--reprocess",
+        action="store_true",
+        help="Ignore the processed-message ledger and handle every listed mail again.",
+    )
+    parser.add_argument(
+        "--async",
+        dest="use_async",
+        action="store_true",
+        help="Use the asyncio pipeline (one pooled HTTP connection, many requests in flight).",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=200,
+        help="Maximum in-flight Gmail requests with --async (default: 200).",
+    )
+    parser.add_argument(
+        "--profile-rules",
+        action="store_true",
+        help="Time every rule regex search and report it under rule_patterns.",
+    )
+    args = parser.parse_args()
+    if args.use_async and (args.plan or args.stream_window is not None):
+        parser.error("--plan and --stream-window are not supported with --async")
+    if args.profile_rules:
+        RULE_PATTERNS.set_timed(True)
+
     repo_root = Path(__file__).resolve().parents[1]
     # Persisted state keeps the last processed timestamp across runs.
     state_path = repo_root / ".state" / "state.json"
     # Logs directory for any run artifacts.
     logs_dir = repo_root / "logs"
 
-    summary = run_once(
-        state_path=state_path,
-        logs_dir=logs_dir,
-        bootstrap_days=60,
-        verbose=True,
-    )
+    try:
+        if args.use_async:
+            summary = asyncio.run(
+                run_once_async(
+                    state_path=state_path,
+                    logs_dir=logs_dir,
+                    bootstrap_days=60,
+                    fetch_mode=args.fetch_mode,
+                    batch_modify=args.batch_modify,
+                    concurrency=max(1, args.concurrency),
+                    process_workers=max(1, args.process_workers),
+                    quota_units_per_second=args.quota_units_per_second,
+                    checkpoint_every=args.checkpoint_every or None,
+                    checkpoint_interval_s=args.checkpoint_interval or None,
+                    use_ledger=not args.reprocess,
+                    verbose=True,
+                )
+            )
+        else:
+            summary = run_once(
+                state_path=state_path,
+                logs_dir=logs_dir,
+                bootstrap_days=60,
+                workers=max(1, args.workers),
+                fetch_mode=args.fetch_mode,
+                batch_modify=args.batch_modify,
+                quota_units_per_second=args.quota_units_per_second,
+                stream_window=args.stream_window,
+                process_workers=max(1, args.process_workers),
+                checkpoint_every=args.checkpoint_every or None,
+                checkpoint_interval_s=args.checkpoint_interval or None,
+                plan_path=args.plan,
+                use_ledger=not args.reprocess,
+                verbose=True,
+            )
+    except RunInProgressError as exc:
+        raise SystemExit(f"[run] {exc}")
 
     # Print a machine-readable summary for CLI usage.
     print("[summary]")
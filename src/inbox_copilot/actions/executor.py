@@ -1,17 +1,142 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Dict
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import TYPE_CHECKING, Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple
 
 from inbox_copilot.rules.core import Action, ActionType
 from inbox_copilot.actions.handlers import (
     ActionHandler,
+    ExecutionContext,
     PrintHandler,
     AddLabelHandler,
+    RemoveLabelHandler,
     ArchiveHandler,
     AnalyzeApplicationHandler,
 )
-from inbox_copilot.gmail.client import GmailClient
+from inbox_copilot.gmail.client import MAX_BATCH_MODIFY_IDS, GmailClient
+from inbox_copilot.gmail.label_registry import is_missing_label_error
+from inbox_copilot.pipeline.policy import drop_satisfied_actions
+from inbox_copilot.retry import Retrier
+
+if TYPE_CHECKING:
+    from inbox_copilot.actions.plan import ActionPlanBuilder
+
+# Actions that only change labels and can therefore be merged into batchModify calls.
+BATCHABLE_ACTIONS = frozenset({ActionType.ADD_LABEL, ActionType.REMOVE_LABEL, ActionType.ARCHIVE})
+
+# (label names to add, label names to remove, archive)
+_ModifyKey = Tuple[FrozenSet[str], FrozenSet[str], bool]
+
+
+@dataclass
+class _PendingModify:
+    add: set[str] = field(default_factory=set)
+    remove: set[str] = field(default_factory=set)
+    archive: bool = False
+
+    def key(self) -> _ModifyKey:
+        return frozenset(self.add), frozenset(self.remove), self.archive
+
+
+def _label_ids(
+    client: GmailClient, add_names: Iterable[str], remove_names: Iterable[str], archive: bool
+) -> Tuple[List[str], List[str]]:
+    add_ids = [client.get_or_create_label_id(name) for name in sorted(add_names)]
+    remove_ids = [client.get_or_create_label_id(name) for name in sorted(remove_names)]
+    if archive:
+        remove_ids.append("INBOX")
+    return add_ids, remove_ids
+
+
+@dataclass
+class ModifyBatcher:
+    """
+    Collects label/archive actions and applies them with users.messages.batchModify.
+
+    Messages that end up with the same label changes share one call (up to 1,000 IDs).
+    Failures are reported per message through `on_error` instead of being raised.
+    Thread-safe, so parallel processing workers can share one batcher.
+    """
+
+    # Flush automatically once this many distinct messages are pending.
+    max_pending: int = 5000
+    on_error: Optional[Callable[[str, Exception], None]] = None
+    _pending: Dict[str, _PendingModify] = field(default_factory=dict)
+    _lock: Lock = field(default_factory=Lock, repr=False)
+
+    def add(self, action: Action) -> None:
+        if action.type in (ActionType.ADD_LABEL, ActionType.REMOVE_LABEL) and not action.label_name:
+            raise ValueError(f"{action.type.name} requires label_name")
+
+        with self._lock:
+            pending = self._pending.setdefault(action.message_id, _PendingModify())
+            if action.type == ActionType.ADD_LABEL:
+                pending.add.add(action.label_name)
+                pending.remove.discard(action.label_name)
+            elif action.type == ActionType.REMOVE_LABEL:
+                pending.remove.add(action.label_name)
+                pending.add.discard(action.label_name)
+            elif action.type == ActionType.ARCHIVE:
+                pending.archive = True
+
+    @property
+    def is_full(self) -> bool:
+        return len(self._pending) >= self.max_pending
+
+    def drain(self) -> Dict[_ModifyKey, List[str]]:
+        """Take all pending changes, grouped by label set: (add, remove, archive) -> IDs."""
+        groups: Dict[_ModifyKey, List[str]] = {}
+        with self._lock:
+            for message_id, pending in self._pending.items():
+                groups.setdefault(pending.key(), []).append(message_id)
+            self._pending = {}
+        return groups
+
+    def flush(self, client: GmailClient) -> int:
+        """Apply all pending changes and return the number of batchModify calls made."""
+        groups = self.drain()
+        calls = 0
+        for (add_names, remove_names, archive), message_ids in groups.items():
+            try:
+                add_ids, remove_ids = _label_ids(client, add_names, remove_names, archive)
+            except Exception as exc:
+                self._fail(message_ids, exc)
+                continue
+
+            for start in range(0, len(message_ids), MAX_BATCH_MODIFY_IDS):
+                chunk = message_ids[start:start + MAX_BATCH_MODIFY_IDS]
+                try:
+                    try:
+                        client.batch_modify(
+                            chunk, add_label_ids=add_ids, remove_label_ids=remove_ids
+                        )
+                    except Exception as exc:
+                        # A label deleted in Gmail since the registry was loaded: reload
+                        # it (recreating the label) and retry this chunk once.
+                        if not is_missing_label_error(exc) or not client.refresh_label_ids(
+                            add_names | remove_names
+                        ):
+                            raise
+                        add_ids, remove_ids = _label_ids(client, add_names, remove_names, archive)
+                        client.batch_modify(
+                            chunk, add_label_ids=add_ids, remove_label_ids=remove_ids
+                        )
+                    calls += 1
+                except Exception as exc:
+                    self._fail(chunk, exc)
+                    continue
+                print(
+                    f"[BATCH_MODIFY] messages={len(chunk)} add={sorted(add_names)} "
+                    f"remove={sorted(remove_names)} archive={archive}"
+                )
+        return calls
+
+    def _fail(self, message_ids: List[str], exc: Exception) -> None:
+        print(f"[ERROR] batchModify failed messages={len(message_ids)} err={exc}")
+        if self.on_error:
+            for message_id in message_ids:
+                self.on_error(message_id, exc)
 
 
 @dataclass
@@ -19,8 +144,33 @@ class ActionExecutor:
     handlers: Dict[ActionType, ActionHandler]
     dry_run: bool = False
     continue_on_error: bool = True
+    # When set, label/archive actions are queued and applied in bulk on flush().
+    batcher: Optional[ModifyBatcher] = None
+    # When set, actions are recorded into an action plan instead of being executed.
+    plan: Optional[ActionPlanBuilder] = None
+    # Label/archive actions dropped by drop_satisfied() because nothing would change.
+    skipped_noops: int = 0
+    _lock: Lock = field(default_factory=Lock, repr=False)
+
+    def drop_satisfied(
+        self, client: GmailClient, actions: List[Action], label_ids: Iterable[str]
+    ) -> List[Action]:
+        """
+        Remove actions the mail's current `label_ids` already satisfy (no modify call).
+        `label_ids` must be fresh from Gmail (see drop_satisfied_actions).
+        """
+        planned = drop_satisfied_actions(actions, label_ids, client.cached_label_id)
+        with self._lock:
+            self.skipped_noops += len(actions) - len(planned)
+        return planned
 
-    def run(self, client: GmailClient, actions: list[Action]) -> None:
+    def run(
+        self,
+        client: GmailClient,
+        actions: list[Action],
+        context: Optional[ExecutionContext] = None,
+    ) -> None:
+        """Run `actions`; `context` carries what the caller already knows about the mail."""
         for action in actions:
             handler = self.handlers.get(action.type)
             if not handler:
@@ -28,6 +178,10 @@ class ActionExecutor:
                 print(f"[WARN] No handler registered for action type: {action.type}")
                 continue
 
+            if self.plan is not None:
+                self.plan.add(action)
+                continue
+
             if self.dry_run:
                 # Dry-run mode is useful for testing policies without side effects.
                 print(
@@ -37,7 +191,12 @@ class ActionExecutor:
                 continue
 
             try:
-                handler.handle(client, action)
+                if self.batcher and action.type in BATCHABLE_ACTIONS:
+                    self.batcher.add(action)
+                    if self.batcher.is_full:
+                        self.batcher.flush(client)
+                    continue
+                handler.handle(client, action, context)
             except Exception as exc:
                 print(
                     f"[ERROR] Action failed type={action.type} message_id={action.message_id} "
@@ -46,14 +205,29 @@ class ActionExecutor:
                 if not self.continue_on_error:
                     raise
 
+    def flush(self, client: GmailClient) -> None:
+        """Apply queued label/archive actions (no-op without a batcher)."""
+        if self.batcher:
+            self.batcher.flush(client)
+
 
-def default_executor(*, dry_run: bool = False) -> ActionExecutor:
+def default_executor(
+    *,
+    dry_run: bool = False,
+    batch_modify: bool = False,
+    on_modify_error: Optional[Callable[[str, Exception], None]] = None,
+    retrier: Optional[Retrier] = None,
+    continue_on_error: bool = True,
+) -> ActionExecutor:
     return ActionExecutor(
         handlers={
             ActionType.PRINT: PrintHandler(),
             ActionType.ADD_LABEL: AddLabelHandler(),
+            ActionType.REMOVE_LABEL: RemoveLabelHandler(),
             ActionType.ARCHIVE: ArchiveHandler(),
-            ActionType.ANALYZE_APPLICATION: AnalyzeApplicationHandler(),
+            ActionType.ANALYZE_APPLICATION: AnalyzeApplicationHandler(retrier=retrier),
         },
         dry_run=dry_run,
+        continue_on_error=continue_on_error,
+        batcher=ModifyBatcher(on_error=on_modify_error) if batch_modify else None,
     )
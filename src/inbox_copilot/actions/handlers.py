@@ -1,31 +1,50 @@
 from __future__ import annotations
 
 from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Optional
 import re
 from openai import OpenAI
 import json
 
 from inbox_copilot.rules.core import Action
 from inbox_copilot.gmail.client import GmailClient
+from inbox_copilot.gmail.fields import MESSAGE_CONTENT_FIELDS
+from inbox_copilot.models import NormalizedEmail
 from inbox_copilot.config.paths import LOGS_DIR, SECRETS_DIR
 from inbox_copilot.parsing.parser import extract_body_from_payload
+from inbox_copilot.retry import OPENAI, Retrier
+
+
+@dataclass(frozen=True)
+class ExecutionContext:
+    """What the pipeline already holds for the message the actions belong to."""
+
+    # Parsed mail (headers, snippet, body) so handlers do not have to fetch it again.
+    mail: Optional[NormalizedEmail] = None
 
 
 class ActionHandler(ABC):
     @abstractmethod
-    def handle(self, client: GmailClient, action: Action) -> None:
+    def handle(
+        self, client: GmailClient, action: Action, context: Optional[ExecutionContext] = None
+    ) -> None:
         """Execute one action."""
         ...
 
 
 class PrintHandler(ActionHandler):
-    def handle(self, client: GmailClient, action: Action) -> None:
+    def handle(
+        self, client: GmailClient, action: Action, context: Optional[ExecutionContext] = None
+    ) -> None:
         # English output messages (per your preference)
         print(f"[PRINT] message_id={action.message_id} reason={action.reason}")
 
 
 class AddLabelHandler(ActionHandler):
-    def handle(self, client: GmailClient, action: Action) -> None:
+    def handle(
+        self, client: GmailClient, action: Action, context: Optional[ExecutionContext] = None
+    ) -> None:
         if not action.label_name:
             raise ValueError("ADD_LABEL requires label_name")
 
@@ -38,15 +57,35 @@ class AddLabelHandler(ActionHandler):
         print(f"[LABEL] message_id={action.message_id} label={action.label_name} reason={action.reason}")
 
 
+class RemoveLabelHandler(ActionHandler):
+    def handle(
+        self, client: GmailClient, action: Action, context: Optional[ExecutionContext] = None
+    ) -> None:
+        if not action.label_name:
+            raise ValueError("REMOVE_LABEL requires label_name")
+
+        client.remove_label(action.message_id, action.label_name)
+        print(f"[UNLABEL] message_id={action.message_id} label={action.label_name} reason={action.reason}")
+
+
 class ArchiveHandler(ActionHandler):
-    def handle(self, client: GmailClient, action: Action) -> None:
+    def handle(
+        self, client: GmailClient, action: Action, context: Optional[ExecutionContext] = None
+    ) -> None:
         client.archive(action.message_id)
         print(f"[ARCHIVE] message_id={action.message_id} reason={action.reason}")
 
 class AnalyzeApplicationHandler(ActionHandler):
-    def __init__(self) -> None:
+    # Message fields this handler reads (partial response instead of the whole resource).
+    message_fields = MESSAGE_CONTENT_FIELDS
+
+    def __init__(self, retrier: Retrier | None = None) -> None:
         api_key = self._load_openai_api_key()
-        self.openai_client = OpenAI(api_key=api_key) if api_key else OpenAI()
+        # Retries are handled by our policy (with metrics), not the SDK's built-in loop.
+        self.openai_client = (
+            OpenAI(api_key=api_key, max_retries=0) if api_key else OpenAI(max_retries=0)
+        )
+        self.retrier = retrier or Retrier()
 
     @staticmethod
     def _load_openai_api_key() -> str | None:
@@ -69,17 +108,25 @@ class AnalyzeApplicationHandler(ActionHandler):
 
         return None
     
-    def handle(self, client: GmailClient, action: Action) -> None:
+    def handle(
+        self, client: GmailClient, action: Action, context: Optional[ExecutionContext] = None
+    ) -> None:
         print(f"[ANALYZE] message_id={action.message_id} reason={action.reason}")
-        # Fetch full body so extraction can consider the whole email.
-        msg = client.get_message(action.message_id, fmt="full")
-        payload = msg.get("payload", {})
-        body_text = extract_body_from_payload(payload)
-
-        headers = {h["name"]: h["value"] for h in msg["payload"].get("headers", [])}
-        subject = headers.get("Subject", "")
-        sender = headers.get("From", "")
-        snippet = msg.get("snippet", "")
+        mail = context.mail if context is not None else None
+        if mail is not None and mail.message_id == action.message_id and mail.has_full_body:
+            # The run already parsed this message; no second download needed.
+            subject, sender = mail.subject, mail.from_email
+            snippet, body_text = mail.snippet, mail.body_text
+        else:
+            # Fetch full body so extraction can consider the whole email.
+            msg = client.get_message(action.message_id, fmt="full", fields=self.message_fields)
+            payload = msg.get("payload", {})
+            body_text = extract_body_from_payload(payload)
+
+            headers = {h["name"]: h["value"] for h in msg["payload"].get("headers", [])}
+            subject = headers.get("Subject", "")
+            sender = headers.get("From", "")
+            snippet = msg.get("snippet", "")
 
         # Use Structured Outputs so parsing is deterministic.
         schema = {
@@ -113,37 +160,41 @@ class AnalyzeApplicationHandler(ActionHandler):
 
 
         # Keep the prompt strict: we only accept JSON for automation.
-        resp = self.openai_client.responses.create(
-            model="gpt-5.2",
-            input=[
-                {
-                    "role": "system",
-                    "content": (
-                        "Return ONLY JSON matching the schema. "
-                        "Extract facts explicitly from the email. "
-                        "Include URLs in important_links. "
-                        "Include response deadlines in deadlines. "
-                        "Do not invent facts. "
-                        "Convert dates to YYYY-MM-DD when possible."
-                    ),
+        def create_response():
+            return self.openai_client.responses.create(
+                model="gpt-5.2",
+                input=[
+                    {
+                        "role": "system",
+                        "content": (
+                            "Return ONLY JSON matching the schema. "
+                            "Extract facts explicitly from the email. "
+                            "Include URLs in important_links. "
+                            "Include response deadlines in deadlines. "
+                            "Do not invent facts. "
+                            "Convert dates to YYYY-MM-DD when possible."
+                        ),
+                    },
+                    {
+                        "role": "user",
+                        "content": (
+                            f"Subject: {subject}\n"
+                            f"From: {sender}\n\n"
+                            f"EMAIL BODY:\n{body_text}"
+                        ),
+                    },
+                ],
+                text={
+                    "format": {
+                        "type": "json_schema",
+                        "name": "application_summary",
+                        "schema": schema,
+                    }
                 },
-                {
-                    "role": "user",
-                    "content": (
-                        f"Subject: {subject}\n"
-                        f"From: {sender}\n\n"
-                        f"EMAIL BODY:\n{body_text}"
-                    ),
-                },
-            ],
-            text={
-                "format": {
-                    "type": "json_schema",
-                    "name": "application_summary",
-                    "schema": schema,
-                }
-            },
-        )
+            )
+
+        # Transient OpenAI failures (429/5xx/timeouts) are retried with backoff.
+        resp = self.retrier.call(OPENAI, create_response)
 
         output_text = getattr(resp, "output_text", None)
         if not output_text:
@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import json
+import math
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, Iterable, List, Optional
+
+from inbox_copilot.actions.executor import BATCHABLE_ACTIONS, ModifyBatcher
+from inbox_copilot.gmail.client import MAX_BATCH_MODIFY_IDS
+from inbox_copilot.gmail.rate_limit import GMAIL_QUOTA_UNITS
+from inbox_copilot.rules.core import Action, ActionType
+from inbox_copilot.storage.state import atomic_write_text
+
+PLAN_FORMAT = 1
+
+
+@dataclass
+class PlanGroup:
+    """Messages that receive exactly the same label changes (one batchModify per 1,000)."""
+
+    add: List[str]
+    remove: List[str]
+    archive: bool
+    message_ids: List[str]
+
+
+@dataclass
+class ActionPlan:
+    """
+    Actions planned by `run_once(plan_path=...)`, ready to be reviewed and applied.
+
+    Label/archive changes are stored grouped by label set, so applying the plan issues
+    the minimum number of batchModify calls. `cursor` is the state cursor the planning
+    run would have committed; applying the plan commits it.
+    """
+
+    rules_version: str
+    groups: List[PlanGroup] = field(default_factory=list)
+    # Actions that cannot be batched (e.g. ANALYZE_APPLICATION), in planning order.
+    other: List[Action] = field(default_factory=list)
+    # Mails classified without error, recorded in the processed ledger once applied.
+    planned_ids: List[str] = field(default_factory=list)
+    cursor: Dict[str, Any] = field(default_factory=dict)
+    created_at: str = field(
+        default_factory=lambda: datetime.now(timezone.utc).isoformat(timespec="seconds")
+    )
+
+    def actions(self) -> List[Action]:
+        """Expand the plan into actions: batchable ones first, largest groups first."""
+        expanded: List[Action] = []
+        for group in sorted(self.groups, key=lambda g: len(g.message_ids), reverse=True):
+            for message_id in group.message_ids:
+                expanded.extend(
+                    Action(type=ActionType.ADD_LABEL, message_id=message_id, label_name=name)
+                    for name in group.add
+                )
+                expanded.extend(
+                    Action(type=ActionType.REMOVE_LABEL, message_id=message_id, label_name=name)
+                    for name in group.remove
+                )
+                if group.archive:
+                    expanded.append(Action(type=ActionType.ARCHIVE, message_id=message_id))
+        return expanded + list(self.other)
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-label counts plus the Gmail calls and quota units applying the plan costs."""
+        labels: Counter[str] = Counter()
+        removed: Counter[str] = Counter()
+        archived = 0
+        batch_calls = 0
+        for group in self.groups:
+            count = len(group.message_ids)
+            labels.update({name: count for name in group.add})
+            removed.update({name: count for name in group.remove})
+            archived += count if group.archive else 0
+            batch_calls += math.ceil(count / MAX_BATCH_MODIFY_IDS)
+        other = Counter(action.type.value for action in self.other)
+        # Without a loaded mail, the analysis handler fetches each message once.
+        api_calls = {
+            "messages.batchModify": batch_calls,
+            "messages.get": other[ActionType.ANALYZE_APPLICATION.value],
+        }
+        return {
+            "messages": sum(len(group.message_ids) for group in self.groups),
+            "add_labels": dict(sorted(labels.items())),
+            "remove_labels": dict(sorted(removed.items())),
+            "archive": archived,
+            "other_actions": dict(sorted(other.items())),
+            "api_calls": api_calls,
+            "quota_units": sum(GMAIL_QUOTA_UNITS[m] * n for m, n in api_calls.items()),
+        }
+
+
+class ActionPlanBuilder:
+    """Collects actions instead of executing them (thread-safe, like ModifyBatcher)."""
+
+    def __init__(self) -> None:
+        self._batcher = ModifyBatcher()
+        self._other: List[Action] = []
+        self._lock = Lock()
+
+    def add(self, action: Action) -> None:
+        if action.type in BATCHABLE_ACTIONS:
+            self._batcher.add(action)
+            return
+        with self._lock:
+            self._other.append(action)
+
+    def build(
+        self,
+        *,
+        rules_version: str,
+        planned_ids: Iterable[str] = (),
+        cursor: Optional[Dict[str, Any]] = None,
+    ) -> ActionPlan:
+        groups = [
+            PlanGroup(
+                add=sorted(add),
+                remove=sorted(remove),
+                archive=archive,
+                message_ids=sorted(message_ids),
+            )
+            for (add, remove, archive), message_ids in self._batcher.drain().items()
+        ]
+        with self._lock:
+            return ActionPlan(
+                rules_version=rules_version,
+                groups=groups,
+                other=list(self._other),
+                planned_ids=sorted(planned_ids),
+                cursor=dict(cursor or {}),
+            )
+
+
+def save_plan(path: Path, plan: ActionPlan) -> None:
+    data = asdict(plan)
+    data["format"] = PLAN_FORMAT
+    data["stats"] = plan.stats()
+    data["other"] = [
+        {
+            "type": action.type.value,
+            "message_id": action.message_id,
+            "label_name": action.label_name,
+            "reason": action.reason,
+        }
+        for action in plan.other
+    ]
+    atomic_write_text(path, json.dumps(data, indent=1))
+
+
+def load_plan(path: Path) -> ActionPlan:
+    data = json.loads(path.read_text(encoding="utf-8"))
+    if data.get("format") != PLAN_FORMAT:
+        raise ValueError(f"Unsupported action plan format in {path}: {data.get('format')!r}")
+    return ActionPlan(
+        rules_version=data["rules_version"],
+        groups=[PlanGroup(**group) for group in data.get("groups", [])],
+        other=[
+            Action(
+                type=ActionType(item["type"]),
+                message_id=item["message_id"],
+                label_name=item.get("label_name"),
+                reason=item.get("reason") or "",
+            )
+            for item in data.get("other", [])
+        ],
+        planned_ids=list(data.get("planned_ids", [])),
+        cursor=dict(data.get("cursor") or {}),
+        created_at=data.get("created_at", ""),
+    )
@@ -0,0 +1,145 @@
+# src/inbox_copilot/app/apply_plan.py
+from __future__ import annotations
+
+import sys
+from dataclasses import asdict, dataclass, field, replace
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from inbox_copilot.actions.executor import BATCHABLE_ACTIONS, ModifyBatcher, default_executor
+from inbox_copilot.actions.plan import load_plan
+from inbox_copilot.app.run import (
+    RunCursor,
+    _with_run_lock,
+    commit_run_state,
+    load_gmail_config,
+)
+from inbox_copilot.gmail.client import GmailClient
+from inbox_copilot.gmail.rate_limit import DEFAULT_UNITS_PER_SECOND
+from inbox_copilot.retry import Retrier
+from inbox_copilot.rules.classification import emitted_labels, rules_version
+from inbox_copilot.rules.core import Action
+from inbox_copilot.storage.ledger import OUTCOME_DONE, OUTCOME_ERROR, ProcessedLedger, ledger_path
+from inbox_copilot.storage.state import load_state
+
+
+@dataclass
+class ApplySummary:
+    messages: int
+    batch_modify_calls: int
+    # Messages with a failed batchModify or other action; the ledger records them as
+    # errors, so the next run retries them.
+    failed: int
+    # Whether the plan's state cursor was committed (see apply_plan).
+    state_committed: bool
+    quota: Dict[str, Any] = field(default_factory=dict)
+    retries: Dict[str, Any] = field(default_factory=dict)
+
+
+@_with_run_lock
+def apply_plan(
+    *,
+    state_path: Path,
+    plan_path: Path,
+    quota_units_per_second: Optional[float] = DEFAULT_UNITS_PER_SECOND,
+    use_ledger: bool = True,
+    verbose: bool = False,
+) -> Dict[str, Any]:
+    """
+    Execute an action plan written by `run_once(plan_path=...)` in bulk.
+
+    All label/archive changes are applied first, grouped by label set into as few
+    batchModify calls as possible (largest groups first); the remaining actions run
+    afterwards, per message, skipping messages whose label changes failed. The planning
+    run's state cursor is committed only if every action succeeded and no other run has
+    moved the cursors since the plan was made.
+
+    Raises:
+        RunInProgressError: Another run (CLI or backend) holds the run lock.
+    """
+    def log(msg: str) -> None:
+        if verbose:
+            print(msg)
+
+    plan = load_plan(plan_path)
+    current_version = rules_version()
+    if plan.rules_version != current_version:
+        log(
+            f"[apply] Plan was made with rules version {plan.rules_version}, "
+            f"current is {current_version}"
+        )
+
+    cfg = replace(load_gmail_config(), quota_units_per_second=quota_units_per_second)
+    retrier = Retrier()
+    client = GmailClient(cfg, retrier=retrier)
+    client.connect()
+    planned_labels = {name for group in plan.groups for name in (*group.add, *group.remove)}
+    client.reconcile_labels((*emitted_labels(), *sorted(planned_labels)))
+
+    failed: set[str] = set()
+    batcher = ModifyBatcher(
+        max_pending=sys.maxsize, on_error=lambda message_id, _exc: failed.add(message_id)
+    )
+    actions = plan.actions()
+    for action in actions:
+        if action.type in BATCHABLE_ACTIONS:
+            batcher.add(action)
+    log(f"[apply] Applying label changes for {plan.stats()['messages']} messages")
+    calls = batcher.flush(client)
+
+    others: Dict[str, List[Action]] = {}
+    for action in actions:
+        if action.type not in BATCHABLE_ACTIONS:
+            others.setdefault(action.message_id, []).append(action)
+    if others:
+        log(f"[apply] Running other actions for {len(others)} messages")
+        # Raise instead of logging, so a failure is attributed to its message.
+        executor = default_executor(retrier=retrier, continue_on_error=False)
+        for message_id, message_actions in others.items():
+            if message_id in failed:
+                continue
+            try:
+                executor.run(client, message_actions)
+            except Exception:
+                failed.add(message_id)
+
+    st = load_state(state_path)
+    cursor = plan.cursor
+    unchanged = (
+        st.last_internal_date_ms == cursor.get("base_internal_date_ms")
+        and st.last_history_id == cursor.get("base_history_id")
+    )
+    committed = unchanged and not failed
+    if committed:
+        commit_run_state(
+            state_path,
+            st,
+            RunCursor(
+                latest_ts=cursor.get("latest_internal_date_ms"),
+                latest_ids_at_ts=set(cursor.get("message_ids_at_latest_ts") or []),
+            ),
+            cursor.get("history_id"),
+        )
+    else:
+        log("[apply] State cursor left unchanged; the next run lists these mails again")
+
+    if use_ledger:
+        ledger = ProcessedLedger(ledger_path(state_path))
+        ledger.record_many(
+            [
+                (message_id, OUTCOME_ERROR if message_id in failed else OUTCOME_DONE)
+                for message_id in plan.planned_ids
+            ],
+            plan.rules_version,
+        )
+        ledger.close()
+
+    summary = ApplySummary(
+        messages=plan.stats()["messages"],
+        batch_modify_calls=calls,
+        failed=len(failed),
+        state_committed=committed,
+        quota=client.quota_usage(),
+        retries=retrier.snapshot(),
+    )
+    return asdict(summary)
@@ -1,21 +1,50 @@
 # src/inbox_copilot/app/run.py
 from __future__ import annotations
 
-from dataclasses import dataclass, asdict
+import bisect
+import functools
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, asdict, field, replace
+from datetime import datetime, timezone
 
 from email.utils import parseaddr
 from pathlib import Path
-from typing import Optional, Dict, Any, List, Tuple, Callable
+from typing import Optional, Dict, Any, Iterable, Iterator, List, Tuple, Callable
 
 from inbox_copilot.actions.executor import ActionExecutor, default_executor
-from inbox_copilot.config.paths import SECRETS_DIR
-from inbox_copilot.gmail.client import GmailClient, GmailClientConfig
+from inbox_copilot.actions.handlers import ExecutionContext
+from inbox_copilot.actions.plan import ActionPlanBuilder, save_plan
+from inbox_copilot.config.paths import SECRETS_DIR, STATE_DIR
+from inbox_copilot.gmail.rate_limit import DEFAULT_UNITS_PER_SECOND
+from inbox_copilot.gmail.client import (
+    MAX_BATCH_SIZE,
+    GmailClient,
+    GmailClientConfig,
+    HistoryExpiredError,
+)
+from inbox_copilot.gmail.fields import MESSAGE_MAIL_FIELDS, MESSAGE_METADATA_FIELDS
 from inbox_copilot.models import NormalizedEmail
 from inbox_copilot.parsing.parser import extract_body_from_payload
 from inbox_copilot.pipeline.orchestrator import analyze_email
 from inbox_copilot.pipeline.policy import actions_from_analysis
-from inbox_copilot.storage.state import load_state, save_state
-from inbox_copilot.rules.core import ActionType
+from inbox_copilot.rules.classification import emitted_labels, needs_body, rules_version
+from inbox_copilot.retry import Retrier
+from inbox_copilot.rules.patterns import RULE_PATTERNS
+from inbox_copilot.storage.ledger import (
+    OUTCOME_DELETED,
+    OUTCOME_DONE,
+    OUTCOME_ERROR,
+    ProcessedLedger,
+    ledger_path,
+)
+from inbox_copilot.storage.run_lock import RunLock, run_lock_path
+from inbox_copilot.storage.state import AppState, load_state, save_state
+from inbox_copilot.rules.core import Action, ActionType
 
 
 @dataclass
@@ -25,6 +54,26 @@ class RunSummary:
     errors: int
     latest_internal_date_ms: Optional[int]
     message_ids_seen: int
+    # How message IDs were listed: "bootstrap", "history" or "query".
+    sync_mode: str
+    # Label/archive actions not sent because the mail's labels already matched.
+    skipped_noop_actions: int = 0
+    # Gmail quota units charged by this run and time spent throttled by the rate limiter.
+    quota: Dict[str, Any] = field(default_factory=dict)
+    # Transient-failure retries (Gmail + OpenAI) and total backoff time.
+    retries: Dict[str, Any] = field(default_factory=dict)
+    # Mid-run state checkpoints: how many, their trigger settings and time spent saving.
+    checkpoints: Dict[str, Any] = field(default_factory=dict)
+    # Gmail connect latency (credential loading and service build), in seconds.
+    connect: Dict[str, Any] = field(default_factory=dict)
+    # Local message cache hits/misses (messages served without a Gmail call).
+    message_cache: Dict[str, Any] = field(default_factory=dict)
+    # Processed-message ledger: listed IDs skipped before fetching, outcomes recorded.
+    ledger: Dict[str, Any] = field(default_factory=dict)
+    # Planning mode only: where the action plan was written and what applying it costs.
+    plan: Dict[str, Any] = field(default_factory=dict)
+    # Rule regex calls/hits during this run (time only with RULE_PATTERNS.set_timed).
+    rule_patterns: Dict[str, Any] = field(default_factory=dict)
 
 
 def load_gmail_config() -> GmailClientConfig:
@@ -40,6 +89,8 @@ def load_gmail_config() -> GmailClientConfig:
         credentials_path=credentials_path,
         token_path=token_path,
         user_id="me",
+        label_registry_path=STATE_DIR / "labels.json",
+        message_cache_path=STATE_DIR / "messages.sqlite3",
     )
 
 
@@ -61,29 +112,157 @@ def _normalized_address(value: str) -> str:
 
 
 def get_message_ids_bootstrap(
-    client: GmailClient, *, bootstrap_days: int, max_results: int
-) -> List[str]:
+    client: GmailClient, *, bootstrap_days: int, max_results: Optional[int] = None
+) -> Iterator[str]:
+    # Lazy: pages are listed only as the caller consumes IDs.
     query = _bootstrap_query(bootstrap_days)
-    return client.list_messages(query=query, max_results=max_results)
+    return client.iter_message_ids(query=query, max_results=max_results)
 
 
 def get_message_ids_since(
-    client: GmailClient, *, last_internal_date_ms: int, max_results: int
-) -> List[str]:
+    client: GmailClient, *, last_internal_date_ms: int, max_results: Optional[int] = None
+) -> Iterator[str]:
     query = _incremental_query(last_internal_date_ms)
-    return client.list_messages(query=query, max_results=max_results)
+    return client.iter_message_ids(query=query, max_results=max_results)
+
+
+def get_message_ids_from_history(client: GmailClient, *, start_history_id: str) -> List[str]:
+    """
+    List messages added since a stored historyId.
+
+    Deltas are small, so the IDs are collected eagerly: an expired cursor then raises
+    HistoryExpiredError here, before any payload has been loaded. No max_results cap:
+    the history cursor advances past the whole delta, so truncating would lose mail.
+    """
+    return list(client.iter_history_message_ids(start_history_id))
+
+
+# Default mid-run checkpoint triggers (see run_once).
+DEFAULT_CHECKPOINT_EVERY = 500
+DEFAULT_CHECKPOINT_INTERVAL_S = 60.0
+
+# Headers requested in the metadata pass of FETCH_METADATA_FIRST.
+METADATA_HEADERS = ("Subject", "From", "Date")
+
+FETCH_FULL = "full"
+FETCH_METADATA_FIRST = "metadata"
+FETCH_MODES = (FETCH_FULL, FETCH_METADATA_FIRST)
+
+
+def needs_full_payload(msg: Dict[str, Any]) -> bool:
+    """
+    Cheap check on a metadata resource: does the outcome depend on the body? Only mails
+    settled by rules that ignore the body (e.g. security alerts) skip the full fetch; a
+    newsletter look-alike may still be a job alert once its body is read.
+    """
+    headers = {h["name"]: h["value"] for h in msg.get("payload", {}).get("headers", [])}
+    return needs_body(subject=headers.get("Subject", ""), from_email=headers.get("From", ""))
+
+
+def _fetch_metadata_first(client: GmailClient, chunk: List[str]) -> List[Any]:
+    # Phase 1: headers + snippet for everything; phase 2: full payload only where needed.
+    results = client.get_messages(
+        chunk,
+        fmt="metadata",
+        metadata_headers=METADATA_HEADERS,
+        fields=MESSAGE_METADATA_FIELDS,
+    )
+    need_full = [
+        index
+        for index, result in enumerate(results)
+        if not isinstance(result, Exception) and needs_full_payload(result)
+    ]
+    if need_full:
+        full = client.get_messages(
+            [chunk[index] for index in need_full], fmt="full", fields=MESSAGE_MAIL_FIELDS
+        )
+        for index, result in zip(need_full, full):
+            results[index] = result
+    return results
+
+
+def _chunked(items: Iterable[str], size: int) -> Iterator[List[str]]:
+    chunk: List[str] = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _fetch_chunk(client: GmailClient, chunk: List[str], fetch_mode: str) -> List[Any]:
+    # A failed batch call marks every message in the chunk as failed.
+    try:
+        if fetch_mode == FETCH_METADATA_FIRST:
+            return _fetch_metadata_first(client, chunk)
+        return client.get_messages(chunk, fmt="full", fields=MESSAGE_MAIL_FIELDS)
+    except Exception as exc:
+        return [exc] * len(chunk)
+
+
+def fetch_message_chunks(
+    client: GmailClient,
+    chunks: Iterable[List[str]],
+    *,
+    workers: int = 1,
+    fetch_mode: str = FETCH_FULL,
+) -> Iterator[Tuple[List[str], List[Any]]]:
+    """
+    Yield (chunk, results) pairs, optionally fetching chunks on a worker pool.
+
+    Each worker thread uses its own forked client because the shared service is not
+    thread-safe. At most 2 * workers chunks are in flight, so ID listing stays lazy.
+    """
+    if workers <= 1:
+        for chunk in chunks:
+            yield chunk, _fetch_chunk(client, chunk, fetch_mode)
+        return
+
+    local = threading.local()
+
+    def fetch(chunk: List[str]) -> List[Any]:
+        worker_client = getattr(local, "client", None)
+        if worker_client is None:
+            worker_client = client.fork()
+            local.client = worker_client
+        return _fetch_chunk(worker_client, chunk, fetch_mode)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="gmail-fetch") as pool:
+        pending: deque[Tuple[List[str], Future]] = deque()
+        for chunk in chunks:
+            pending.append((chunk, pool.submit(fetch, chunk)))
+            if len(pending) >= workers * 2:
+                done_chunk, future = pending.popleft()
+                yield done_chunk, future.result()
+        while pending:
+            done_chunk, future = pending.popleft()
+            yield done_chunk, future.result()
 
 
 def build_mail(client: GmailClient, message_id: str) -> Tuple[NormalizedEmail, Dict[str, str]]:
     # Pull full payload once so we can extract headers + body consistently.
-    msg = client.get_message(message_id, fmt="full")
+    msg = client.get_message(message_id, fmt="full", fields=MESSAGE_MAIL_FIELDS)
+    return mail_from_message(message_id, msg)
+
+
+def mail_from_message(
+    message_id: str, msg: Dict[str, Any]
+) -> Tuple[NormalizedEmail, Dict[str, str]]:
+    """
+    Normalize an already fetched Gmail message resource.
+
+    Metadata-only resources carry no body parts; the snippet then stands in for the body.
+    """
     payload = msg.get("payload", {})
     headers = {h["name"]: h["value"] for h in payload.get("headers", [])}
 
     subject = headers.get("Subject", "")
     from_email = headers.get("From", "")
     snippet = msg.get("snippet", "")
-    body_text = extract_body_from_payload(payload)
+    extracted_body = extract_body_from_payload(payload)
+    body_text = extracted_body or snippet
     internal_date_ms = int(msg.get("internalDate") or 0)
     label_ids = [str(x) for x in (msg.get("labelIds") or [])]
 
@@ -96,19 +275,239 @@ def build_mail(client: GmailClient, message_id: str) -> Tuple[NormalizedEmail, D
         internal_date_ms=internal_date_ms,
         headers=headers,
         label_ids=label_ids,
+        has_full_body=bool(extracted_body),
     )
     return email, headers
 
 
-def process_message(
-    client: GmailClient,
+def behind_cursor(
+    mail: NormalizedEmail, st: AppState, already_processed_at_latest_ts: set[str]
+) -> bool:
+    """True if the state cursor has already moved past `mail`."""
+    if st.last_internal_date_ms is None:
+        return False
+    if mail.internal_date_ms < st.last_internal_date_ms:
+        return True
+    return (
+        mail.internal_date_ms == st.last_internal_date_ms
+        and mail.message_id in already_processed_at_latest_ts
+    )
+
+
+def is_eligible(
     mail: NormalizedEmail,
-    executor: ActionExecutor,
-    report_cb: Optional[Callable[[Dict[str, Any]], None]] = None,
+    st: AppState,
+    already_processed_at_latest_ts: set[str],
+    own_email: str,
+    *,
+    retrying: bool = False,
+) -> bool:
+    """
+    Skip mails at/behind the state cursor, drafts and own-sent messages. Mails being
+    retried (their last outcome in the ledger is an error) are admitted behind the cursor.
+    """
+    if not retrying and behind_cursor(mail, st, already_processed_at_latest_ts):
+        return False
+    if "DRAFT" in {lbl.upper() for lbl in mail.label_ids}:
+        return False
+    from_addr = _normalized_address(mail.from_email)
+    if own_email and from_addr == own_email:
+        return False
+    return True
+
+
+@dataclass
+class RunCursor:
+    """Newest processed timestamp plus the IDs processed at exactly that timestamp."""
+
+    latest_ts: Optional[int] = None
+    latest_ids_at_ts: set[str] = field(default_factory=set)
+
+    def advance(self, mail: NormalizedEmail) -> None:
+        ts = getattr(mail, "internal_date_ms", None)
+        if ts is None:
+            return
+        if self.latest_ts is None or ts > self.latest_ts:
+            self.latest_ts = ts
+            self.latest_ids_at_ts = {mail.message_id}
+        elif ts == self.latest_ts:
+            self.latest_ids_at_ts.add(mail.message_id)
+
+
+def _mail_order(mail: NormalizedEmail) -> Tuple[int, str]:
+    return mail.internal_date_ms, mail.message_id
+
+
+class LowWatermark:
+    """
+    Cursor that never skips a failed or unfinished mail.
+
+    Mails are registered before they are processed (all up front for out-of-order
+    processing, one by one otherwise); the cursor only advances across the gap-free
+    prefix (oldest first) of registered mails that finished successfully, so the next
+    run lists everything from the first failure on again.
+    """
+
+    def __init__(self, mails: Iterable[NormalizedEmail] = ()) -> None:
+        self._order = sorted(mails, key=_mail_order)
+        self._done: set[str] = set()
+
+    def add(self, mail: NormalizedEmail) -> None:
+        # Sequential runs register oldest first, so this is almost always an append.
+        if self._order and _mail_order(mail) < _mail_order(self._order[-1]):
+            bisect.insort(self._order, mail, key=_mail_order)
+        else:
+            self._order.append(mail)
+
+    def mark_done(self, mail: NormalizedEmail) -> None:
+        self._done.add(mail.message_id)
+
+    def discard(self, message_id: str) -> None:
+        """Forget a success, e.g. when its deferred batchModify failed."""
+        self._done.discard(message_id)
+
+    def cursor(self) -> RunCursor:
+        cursor = RunCursor()
+        for mail in self._order:
+            if mail.message_id not in self._done:
+                break
+            cursor.advance(mail)
+        return cursor
+
+    @property
+    def complete(self) -> bool:
+        return all(mail.message_id in self._done for mail in self._order)
+
+
+@dataclass
+class Checkpointer:
+    """Decides when to persist the cursor mid-run and records what checkpoints cost."""
+
+    # Checkpoint after this many finished mails and/or this many seconds (None = never).
+    every: Optional[int] = None
+    interval_s: Optional[float] = None
+    clock: Callable[[], float] = time.monotonic
+    count: int = 0
+    time_s: float = 0.0
+    _since: int = field(default=0, init=False)
+    _last: float = field(default=0.0, init=False)
+
+    def __post_init__(self) -> None:
+        self._last = self.clock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.every is not None or self.interval_s is not None
+
+    def tick(self) -> bool:
+        """Count one finished mail; True when a checkpoint is due."""
+        self._since += 1
+        if self.every is not None and self._since >= self.every:
+            return True
+        return self.interval_s is not None and self.clock() - self._last >= self.interval_s
+
+    def run(self, save: Callable[[], None]) -> None:
+        started = self.clock()
+        save()
+        self._last = self.clock()
+        self._since = 0
+        self.count += 1
+        self.time_s += self._last - started
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "every": self.every,
+            "interval_s": self.interval_s,
+            "time_s": round(self.time_s, 4),
+        }
+
+
+def _apply_cursor(st: AppState, cursor: RunCursor) -> None:
+    if cursor.latest_ts is not None:
+        st.last_internal_date_ms = cursor.latest_ts
+        st.last_message_ids_at_latest_ts = sorted(cursor.latest_ids_at_ts)
+
+
+def checkpoint_run_state(state_path: Path, st: AppState, cursor: RunCursor) -> None:
+    """
+    Persist the timestamp cursor mid-run. The history cursor and run counter are only
+    advanced by commit_run_state, so a crash after a checkpoint re-lists from the old
+    historyId and the timestamp cursor filters out what was already done.
+    """
+    _apply_cursor(st, cursor)
+    save_state(state_path, st)
+
+
+def admit_retries(
+    ledger: ProcessedLedger, message_ids: Iterable[str], version: str
+) -> Tuple[Iterator[str], set[str]]:
+    """
+    Listed IDs not yet done under the rules `version`, preceded by every ID whose last run
+    failed (listed or not: the cursor may already be past it), plus the retried IDs.
+    IDs that failed MAX_FAILED_ATTEMPTS runs in a row are only handled again if listed.
+    """
+    retry_ids = ledger.failed_ids()
+    retrying = set(retry_ids)
+    listed = (
+        mid for mid in ledger.unprocessed(message_ids, version) if mid not in retrying
+    )
+    return itertools.chain(retry_ids, listed), retrying
+
+
+def record_outcomes(
+    ledger: ProcessedLedger, outcomes: Dict[str, str], modify_failed: Iterable[str], version: str
 ) -> None:
-    # Keep analysis pure and delegate side effects to the executor.
+    """Move finished mails into the ledger; deferred batchModify failures count as errors."""
+    for message_id in modify_failed:
+        if message_id in outcomes:
+            outcomes[message_id] = OUTCOME_ERROR
+    ledger.record_many(outcomes.items(), version)
+    outcomes.clear()
+
+
+def plan_cursor(st: AppState, cursor: RunCursor, run_history_id: Optional[str]) -> Dict[str, Any]:
+    """
+    The state a planning run would have committed, plus the state it started from.
+    Applying the plan commits it only if no other run has moved the cursors since.
+    """
+    return {
+        "base_internal_date_ms": st.last_internal_date_ms,
+        "base_history_id": st.last_history_id,
+        "latest_internal_date_ms": cursor.latest_ts,
+        "message_ids_at_latest_ts": sorted(cursor.latest_ids_at_ts),
+        "history_id": run_history_id,
+    }
+
+
+def commit_run_state(
+    state_path: Path, st: AppState, cursor: RunCursor, run_history_id: Optional[str]
+) -> None:
+    """Advance the persisted cursors after a run and save the state."""
+    _apply_cursor(st, cursor)
+    if run_history_id:
+        st.last_history_id = str(run_history_id)
+        st.last_history_time = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    st.runs += 1
+
+    save_state(state_path, st)
+
+
+def plan_message_actions(
+    mail: NormalizedEmail,
+    report_cb: Optional[Callable[[Dict[str, Any]], None]] = None,
+    skip_satisfied: Optional[Callable[[List[Action]], List[Action]]] = None,
+) -> List[Action]:
+    """
+    Analyze a mail and turn the result into actions (pure, no Gmail calls).
+
+    `skip_satisfied` filters the planned actions before labels are reported, so no-ops
+    (e.g. a label the mail already has) are neither applied nor reported.
+    """
     analysis = analyze_email(mail)
     actions = actions_from_analysis(analysis, message_id=mail.message_id)
+    if skip_satisfied:
+        actions = skip_satisfied(actions)
 
     if report_cb:
         for action in actions:
@@ -121,16 +520,54 @@ def process_message(
                         "label": action.label_name,
                     }
                 )
+    return actions
+
+
+def process_message(
+    client: GmailClient,
+    mail: NormalizedEmail,
+    executor: ActionExecutor,
+    report_cb: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> None:
+    # Keep analysis pure and delegate side effects to the executor.
+    actions = plan_message_actions(
+        mail,
+        report_cb,
+        skip_satisfied=lambda planned: executor.drop_satisfied(client, planned, mail.label_ids),
+    )
+    # Hand the parsed mail to the handlers so none of them has to fetch it again.
+    executor.run(client, actions, ExecutionContext(mail=mail))
+
 
-    executor.run(client, actions)
+def _with_run_lock(run: Callable[..., Dict[str, Any]]) -> Callable[..., Dict[str, Any]]:
+    """Hold the cross-process run lock next to the state file for the whole run."""
 
+    @functools.wraps(run)
+    def locked(*, state_path: Path, **kwargs: Any) -> Dict[str, Any]:
+        with RunLock(run_lock_path(state_path)):
+            return run(state_path=state_path, **kwargs)
 
+    return locked
+
+
+@_with_run_lock
 def run_once(
     *,
     state_path: Path,
     logs_dir: Path,
     bootstrap_days: int = 60,
-    max_results: int = 500,
+    max_results: Optional[int] = None,
+    workers: int = 1,
+    use_history: bool = True,
+    fetch_mode: str = FETCH_FULL,
+    batch_modify: bool = False,
+    quota_units_per_second: Optional[float] = DEFAULT_UNITS_PER_SECOND,
+    stream_window: Optional[int] = None,
+    process_workers: int = 1,
+    checkpoint_every: Optional[int] = DEFAULT_CHECKPOINT_EVERY,
+    checkpoint_interval_s: Optional[float] = DEFAULT_CHECKPOINT_INTERVAL_S,
+    plan_path: Optional[Path] = None,
+    use_ledger: bool = True,
     verbose: bool = False,
     progress_cb: Optional[Callable[[str, Dict[str, Any]], None]] = None,
 ) -> Dict[str, Any]:
@@ -141,11 +578,45 @@ def run_once(
         state_path: Path to persisted state (e.g. .state/state.json).
         logs_dir: Base directory for logs/results (e.g. logs/).
         bootstrap_days: How many days to scan on first run.
+        max_results: Optional cap on listed message IDs (None = follow all pages).
+        workers: Number of threads loading message payloads concurrently.
+        use_history: Prefer users.history.list deltas over the after: search query
+            when a historyId cursor is stored (falls back to the query if expired).
+        fetch_mode: "full" downloads every payload; "metadata" fetches headers + snippet
+            first and downloads the full payload only when the rule outcome needs the body.
+        batch_modify: Queue label/archive actions and apply them with batchModify
+            (grouped by label set) instead of one modify call per label.
+        quota_units_per_second: Client-side Gmail quota budget shared by all worker
+            threads (None disables the rate limiter).
+        stream_window: Process mails while loading, keeping at most this many loaded
+            mails in memory (the oldest is processed once the window is full). Order is
+            then chronological within the window only. None loads everything first.
+        process_workers: Classify and act on this many mails concurrently, in any order.
+            In every mode the state cursor only advances to the low watermark (every
+            older mail succeeded, batchModify included), so failed mails are picked up
+            again next run.
+        checkpoint_every / checkpoint_interval_s: Save the cursor after this many
+            processed mails and/or seconds, so a killed run keeps its progress (None
+            disables either trigger). Queued batchModify changes are flushed first.
+            Streaming mode cannot checkpoint: older mails may still be unlisted.
+        plan_path: Planning mode. Fetch and classify as usual, but write every action to
+            this action plan file instead of executing it (see apply_plan). Neither the
+            state cursor nor the ledger is updated until the plan is applied.
+        use_ledger: Skip listed IDs already done under the current rules_version() before
+            fetching them, retry every ID whose last outcome was an error (even behind
+            the cursor, up to MAX_FAILED_ATTEMPTS runs in a row), and record each mail's
+            outcome in the processed ledger.
         verbose: If True, print progress (English) for CLI usage.
 
     Returns:
         dict summary (JSON-serializable).
+
+    Raises:
+        RunInProgressError: Another run (CLI or backend) holds the run lock.
     """
+    # Rule pattern counters are process-wide; the summary reports this run's share.
+    patterns_at_start = RULE_PATTERNS.snapshot()
+
     # NOTE: Keep prints optional and in English (per your preference).
     def log(msg: str) -> None:
         if verbose:
@@ -171,28 +642,86 @@ def run_once(
     processed = 0
     skipped_deleted = 0
     errors = 0
-    latest_ts: Optional[int] = None
-    latest_ids_at_ts: set[str] = set()
     seen = 0
     fetched = 0
 
+    if fetch_mode not in FETCH_MODES:
+        raise ValueError(f"Unknown fetch_mode: {fetch_mode!r} (expected one of {FETCH_MODES})")
+    if stream_window is not None and stream_window < 1:
+        raise ValueError("stream_window must be at least 1")
+    if process_workers > 1 and stream_window is not None:
+        # The low watermark needs every mail of the run before the first one completes.
+        raise ValueError("process_workers > 1 cannot be combined with stream_window")
+
     # --- Load state ---
     report("load_state", detail="Loading state")
     st = load_state(state_path)
     already_processed_at_latest_ts = set(st.last_message_ids_at_latest_ts or [])
+    ledger = ProcessedLedger(ledger_path(state_path)) if use_ledger else None
+    # Taken once, so a rule swap mid-run cannot mark mails done under the new rules.
+    version = rules_version()
+    # message_id -> outcome for finished mails not yet written to the ledger.
+    outcomes: Dict[str, str] = {}
 
     logs_dir.mkdir(parents=True, exist_ok=True)
 
     # --- Gmail client ---
     report("connect_gmail", detail="Connecting to Gmail")
-    cfg = load_gmail_config()
-    client = GmailClient(cfg)
+    cfg = replace(load_gmail_config(), quota_units_per_second=quota_units_per_second)
+    retrier = Retrier()
+    client = GmailClient(cfg, retrier=retrier)
     client.connect()
-    own_email = _normalized_address(client.get_profile().get("emailAddress", ""))
-    executor = default_executor(dry_run=False)
+    log(f"[connect] {client.connect_stats()}")
+    profile = client.get_profile()
+    own_email = _normalized_address(profile.get("emailAddress", ""))
+    # Capture the history cursor before listing so nothing added mid-run is missed.
+    run_history_id = profile.get("historyId")
+    # One labels.list (or none, with a fresh persisted registry) instead of a patch per label use.
+    client.reconcile_labels(emitted_labels())
+    # message_id -> (from, subject) for mails whose label changes are still queued.
+    mail_refs: Dict[str, Tuple[str, str]] = {}
+
+    # Deferred batchModify failures may be reported from processing worker threads.
+    counters_lock = threading.Lock()
+    modify_failed: set[str] = set()
+
+    def on_modify_error(message_id: str, exc: Exception) -> None:
+        nonlocal processed, errors
+        with counters_lock:
+            errors += 1
+            modify_failed.add(message_id)
+            if outcomes.get(message_id) == OUTCOME_DONE:
+                # Counted as processed before its queued label changes were flushed.
+                processed -= 1
+        sender, subject = mail_refs.get(message_id, ("", ""))
+        report(
+            "error",
+            detail=f"{type(exc).__name__}: {exc}",
+            error={
+                "message_id": message_id,
+                "from": sender,
+                "subject": subject,
+                "error": f"{type(exc).__name__}: {exc}",
+            },
+        )
+
+    executor = default_executor(
+        dry_run=False,
+        batch_modify=batch_modify,
+        on_modify_error=on_modify_error,
+        retrier=retrier,
+        # A failed action fails its mail (recorded as an error, holding the cursor back)
+        # instead of only being logged.
+        continue_on_error=False,
+    )
+    planning = plan_path is not None
+    if planning:
+        executor.plan = ActionPlanBuilder()
 
     # --- Decide bootstrap vs incremental ---
+    message_ids: Iterable[str] | None = None
     if st.last_internal_date_ms is None:
+        sync_mode = "bootstrap"
         log(f"[bootstrap] No last_internal_date_ms, fetching messages from last {bootstrap_days} days")
         report("fetch_messages", detail="Fetching messages (bootstrap)")
         message_ids = get_message_ids_bootstrap(
@@ -200,7 +729,23 @@ def run_once(
             bootstrap_days=bootstrap_days,
             max_results=max_results,
         )
-    else:
+    elif use_history and st.last_history_id:
+        sync_mode = "history"
+        report("fetch_messages", detail="Fetching messages (history)")
+        try:
+            message_ids = get_message_ids_from_history(
+                client,
+                start_history_id=st.last_history_id,
+            )
+        except HistoryExpiredError as exc:
+            log(
+                f"[history] {exc} (cursor from {st.last_history_time}); "
+                "falling back to search query"
+            )
+            message_ids = None
+
+    if message_ids is None:
+        sync_mode = "query"
         report("fetch_messages", detail="Fetching messages (incremental)")
         cursor_ms = st.last_internal_date_ms
         # Legacy state migration: if we only have a timestamp (no ID cursor yet),
@@ -213,11 +758,9 @@ def run_once(
             max_results=max_results,
         )
 
-    fetched = len(message_ids)
-    log(f"[run] Found {fetched} messages")
     report(
         "load_messages",
-        detail=f"Loading message payloads 0/{fetched}",
+        detail="Loading message payloads 0",
         metrics={
             "processed": processed,
             "message_ids_seen": seen,
@@ -226,131 +769,258 @@ def run_once(
         },
     )
 
-    # --- Load messages first, then process in chronological order ---
-    loaded_mails: List[NormalizedEmail] = []
-    for mid in message_ids:
-        mail: Optional[NormalizedEmail] = None
+    def run_one(
+        worker_client: GmailClient, mail: NormalizedEmail
+    ) -> Tuple[List[Dict[str, Any]], Optional[Exception]]:
+        # Applied labels are collected and reported by the calling thread.
+        applied: List[Dict[str, Any]] = []
         try:
-            mail, _headers = build_mail(client, mid)
-            loaded_mails.append(mail)
-        except KeyError as exc:
-            # Message deleted/moved between list and fetch.
-            skipped_deleted += 1
-            log(f"[skip] {exc}")
+            process_message(worker_client, mail, executor, report_cb=applied.append)
         except Exception as exc:
-            errors += 1
+            return applied, exc
+        return applied, None
+
+    def finish(
+        mail: NormalizedEmail,
+        index: int,
+        applied: List[Dict[str, Any]],
+        exc: Optional[Exception],
+    ) -> None:
+        nonlocal processed, errors
+        for action in applied:
+            if planning:
+                # Written to the plan only; apply_plan executes it later.
+                report("action", detail="Label planned", action={**action, "planned": True})
+            else:
+                report("action", detail="Label applied", action=action)
+        with counters_lock:
+            outcomes[mail.message_id] = OUTCOME_DONE if exc is None else OUTCOME_ERROR
+            # A batchModify flushed while this mail was processed may already have failed
+            # (and been counted as an error) for it.
+            modify_ok = mail.message_id not in modify_failed
+            if modify_ok:
+                if exc is None:
+                    processed += 1
+                else:
+                    errors += 1
+        if exc is None and modify_ok:
+            watermark.mark_done(mail)
+        elif exc is not None:
             log(f"[error] {type(exc).__name__}: {exc}")
             report(
                 "error",
                 detail=f"{type(exc).__name__}: {exc}",
                 error={
-                    "message_id": mid,
-                    "from": mail.from_email if mail else "",
-                    "subject": mail.subject if mail else "",
+                    "message_id": mail.message_id,
+                    "from": mail.from_email,
+                    "subject": mail.subject,
                     "error": f"{type(exc).__name__}: {exc}",
                 },
             )
+        if checkpointer.enabled and checkpointer.tick():
+            checkpointer.run(save_checkpoint)
+        total = "" if streaming else f"/{seen}"
+        report(
+            "processing",
+            detail=f"Processing {index}{total}",
+            metrics={
+                "processed": processed,
+                "message_ids_seen": seen,
+                "skipped_deleted": skipped_deleted,
+                "errors": errors,
+            },
+        )
 
-    # Oldest first so classification/actions follow timeline order.
-    loaded_mails.sort(key=lambda m: (m.internal_date_ms, m.message_id))
+    def current_cursor() -> RunCursor:
+        with counters_lock:
+            failed = list(modify_failed)
+        for message_id in failed:
+            watermark.discard(message_id)
+        return watermark.cursor()
+
+    def save_checkpoint() -> None:
+        # Queued label changes must be applied before the cursor moves past their mails.
+        if executor.batcher:
+            executor.flush(client)
+        checkpoint_run_state(state_path, st, current_cursor())
+        if ledger is not None:
+            with counters_lock:
+                record_outcomes(ledger, outcomes, modify_failed, version)
+        log(f"[checkpoint] saved after {processed + errors} mails")
+
+    def handle(mail: NormalizedEmail, index: int) -> None:
+        if mail.message_id not in behind:
+            watermark.add(mail)
+        finish(mail, index, *run_one(client, mail))
 
-    # Build an eligible list first so "Seen" only reflects actually processable mails.
-    eligible_mails: List[NormalizedEmail] = []
-    for mail in loaded_mails:
-        if st.last_internal_date_ms is not None:
-            if mail.internal_date_ms < st.last_internal_date_ms:
+    # --- Load messages, then process in chronological order ---
+    # IDs are streamed page by page, so loading starts before listing has finished.
+    # Without a stream window every eligible mail is held until loading has finished;
+    # with one, the oldest mail is processed whenever the window overflows.
+    streaming = stream_window is not None
+    # Failed mails, including those whose deferred batchModify fails, hold the cursor
+    # back in every mode.
+    watermark = LowWatermark()
+    # Nothing is applied while planning, so there is no progress to checkpoint.
+    checkpointer = Checkpointer(
+        every=None if streaming or planning else checkpoint_every,
+        interval_s=None if streaming or planning else checkpoint_interval_s,
+    )
+    window: List[Tuple[int, str, NormalizedEmail]] = []
+    handled = 0
+    # Retried mails the cursor is already past; they cannot hold it back.
+    behind: set[str] = set()
+    retrying: set[str] = set()
+    # One batch HTTP call per chunk instead of one round trip per message.
+    # Results are consumed on this thread, so skip/error accounting stays single-threaded.
+    if ledger is not None:
+        # Overlapping or widened listings cost one local lookup per known ID.
+        message_ids, retrying = admit_retries(ledger, message_ids, version)
+    chunks = _chunked(message_ids, MAX_BATCH_SIZE)
+    for chunk, results in fetch_message_chunks(
+        client, chunks, workers=workers, fetch_mode=fetch_mode
+    ):
+        for mid, result in zip(chunk, results):
+            fetched += 1
+            mail: Optional[NormalizedEmail] = None
+            try:
+                if isinstance(result, Exception):
+                    raise result
+                mail, _headers = mail_from_message(mid, result)
+            except KeyError as exc:
+                # Message deleted/moved between list and fetch.
+                skipped_deleted += 1
+                with counters_lock:
+                    outcomes[mid] = OUTCOME_DELETED
+                log(f"[skip] {exc}")
+                continue
+            except Exception as exc:
+                errors += 1
+                # Not part of the watermark (no timestamp): the ledger retries it.
+                with counters_lock:
+                    outcomes[mid] = OUTCOME_ERROR
+                log(f"[error] {type(exc).__name__}: {exc}")
+                report(
+                    "error",
+                    detail=f"{type(exc).__name__}: {exc}",
+                    error={
+                        "message_id": mid,
+                        "from": mail.from_email if mail else "",
+                        "subject": mail.subject if mail else "",
+                        "error": f"{type(exc).__name__}: {exc}",
+                    },
+                )
                 continue
-            if (
-                mail.internal_date_ms == st.last_internal_date_ms
-                and mail.message_id in already_processed_at_latest_ts
+
+            # "Seen" only reflects actually processable mails.
+            retry = mail.message_id in retrying
+            if not is_eligible(
+                mail, st, already_processed_at_latest_ts, own_email, retrying=retry
             ):
                 continue
-        if "DRAFT" in {lbl.upper() for lbl in mail.label_ids}:
-            continue
-        from_addr = _normalized_address(mail.from_email)
-        if own_email and from_addr == own_email:
-            continue
-        eligible_mails.append(mail)
-
-    seen = len(eligible_mails)
-    to_process = seen
-    if to_process:
+            if retry and behind_cursor(mail, st, already_processed_at_latest_ts):
+                behind.add(mail.message_id)
+            seen += 1
+            if executor.batcher:
+                # Lets deferred batchModify failures be reported with sender/subject.
+                mail_refs[mail.message_id] = (mail.from_email, mail.subject)
+            heapq.heappush(window, (mail.internal_date_ms, mail.message_id, mail))
+            if streaming and len(window) > stream_window:
+                handled += 1
+                handle(heapq.heappop(window)[2], handled)
+        report("load_messages", detail=f"Loading message payloads {fetched}")
+
+    log(f"[run] Found {fetched} messages")
+    if seen:
         log("[run] Processing messages in chronological order (oldest to newest)")
     else:
         log(f"[run] No eligible messages to process (fetched={fetched})")
-    report(
-        "processing",
-        detail=f"Processing 0/{to_process}",
-        metrics={
-            "processed": processed,
-            "message_ids_seen": seen,
-            "skipped_deleted": skipped_deleted,
-            "errors": errors,
-        },
-    )
+    if not streaming:
+        report(
+            "processing",
+            detail=f"Processing 0/{seen}",
+            metrics={
+                "processed": processed,
+                "message_ids_seen": seen,
+                "skipped_deleted": skipped_deleted,
+                "errors": errors,
+            },
+        )
 
-    for index, mail in enumerate(eligible_mails, start=1):
-        try:
-            process_message(
-                client,
-                mail,
-                executor,
-                report_cb=lambda action: report(
-                    "action",
-                    detail="Label applied",
-                    action=action,
-                ),
-            )
-            processed += 1
+    if process_workers > 1:
+        # Any order, several mails at once; the low watermark keeps the cursor safe.
+        pending_mails = [entry[2] for entry in window]
+        window = []
+        watermark = LowWatermark(m for m in pending_mails if m.message_id not in behind)
+        local = threading.local()
 
-            ts = getattr(mail, "internal_date_ms", None)
-            if ts is not None:
-                if latest_ts is None or ts > latest_ts:
-                    latest_ts = ts
-                    latest_ids_at_ts = {mail.message_id}
-                elif ts == latest_ts:
-                    latest_ids_at_ts.add(mail.message_id)
+        def run_in_worker(mail: NormalizedEmail) -> Tuple[List[Dict[str, Any]], Optional[Exception]]:
+            worker_client = getattr(local, "client", None)
+            if worker_client is None:
+                worker_client = client.fork()
+                local.client = worker_client
+            return run_one(worker_client, mail)
 
-        except Exception as exc:
-            errors += 1
-            log(f"[error] {type(exc).__name__}: {exc}")
-            report(
-                "error",
-                detail=f"{type(exc).__name__}: {exc}",
-                error={
-                    "message_id": mail.message_id,
-                    "from": mail.from_email,
-                    "subject": mail.subject,
-                    "error": f"{type(exc).__name__}: {exc}",
-                },
-            )
-        finally:
-            report(
-                "processing",
-                detail=f"Processing {index}/{to_process}",
-                metrics={
-                    "processed": processed,
-                    "message_ids_seen": seen,
-                    "skipped_deleted": skipped_deleted,
-                    "errors": errors,
-                },
-            )
+        with ThreadPoolExecutor(
+            max_workers=process_workers, thread_name_prefix="process"
+        ) as pool:
+            futures = {pool.submit(run_in_worker, mail): mail for mail in pending_mails}
+            for future in as_completed(futures):
+                handled += 1
+                finish(futures[future], handled, *future.result())
 
-    # --- Update & persist state ---
-    report("save_state", detail="Saving state")
-    if latest_ts is not None:
-        st.last_internal_date_ms = latest_ts
-        st.last_message_ids_at_latest_ts = sorted(latest_ids_at_ts)
-    st.runs += 1
+    # Oldest first so classification/actions follow timeline order.
+    while window:
+        handled += 1
+        handle(heapq.heappop(window)[2], handled)
 
-    save_state(state_path, st)
+    # Apply label/archive actions still queued for batchModify.
+    if executor.batcher:
+        report("apply_labels", detail="Applying queued label changes")
+        executor.flush(client)
+
+    cursor = current_cursor()
+    if not watermark.complete:
+        # History deltas start after run_history_id; keep the old cursor so the
+        # mails above the watermark are listed again next run.
+        run_history_id = None
+
+    plan_stats: Dict[str, Any] = {}
+    if planning:
+        report("save_plan", detail="Writing action plan")
+        plan = executor.plan.build(
+            rules_version=version,
+            planned_ids=[mid for mid, outcome in outcomes.items() if outcome == OUTCOME_DONE],
+            cursor=plan_cursor(st, cursor, run_history_id),
+        )
+        save_plan(plan_path, plan)
+        plan_stats = {"path": str(plan_path), **plan.stats()}
+        log(f"[plan] Wrote {plan_path}")
+    else:
+        # --- Update & persist state ---
+        report("save_state", detail="Saving state")
+        commit_run_state(state_path, st, cursor, run_history_id)
+        if ledger is not None:
+            record_outcomes(ledger, outcomes, modify_failed, version)
 
     summary = RunSummary(
         processed=processed,
         skipped_deleted=skipped_deleted,
         errors=errors,
-        latest_internal_date_ms=latest_ts,
+        latest_internal_date_ms=cursor.latest_ts,
         message_ids_seen=seen,
+        sync_mode=sync_mode,
+        skipped_noop_actions=executor.skipped_noops,
+        quota=client.quota_usage(),
+        retries=retrier.snapshot(),
+        checkpoints=checkpointer.snapshot(),
+        connect=client.connect_stats(),
+        message_cache=client.message_cache_stats(),
+        ledger=ledger.stats() if ledger is not None else {},
+        plan=plan_stats,
+        rule_patterns=RULE_PATTERNS.snapshot(since=patterns_at_start),
     )
+    if ledger is not None:
+        ledger.close()
     report("done", detail="Run completed", metrics=asdict(summary))
     return asdict(summary)
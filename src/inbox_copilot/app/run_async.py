@@ -0,0 +1,430 @@
+# src/inbox_copilot/app/run_async.py
+from __future__ import annotations
+
+import asyncio
+import functools
+import threading
+from collections import deque
+from dataclasses import asdict, replace
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from inbox_copilot.actions.executor import default_executor
+from inbox_copilot.app.run import (
+    DEFAULT_CHECKPOINT_EVERY,
+    DEFAULT_CHECKPOINT_INTERVAL_S,
+    FETCH_FULL,
+    FETCH_METADATA_FIRST,
+    FETCH_MODES,
+    METADATA_HEADERS,
+    Checkpointer,
+    LowWatermark,
+    RunCursor,
+    RunSummary,
+    _bootstrap_query,
+    _incremental_query,
+    _mail_order,
+    _normalized_address,
+    behind_cursor,
+    checkpoint_run_state,
+    commit_run_state,
+    is_eligible,
+    load_gmail_config,
+    mail_from_message,
+    needs_full_payload,
+    process_message,
+    record_outcomes,
+)
+from inbox_copilot.gmail.async_client import AsyncGmailClient, BlockingGmailBridge
+from inbox_copilot.gmail.client import HistoryExpiredError
+from inbox_copilot.gmail.fields import MESSAGE_MAIL_FIELDS, MESSAGE_METADATA_FIELDS
+from inbox_copilot.gmail.rate_limit import DEFAULT_UNITS_PER_SECOND
+from inbox_copilot.models import NormalizedEmail
+from inbox_copilot.retry import Retrier
+from inbox_copilot.rules.classification import emitted_labels, rules_version
+from inbox_copilot.rules.patterns import RULE_PATTERNS
+from inbox_copilot.storage.ledger import (
+    OUTCOME_DELETED,
+    OUTCOME_DONE,
+    OUTCOME_ERROR,
+    ProcessedLedger,
+    ledger_path,
+)
+from inbox_copilot.storage.run_lock import RunLock, run_lock_path
+from inbox_copilot.storage.state import load_state
+
+
+async def _load_payload(client: AsyncGmailClient, message_id: str, fetch_mode: str) -> Dict[str, Any]:
+    if fetch_mode == FETCH_METADATA_FIRST:
+        msg = await client.get_message(
+            message_id,
+            "metadata",
+            metadata_headers=METADATA_HEADERS,
+            fields=MESSAGE_METADATA_FIELDS,
+        )
+        if not needs_full_payload(msg):
+            return msg
+    return await client.get_message(message_id, "full", fields=MESSAGE_MAIL_FIELDS)
+
+
+def _with_run_lock(
+    run: Callable[..., Awaitable[Dict[str, Any]]]
+) -> Callable[..., Awaitable[Dict[str, Any]]]:
+    """Same lock file as run._with_run_lock, so CLI and backend runs exclude each other."""
+
+    @functools.wraps(run)
+    async def locked(*, state_path: Path, **kwargs: Any) -> Dict[str, Any]:
+        with RunLock(run_lock_path(state_path)):
+            return await run(state_path=state_path, **kwargs)
+
+    return locked
+
+
+@_with_run_lock
+async def run_once_async(
+    *,
+    state_path: Path,
+    logs_dir: Path,
+    bootstrap_days: int = 60,
+    max_results: Optional[int] = None,
+    use_history: bool = True,
+    fetch_mode: str = FETCH_FULL,
+    batch_modify: bool = False,
+    concurrency: int = 200,
+    process_workers: int = 1,
+    quota_units_per_second: Optional[float] = DEFAULT_UNITS_PER_SECOND,
+    checkpoint_every: Optional[int] = DEFAULT_CHECKPOINT_EVERY,
+    checkpoint_interval_s: Optional[float] = DEFAULT_CHECKPOINT_INTERVAL_S,
+    use_ledger: bool = True,
+    verbose: bool = False,
+    progress_cb: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    """
+    asyncio-native variant of `run_once` with the same state handling and summary shape.
+
+    Payloads are fetched on the event loop, at most `concurrency` at a time (paced by the
+    quota limiter). Mails are then processed oldest first in worker threads by the same
+    ActionExecutor as `run_once`, reaching Gmail through a BlockingGmailBridge; with
+    `process_workers > 1`, that many at once in any order. As in `run_once`, the state
+    cursor only advances to the low watermark, `checkpoint_every` /
+    `checkpoint_interval_s` save it mid-run, and the ledger retries failed mails.
+    Planning and stream windows are only supported by `run_once`.
+    """
+    # Reported as this run's difference, like run_once.
+    patterns_at_start = RULE_PATTERNS.snapshot()
+
+    def log(msg: str) -> None:
+        if verbose:
+            print(msg)
+
+    def report(
+        step: str,
+        *,
+        detail: str | None = None,
+        metrics: Optional[Dict[str, Any]] = None,
+        **extra: Any,
+    ) -> None:
+        if not progress_cb:
+            return
+        payload: Dict[str, Any] = {"detail": detail}
+        if metrics:
+            payload["metrics"] = metrics
+        if extra:
+            payload.update(extra)
+        progress_cb(step, payload)
+
+    def report_error(message_id: str, sender: str, subject: str, exc: BaseException) -> None:
+        log(f"[error] {type(exc).__name__}: {exc}")
+        report(
+            "error",
+            detail=f"{type(exc).__name__}: {exc}",
+            error={
+                "message_id": message_id,
+                "from": sender,
+                "subject": subject,
+                "error": f"{type(exc).__name__}: {exc}",
+            },
+        )
+
+    if fetch_mode not in FETCH_MODES:
+        raise ValueError(f"Unknown fetch_mode: {fetch_mode!r} (expected one of {FETCH_MODES})")
+    if concurrency < 1 or process_workers < 1:
+        raise ValueError("concurrency and process_workers must be at least 1")
+
+    processed = 0
+    skipped_deleted = 0
+    errors = 0
+    seen = 0
+    fetched = 0
+
+    # --- Load state ---
+    report("load_state", detail="Loading state")
+    st = load_state(state_path)
+    already_processed_at_latest_ts = set(st.last_message_ids_at_latest_ts or [])
+    ledger = ProcessedLedger(ledger_path(state_path)) if use_ledger else None
+    version = rules_version()
+    # message_id -> outcome for finished mails not yet written to the ledger.
+    outcomes: Dict[str, str] = {}
+    logs_dir.mkdir(parents=True, exist_ok=True)
+
+    # Deferred batchModify failures are reported from the executor's worker threads.
+    counters_lock = threading.Lock()
+    modify_failed: set[str] = set()
+    # message_id -> (from, subject) for mails whose label changes are still queued.
+    mail_refs: Dict[str, Tuple[str, str]] = {}
+
+    def on_modify_error(message_id: str, exc: Exception) -> None:
+        nonlocal processed, errors
+        with counters_lock:
+            errors += 1
+            modify_failed.add(message_id)
+            if outcomes.get(message_id) == OUTCOME_DONE:
+                # Counted as processed before its queued label changes were flushed.
+                processed -= 1
+        report_error(message_id, *mail_refs.get(message_id, ("", "")), exc)
+
+    # --- Gmail client ---
+    report("connect_gmail", detail="Connecting to Gmail")
+    cfg = replace(load_gmail_config(), quota_units_per_second=quota_units_per_second)
+    retrier = Retrier()
+    executor = default_executor(
+        batch_modify=batch_modify,
+        on_modify_error=on_modify_error,
+        retrier=retrier,
+        # Failed actions fail their mail, as in run_once.
+        continue_on_error=False,
+    )
+
+    async with AsyncGmailClient(cfg, retrier=retrier, max_in_flight=concurrency) as client:
+        log(f"[connect] {client.connect_stats()}")
+        bridge = BlockingGmailBridge(client, asyncio.get_running_loop())
+        profile = await client.get_profile()
+        own_email = _normalized_address(profile.get("emailAddress", ""))
+        # Capture the history cursor before listing so nothing added mid-run is missed.
+        run_history_id = profile.get("historyId")
+        await client.reconcile_labels(emitted_labels())
+
+        # --- Decide bootstrap vs incremental ---
+        history_ids: Optional[List[str]] = None
+        query: Optional[str] = None
+        if st.last_internal_date_ms is None:
+            sync_mode = "bootstrap"
+            query = _bootstrap_query(bootstrap_days)
+        else:
+            sync_mode = "history"
+            if use_history and st.last_history_id:
+                try:
+                    history_ids = await client.history_message_ids(st.last_history_id)
+                except HistoryExpiredError as exc:
+                    log(
+                        f"[history] {exc} (cursor from {st.last_history_time}); "
+                        "falling back to search query"
+                    )
+            if history_ids is None:
+                sync_mode = "query"
+                cursor_ms = st.last_internal_date_ms
+                # Same legacy-state migration as run_once.
+                if not st.last_message_ids_at_latest_ts:
+                    cursor_ms += 1000
+                query = _incremental_query(cursor_ms)
+        report("fetch_messages", detail=f"Fetching messages ({sync_mode})")
+
+        # Mails whose last run failed are retried even if the cursor is past them.
+        retry_ids = ledger.failed_ids() if ledger is not None else []
+        retrying = set(retry_ids)
+
+        async def message_ids() -> AsyncIterator[str]:
+            for mid in retry_ids:
+                yield mid
+            if history_ids is not None:
+                for mid in history_ids:
+                    yield mid
+            else:
+                async for mid in client.iter_message_ids(query=query, max_results=max_results):
+                    yield mid
+
+        # Retried mails the cursor is already past; they cannot hold it back.
+        behind: set[str] = set()
+        loaded: List[NormalizedEmail] = []
+
+        def accept(mid: str, result: Any) -> None:
+            nonlocal fetched, skipped_deleted, errors, seen
+            fetched += 1
+            try:
+                if isinstance(result, BaseException):
+                    raise result
+                mail, _headers = mail_from_message(mid, result)
+            except KeyError as exc:
+                # Message deleted/moved between list and fetch.
+                skipped_deleted += 1
+                outcomes[mid] = OUTCOME_DELETED
+                log(f"[skip] {exc}")
+                return
+            except Exception as exc:
+                errors += 1
+                # Not part of the watermark (no timestamp): the ledger retries it.
+                outcomes[mid] = OUTCOME_ERROR
+                report_error(mid, "", "", exc)
+                return
+            retry = mid in retrying
+            if not is_eligible(mail, st, already_processed_at_latest_ts, own_email, retrying=retry):
+                return
+            if retry and behind_cursor(mail, st, already_processed_at_latest_ts):
+                behind.add(mid)
+            seen += 1
+            if executor.batcher:
+                mail_refs[mid] = (mail.from_email, mail.subject)
+            loaded.append(mail)
+
+        # --- Load payloads while later pages are listed, `concurrency` at a time ---
+        fetching: Deque[Tuple[str, asyncio.Task]] = deque()
+        listed: set[str] = set()
+
+        async def take_oldest_fetch() -> None:
+            mid, task = fetching.popleft()
+            try:
+                result: Any = await task
+            except Exception as exc:
+                result = exc
+            accept(mid, result)
+            if fetched % 100 == 0:
+                report("load_messages", detail=f"Loading message payloads {fetched}")
+
+        report("load_messages", detail="Loading message payloads 0")
+        async for mid in message_ids():
+            if mid in listed:
+                continue
+            listed.add(mid)
+            if (
+                ledger is not None
+                and mid not in retrying
+                and ledger.is_processed(mid, version)
+            ):
+                continue
+            if len(fetching) >= concurrency:
+                await take_oldest_fetch()
+            fetching.append((mid, asyncio.create_task(_load_payload(client, mid, fetch_mode))))
+        while fetching:
+            await take_oldest_fetch()
+        log(f"[run] Found {fetched} messages")
+
+        # --- Process oldest first; the low watermark keeps the cursor safe ---
+        loaded.sort(key=_mail_order)
+        watermark = LowWatermark(m for m in loaded if m.message_id not in behind)
+        checkpointer = Checkpointer(every=checkpoint_every, interval_s=checkpoint_interval_s)
+
+        def metrics() -> Dict[str, Any]:
+            return {
+                "processed": processed,
+                "message_ids_seen": seen,
+                "skipped_deleted": skipped_deleted,
+                "errors": errors,
+            }
+
+        def current_cursor() -> RunCursor:
+            with counters_lock:
+                failed = list(modify_failed)
+            for message_id in failed:
+                watermark.discard(message_id)
+            return watermark.cursor()
+
+        def save_checkpoint() -> None:
+            checkpoint_run_state(state_path, st, current_cursor())
+            if ledger is not None:
+                with counters_lock:
+                    record_outcomes(ledger, outcomes, modify_failed, version)
+            log(f"[checkpoint] saved after {processed + errors} mails")
+
+        def run_one(
+            mail: NormalizedEmail,
+        ) -> Tuple[List[Dict[str, Any]], Optional[Exception]]:
+            applied: List[Dict[str, Any]] = []
+            try:
+                process_message(bridge, mail, executor, report_cb=applied.append)
+            except Exception as exc:
+                return applied, exc
+            return applied, None
+
+        async def finish(
+            mail: NormalizedEmail,
+            index: int,
+            applied: List[Dict[str, Any]],
+            exc: Optional[Exception],
+        ) -> None:
+            nonlocal processed, errors
+            for action in applied:
+                report("action", detail="Label applied", action=action)
+            with counters_lock:
+                outcomes[mail.message_id] = OUTCOME_DONE if exc is None else OUTCOME_ERROR
+                modify_ok = mail.message_id not in modify_failed
+                if modify_ok:
+                    if exc is None:
+                        processed += 1
+                    else:
+                        errors += 1
+            if exc is None and modify_ok:
+                watermark.mark_done(mail)
+            elif exc is not None:
+                report_error(mail.message_id, mail.from_email, mail.subject, exc)
+            if checkpointer.enabled and checkpointer.tick():
+                # Queued label changes must be applied before the cursor moves past them.
+                if executor.batcher:
+                    await asyncio.to_thread(executor.flush, bridge)
+                checkpointer.run(save_checkpoint)
+            report("processing", detail=f"Processing {index}/{seen}", metrics=metrics())
+
+        report("processing", detail=f"Processing 0/{seen}", metrics=metrics())
+        running: Dict[asyncio.Future, NormalizedEmail] = {}
+        handled = 0
+        for mail in loaded:
+            running[asyncio.ensure_future(asyncio.to_thread(run_one, mail))] = mail
+            if len(running) < process_workers:
+                continue
+            done, _pending = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                handled += 1
+                await finish(running.pop(future), handled, *future.result())
+        while running:
+            done, _pending = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                handled += 1
+                await finish(running.pop(future), handled, *future.result())
+
+        # Apply label/archive actions still queued for batchModify.
+        if executor.batcher:
+            report("apply_labels", detail="Applying queued label changes")
+            await asyncio.to_thread(executor.flush, bridge)
+
+        cursor = current_cursor()
+        if not watermark.complete:
+            # History deltas start after run_history_id; keep the old cursor so the
+            # mails above the watermark are listed again next run.
+            run_history_id = None
+
+        # --- Update & persist state ---
+        report("save_state", detail="Saving state")
+        commit_run_state(state_path, st, cursor, run_history_id)
+        if ledger is not None:
+            record_outcomes(ledger, outcomes, modify_failed, version)
+
+        summary = RunSummary(
+            processed=processed,
+            skipped_deleted=skipped_deleted,
+            errors=errors,
+            latest_internal_date_ms=cursor.latest_ts,
+            message_ids_seen=seen,
+            sync_mode=sync_mode,
+            skipped_noop_actions=executor.skipped_noops,
+            quota=client.quota_usage(),
+            retries=retrier.snapshot(),
+            checkpoints=checkpointer.snapshot(),
+            connect=client.connect_stats(),
+            message_cache=client.message_cache_stats(),
+            ledger=ledger.stats() if ledger is not None else {},
+            rule_patterns=RULE_PATTERNS.snapshot(since=patterns_at_start),
+        )
+        if ledger is not None:
+            ledger.close()
+
+    report("done", detail="Run completed", metrics=asdict(summary))
+    return asdict(summary)
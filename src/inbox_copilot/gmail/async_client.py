@@ -0,0 +1,534 @@
+from __future__ import annotations
+
+import asyncio
+import base64
+import time
+from email.message import EmailMessage
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Sequence
+
+import httpx
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+
+from inbox_copilot.gmail.LabelColors import LABEL_COLORS
+from inbox_copilot.gmail.client import (
+    MAX_BATCH_MODIFY_IDS,
+    MAX_LIST_PAGE_SIZE,
+    GmailClientConfig,
+    HistoryExpiredError,
+    SKIPPED_HISTORY_LABELS,
+    gmail_call_type,
+    load_credentials,
+)
+from inbox_copilot.gmail.fields import (
+    HISTORY_FIELDS,
+    LIST_LABELS_FIELDS,
+    LIST_MESSAGES_FIELDS,
+    MESSAGE_LABELS_FIELDS,
+    PROFILE_FIELDS,
+)
+from inbox_copilot.gmail.label_registry import (
+    LabelRegistry,
+    is_missing_label_error,
+    load_label_registry,
+    save_label_registry,
+)
+from inbox_copilot.gmail.rate_limit import QuotaRateLimiter
+from inbox_copilot.retry import Retrier
+from inbox_copilot.storage.message_cache import MessageCache, wants_label_ids
+
+GMAIL_API_ROOT = "https://gmail.googleapis.com/gmail/v1/users"
+
+# HTTP/2 needs the optional `h2` package (pip install "httpx[http2]").
+try:
+    import h2  # noqa: F401
+
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class GmailHTTPError(Exception):
+    """Non-2xx response from the Gmail REST API (shape understood by inbox_copilot.retry)."""
+
+    def __init__(self, response: httpx.Response):
+        self.response = response
+        self.status_code = response.status_code
+        super().__init__(
+            f"Gmail API {response.status_code} for {response.request.method} "
+            f"{response.request.url.path}: {response.text[:200]}"
+        )
+
+
+class AsyncGmailClient:
+    """
+    asyncio-native Gmail client on a pooled httpx connection (HTTP/2 when available).
+
+    Mirrors the GmailClient surface that the pipeline uses. Hundreds of requests can be in
+    flight on one thread; `max_in_flight` bounds them, the shared quota limiter paces them.
+    """
+
+    def __init__(
+        self,
+        cfg: GmailClientConfig,
+        *,
+        retrier: Optional[Retrier] = None,
+        max_in_flight: int = 200,
+    ) -> None:
+        self._cfg = cfg
+        self._retrier = retrier or Retrier()
+        self._creds: Optional[Credentials] = None
+        self._connect_stats: Dict[str, float] = {}
+        self._http: Optional[httpx.AsyncClient] = None
+        self._token_lock = asyncio.Lock()
+        self._in_flight = asyncio.Semaphore(max(1, max_in_flight))
+        self._max_in_flight = max(1, max_in_flight)
+        self._labels = LabelRegistry()
+        self._message_cache: Optional[MessageCache] = None
+        self._limiter: Optional[QuotaRateLimiter] = (
+            QuotaRateLimiter(cfg.quota_units_per_second) if cfg.quota_units_per_second else None
+        )
+
+    async def __aenter__(self) -> "AsyncGmailClient":
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *_exc: Any) -> None:
+        await self.aclose()
+
+    async def connect(self) -> None:
+        """Load credentials (may open the OAuth browser flow) and open the connection pool."""
+        started = time.perf_counter()
+        self._creds = await asyncio.to_thread(load_credentials, self._cfg)
+        loaded = time.perf_counter()
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                base_url=f"{GMAIL_API_ROOT}/{self._cfg.user_id}",
+                http2=HTTP2_AVAILABLE,
+                limits=httpx.Limits(
+                    max_connections=self._max_in_flight,
+                    max_keepalive_connections=min(self._max_in_flight, 20),
+                ),
+                timeout=httpx.Timeout(30.0),
+            )
+        finished = time.perf_counter()
+        self._connect_stats = {
+            "credentials_s": round(loaded - started, 4),
+            "service_s": round(finished - loaded, 4),
+            "total_s": round(finished - started, 4),
+        }
+        self._labels.clear()
+        if self._message_cache is None and self._cfg.message_cache_path is not None:
+            self._message_cache = MessageCache(self._cfg.message_cache_path)
+
+    async def aclose(self) -> None:
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    def connect_stats(self) -> Dict[str, float]:
+        return dict(self._connect_stats)
+
+    def message_cache_stats(self) -> Dict[str, Any]:
+        return self._message_cache.stats() if self._message_cache is not None else {}
+
+    def quota_usage(self) -> Dict[str, Any]:
+        return self._limiter.snapshot() if self._limiter is not None else {}
+
+    def retry_stats(self) -> Dict[str, Any]:
+        return self._retrier.snapshot()
+
+    # -----------------------------
+    # Transport
+    # -----------------------------
+
+    async def _auth_header(self) -> Dict[str, str]:
+        if self._creds is None:
+            raise RuntimeError("AsyncGmailClient is not connected. Call connect() first.")
+        if not self._creds.valid:
+            async with self._token_lock:
+                if not self._creds.valid:
+                    await asyncio.to_thread(self._creds.refresh, Request())
+        return {"Authorization": f"Bearer {self._creds.token}"}
+
+    async def _request(
+        self,
+        method: str,
+        http_method: str,
+        path: str,
+        *,
+        params: Optional[Any] = None,
+        json: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        if self._http is None:
+            raise RuntimeError("AsyncGmailClient is not connected. Call connect() first.")
+        call_type = gmail_call_type(method)
+
+        async def attempt() -> Dict[str, Any]:
+            if self._limiter is not None:
+                await self._limiter.acquire_async(method)
+            headers = await self._auth_header()
+            async with self._in_flight:
+                try:
+                    resp = await self._http.request(
+                        http_method, path, params=params, json=json, headers=headers
+                    )
+                except httpx.TimeoutException as exc:
+                    # httpx errors are no ConnectionError/TimeoutError; re-raise them as
+                    # those so they are retried like the sync client's socket errors.
+                    raise TimeoutError(f"{method}: {exc}") from exc
+                except httpx.TransportError as exc:
+                    raise ConnectionError(f"{method}: {exc}") from exc
+            if resp.status_code >= 400:
+                raise GmailHTTPError(resp)
+            return resp.json() if resp.content else {}
+
+        return await self._retrier.call_async(call_type, attempt)
+
+    # -----------------------------
+    # Messages
+    # -----------------------------
+
+    async def iter_message_ids(
+        self,
+        query: str = "",
+        *,
+        max_results: Optional[int] = None,
+        page_size: int = MAX_LIST_PAGE_SIZE,
+    ) -> AsyncIterator[str]:
+        """Async counterpart of GmailClient.iter_message_ids (lazy page-token walk)."""
+        page_size = max(1, min(page_size, MAX_LIST_PAGE_SIZE))
+        if max_results is not None:
+            if max_results <= 0:
+                return
+            page_size = min(page_size, max_results)
+
+        yielded = 0
+        page_token: Optional[str] = None
+        while True:
+            params: Dict[str, Any] = {
+                "q": query,
+                "maxResults": page_size,
+                "fields": LIST_MESSAGES_FIELDS,
+            }
+            if page_token:
+                params["pageToken"] = page_token
+            resp = await self._request("messages.list", "GET", "/messages", params=params)
+
+            for m in resp.get("messages", []):
+                yield m["id"]
+                yielded += 1
+                if max_results is not None and yielded >= max_results:
+                    return
+
+            page_token = resp.get("nextPageToken")
+            if not page_token:
+                return
+
+    async def history_message_ids(self, start_history_id: str) -> List[str]:
+        """Messages added since `start_history_id` (see GmailClient.iter_history_message_ids)."""
+        ids: List[str] = []
+        seen: set[str] = set()
+        page_token: Optional[str] = None
+        while True:
+            params: Dict[str, Any] = {
+                "startHistoryId": start_history_id,
+                "historyTypes": "messageAdded",
+                "maxResults": MAX_LIST_PAGE_SIZE,
+                "fields": HISTORY_FIELDS,
+            }
+            if page_token:
+                params["pageToken"] = page_token
+            try:
+                resp = await self._request("history.list", "GET", "/history", params=params)
+            except GmailHTTPError as exc:
+                if exc.status_code == 404:
+                    raise HistoryExpiredError(
+                        f"History cursor expired: {start_history_id}"
+                    ) from exc
+                raise
+
+            for record in resp.get("history", []):
+                for added in record.get("messagesAdded", []):
+                    msg = added.get("message") or {}
+                    mid = msg.get("id")
+                    if not mid or mid in seen:
+                        continue
+                    if SKIPPED_HISTORY_LABELS & set(msg.get("labelIds") or []):
+                        continue
+                    seen.add(mid)
+                    ids.append(mid)
+
+            page_token = resp.get("nextPageToken")
+            if not page_token:
+                return ids
+
+    async def get_message(
+        self,
+        message_id: str,
+        fmt: str = "full",
+        *,
+        metadata_headers: Optional[Sequence[str]] = None,
+        fields: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Fetch one message; a deleted/moved message raises KeyError (soft skip)."""
+        # SQLite lookups are local and short, so they run inline on the event loop.
+        cache = self._message_cache if fmt == "full" else None
+        if cache is not None:
+            cached = cache.get(message_id, fields)
+            if cached is not None:
+                # Labels are never cached; refetch them with a minimal get.
+                if wants_label_ids(fields):
+                    labels = await self.get_message(
+                        message_id, "minimal", fields=MESSAGE_LABELS_FIELDS
+                    )
+                    cached["labelIds"] = labels.get("labelIds", [])
+                return cached
+        params: List[tuple[str, str]] = [("format", fmt)]
+        if fmt == "metadata" and metadata_headers:
+            params.extend(("metadataHeaders", name) for name in metadata_headers)
+        if fields:
+            params.append(("fields", fields))
+        try:
+            msg = await self._request(
+                "messages.get", "GET", f"/messages/{message_id}", params=params
+            )
+        except GmailHTTPError as exc:
+            if exc.status_code == 404:
+                raise KeyError(f"Message not found: {message_id}") from exc
+            raise
+        if cache is not None:
+            cache.put(message_id, msg, fields)
+        return msg
+
+    async def get_messages(
+        self,
+        message_ids: Sequence[str],
+        fmt: str = "full",
+        *,
+        metadata_headers: Optional[Sequence[str]] = None,
+        fields: Optional[str] = None,
+    ) -> List[Any]:
+        """Fetch messages concurrently; same result shape as GmailClient.get_messages."""
+        return await asyncio.gather(
+            *(
+                self.get_message(mid, fmt, metadata_headers=metadata_headers, fields=fields)
+                for mid in message_ids
+            ),
+            return_exceptions=True,
+        )
+
+    async def get_profile(self, fields: Optional[str] = PROFILE_FIELDS) -> Dict[str, Any]:
+        params = {"fields": fields} if fields else None
+        return await self._request("getProfile", "GET", "/profile", params=params)
+
+    async def modify(
+        self,
+        message_id: str,
+        *,
+        add_label_ids: Sequence[str] = (),
+        remove_label_ids: Sequence[str] = (),
+    ) -> None:
+        body: Dict[str, Any] = {}
+        if add_label_ids:
+            body["addLabelIds"] = list(add_label_ids)
+        if remove_label_ids:
+            body["removeLabelIds"] = list(remove_label_ids)
+        if body:
+            await self._request(
+                "messages.modify", "POST", f"/messages/{message_id}/modify", json=body
+            )
+
+    async def batch_modify(
+        self,
+        message_ids: Sequence[str],
+        *,
+        add_label_ids: Sequence[str] = (),
+        remove_label_ids: Sequence[str] = (),
+    ) -> None:
+        if len(message_ids) > MAX_BATCH_MODIFY_IDS:
+            raise ValueError(
+                f"batchModify accepts at most {MAX_BATCH_MODIFY_IDS} ids, got {len(message_ids)}"
+            )
+        if not message_ids or not (add_label_ids or remove_label_ids):
+            return
+        body: Dict[str, Any] = {"ids": list(message_ids)}
+        if add_label_ids:
+            body["addLabelIds"] = list(add_label_ids)
+        if remove_label_ids:
+            body["removeLabelIds"] = list(remove_label_ids)
+        await self._request("messages.batchModify", "POST", "/messages/batchModify", json=body)
+
+    async def add_label(self, message_id: str, label_name: str) -> None:
+        await self._modify_labels(message_id, add=[label_name])
+
+    async def remove_label(self, message_id: str, label_name: str) -> None:
+        await self._modify_labels(message_id, remove=[label_name])
+
+    async def _modify_labels(
+        self, message_id: str, *, add: Sequence[str] = (), remove: Sequence[str] = ()
+    ) -> None:
+        """Same stale-label retry as GmailClient._modify_labels."""
+        for attempt in (1, 2):
+            add_ids = [await self.get_or_create_label_id(name) for name in add]
+            remove_ids = [await self.get_or_create_label_id(name) for name in remove]
+            try:
+                await self.modify(message_id, add_label_ids=add_ids, remove_label_ids=remove_ids)
+                return
+            except GmailHTTPError as exc:
+                if (
+                    attempt == 2
+                    or not is_missing_label_error(exc)
+                    or not await self.refresh_label_ids([*add, *remove])
+                ):
+                    raise
+
+    async def archive(self, message_id: str) -> None:
+        await self.modify(message_id, remove_label_ids=["INBOX"])
+
+    async def create_draft(self, message: EmailMessage) -> Dict[str, Any]:
+        raw_b64 = base64.urlsafe_b64encode(message.as_bytes()).decode("utf-8")
+        return await self._request(
+            "drafts.create", "POST", "/drafts", json={"message": {"raw": raw_b64}}
+        )
+
+    # -----------------------------
+    # Labels (same registry semantics as GmailClient.reconcile_labels)
+    # -----------------------------
+
+    async def reconcile_labels(self, label_names: Iterable[str] = ()) -> None:
+        if not self._labels.complete:
+            persisted = None
+            if self._cfg.label_registry_path is not None:
+                persisted = load_label_registry(self._cfg.label_registry_path)
+            if persisted is not None:
+                self._labels = persisted
+            else:
+                await self._refresh_labels()
+
+        changed = False
+        for label_name in sorted(set(label_names) | set(LABEL_COLORS)):
+            label_id = self._labels.ids.get(label_name)
+            if not label_id:
+                await self._create_label(label_name)
+                changed = True
+                continue
+            color = LABEL_COLORS.get(label_name)
+            if color and self._labels.colors.get(label_name) != color:
+                await self._request(
+                    "labels.patch", "PATCH", f"/labels/{label_id}", json={"color": color}
+                )
+                self._labels.colors[label_name] = dict(color)
+                changed = True
+
+        if changed:
+            self._persist_labels()
+
+    def cached_label_id(self, label_name: str) -> Optional[str]:
+        return self._labels.ids.get(label_name)
+
+    async def refresh_label_ids(self, label_names: Iterable[str]) -> bool:
+        """See GmailClient.refresh_label_ids."""
+        names = list(label_names)
+        before = [self._labels.ids.get(name) for name in names]
+        await self._refresh_labels()
+        return [self._labels.ids.get(name) for name in names] != before
+
+    async def get_or_create_label_id(self, label_name: str) -> str:
+        if not self._labels.complete:
+            await self._refresh_labels()
+        label_id = self._labels.ids.get(label_name)
+        if label_id:
+            return label_id
+        label_id = await self._create_label(label_name)
+        self._persist_labels()
+        return label_id
+
+    async def _refresh_labels(self) -> None:
+        resp = await self._request(
+            "labels.list", "GET", "/labels", params={"fields": LIST_LABELS_FIELDS}
+        )
+        self._labels = LabelRegistry.from_labels(resp.get("labels", []))
+        self._persist_labels()
+
+    async def _create_label(self, label_name: str) -> str:
+        body: Dict[str, Any] = {
+            "name": label_name,
+            "labelListVisibility": "labelShow",
+            "messageListVisibility": "show",
+        }
+        color = LABEL_COLORS.get(label_name)
+        if color:
+            body["color"] = color
+        try:
+            created = await self._request("labels.create", "POST", "/labels", json=body)
+        except GmailHTTPError as exc:
+            # 409: the label exists but our (possibly persisted) registry is stale.
+            if exc.status_code == 409:
+                await self._refresh_labels()
+                label_id = self._labels.ids.get(label_name)
+                if label_id:
+                    return label_id
+            raise
+        self._labels.ids[label_name] = created["id"]
+        if color:
+            self._labels.colors[label_name] = dict(color)
+        return created["id"]
+
+    def _persist_labels(self) -> None:
+        if self._cfg.label_registry_path is not None:
+            save_label_registry(self._cfg.label_registry_path, self._labels)
+
+
+class BlockingGmailBridge:
+    """
+    Sync facade over AsyncGmailClient for the action executor and its handlers, which
+    run in a worker thread.
+
+    Calls are scheduled on the client's event loop, so the connection pool, quota budget
+    and retry policy stay shared with the async pipeline.
+    """
+
+    def __init__(self, client: AsyncGmailClient, loop: asyncio.AbstractEventLoop) -> None:
+        self._client = client
+        self._loop = loop
+
+    def _run(self, coro: Any) -> Any:
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def get_message(self, message_id: str, fmt: str = "full", **kwargs: Any) -> Dict[str, Any]:
+        return self._run(self._client.get_message(message_id, fmt, **kwargs))
+
+    def cached_label_id(self, label_name: str) -> Optional[str]:
+        return self._client.cached_label_id(label_name)
+
+    def get_or_create_label_id(self, label_name: str) -> str:
+        return self._run(self._client.get_or_create_label_id(label_name))
+
+    def refresh_label_ids(self, label_names: Iterable[str]) -> bool:
+        return self._run(self._client.refresh_label_ids(label_names))
+
+    def batch_modify(
+        self,
+        message_ids: Sequence[str],
+        *,
+        add_label_ids: Sequence[str] = (),
+        remove_label_ids: Sequence[str] = (),
+    ) -> None:
+        self._run(
+            self._client.batch_modify(
+                message_ids, add_label_ids=add_label_ids, remove_label_ids=remove_label_ids
+            )
+        )
+
+    def add_label(self, message_id: str, label_name: str) -> None:
+        self._run(self._client.add_label(message_id, label_name))
+
+    def remove_label(self, message_id: str, label_name: str) -> None:
+        self._run(self._client.remove_label(message_id, label_name))
+
+    def archive(self, message_id: str) -> None:
+        self._run(self._client.archive(message_id))
+
+    def create_draft(self, message: EmailMessage) -> Dict[str, Any]:
+        return self._run(self._client.create_draft(message))
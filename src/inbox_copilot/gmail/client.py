@@ -1,18 +1,37 @@
 from __future__ import annotations
 
 import base64
+import time
 from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
 from email.message import EmailMessage
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from threading import Lock
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
 
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
 from inbox_copilot.gmail.LabelColors import LABEL_COLORS
+from inbox_copilot.gmail.discovery import build_gmail_service
+from inbox_copilot.gmail.fields import (
+    HISTORY_FIELDS,
+    LIST_LABELS_FIELDS,
+    LIST_MESSAGES_FIELDS,
+    MESSAGE_LABELS_FIELDS,
+    PROFILE_FIELDS,
+)
+from inbox_copilot.gmail.rate_limit import DEFAULT_UNITS_PER_SECOND, QuotaRateLimiter
+from inbox_copilot.retry import GMAIL_CREATE, GMAIL_READ, GMAIL_WRITE, Retrier
+from inbox_copilot.storage.message_cache import MessageCache, wants_label_ids
+from inbox_copilot.gmail.label_registry import (
+    LabelRegistry,
+    is_missing_label_error,
+    load_label_registry,
+    save_label_registry,
+)
 
 # `gmail.modify` is required for labeling/archiving/draft actions.
 SCOPES = [
@@ -20,6 +39,36 @@ SCOPES = [
     "https://www.googleapis.com/auth/gmail.readonly",
 ]
 
+# Gmail caps `messages.list` at 500 results per page.
+MAX_LIST_PAGE_SIZE = 500
+# Gmail's batch endpoint accepts at most 100 sub-requests per HTTP call.
+MAX_BATCH_SIZE = 100
+# users.messages.batchModify accepts at most 1,000 message IDs per call.
+MAX_BATCH_MODIFY_IDS = 1000
+# Methods that change mailbox state (retried under the gmail_write policy).
+WRITE_METHODS = frozenset(
+    {"messages.modify", "messages.batchModify", "labels.create", "labels.patch", "drafts.create"}
+)
+# Writes that create a duplicate when repeated after an ambiguous failure, so they are
+# only retried when Gmail rejected them (gmail_create policy). labels.create is safe to
+# repeat: a duplicate name fails with 409 and is resolved from labels.list.
+CREATE_METHODS = frozenset({"drafts.create"})
+# History records for these labels are never processed (the query path excludes them too).
+SKIPPED_HISTORY_LABELS = frozenset({"DRAFT", "SPAM", "TRASH"})
+# Access tokens are refreshed once they are this close to expiry, not on every connect.
+TOKEN_REFRESH_MARGIN = timedelta(minutes=5)
+
+
+def gmail_call_type(method: str) -> str:
+    """Retry policy (call type) for a Gmail API method."""
+    if method in CREATE_METHODS:
+        return GMAIL_CREATE
+    return GMAIL_WRITE if method in WRITE_METHODS else GMAIL_READ
+
+
+class HistoryExpiredError(RuntimeError):
+    """The stored historyId is too old (or invalid) for users.history.list."""
+
 
 @dataclass(frozen=True)
 class GmailClientConfig:
@@ -29,45 +78,144 @@ class GmailClientConfig:
     token_path: Path
     # Gmail userId, "me" refers to the authenticated user.
     user_id: str = "me"
+    # Optional persisted label registry so the next run can skip labels.list.
+    label_registry_path: Optional[Path] = None
+    # Client-side quota budget in Gmail units/second (None disables rate limiting).
+    quota_units_per_second: Optional[float] = DEFAULT_UNITS_PER_SECOND
+    # Optional SQLite cache of full message resources shared across runs and tools.
+    message_cache_path: Optional[Path] = None
+
+
+# Credentials already loaded in this process, keyed by token file.
+_credentials_cache: Dict[Path, Credentials] = {}
+_credentials_lock = Lock()
+
+
+def _expires_soon(creds: Credentials) -> bool:
+    if not creds.token:
+        return True
+    if creds.expiry is None:
+        return False
+    # google-auth keeps `expiry` as a naive UTC datetime.
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    return creds.expiry - now <= TOKEN_REFRESH_MARGIN
+
+
+def load_credentials(cfg: GmailClientConfig) -> Credentials:
+    """
+    Load cached OAuth credentials, refreshing or logging in interactively if needed.
+
+    Credentials stay in memory for the life of the process, so repeated connects skip
+    the token file; the token is refreshed (and the file rewritten) only near expiry.
+    """
+    with _credentials_lock:
+        creds = _credentials_cache.get(cfg.token_path)
+        if creds is None and cfg.token_path.exists():
+            creds = Credentials.from_authorized_user_file(str(cfg.token_path), SCOPES)
+
+        if creds is None or _expires_soon(creds):
+            if creds and creds.refresh_token:
+                creds.refresh(Request())
+            else:
+                flow = InstalledAppFlow.from_client_secrets_file(
+                    str(cfg.credentials_path),
+                    SCOPES,
+                )
+                # Use local server OAuth flow for installed apps.
+                creds = flow.run_local_server(port=0)
+
+            # Save the credentials for the next run.
+            cfg.token_path.parent.mkdir(parents=True, exist_ok=True)
+            cfg.token_path.write_text(creds.to_json(), encoding="utf-8")
+
+        _credentials_cache[cfg.token_path] = creds
+        return creds
 
 
 class GmailClient:
-    def __init__(self, cfg: GmailClientConfig):
+    def __init__(self, cfg: GmailClientConfig, retrier: Optional[Retrier] = None):
         self._cfg = cfg
+        # Transient 429/5xx failures are retried with backoff instead of failing the message.
+        self._retrier = retrier or Retrier()
         self._creds: Optional[Credentials] = None
         self._service = None
+        self._connect_stats: Dict[str, float] = {}
 
         # Cache label name -> label id to avoid repeated API calls.
-        self._label_cache: Dict[str, str] = {}
+        self._labels = LabelRegistry()
+        # Shared with forked clients so all worker threads draw from one quota budget.
+        self._limiter: Optional[QuotaRateLimiter] = (
+            QuotaRateLimiter(cfg.quota_units_per_second) if cfg.quota_units_per_second else None
+        )
+        # Opened on connect() and shared with forked clients.
+        self._message_cache: Optional[MessageCache] = None
 
     def connect(self) -> None:
         """Create an authenticated Gmail API service client."""
-        creds = None
+        started = time.perf_counter()
+        creds = load_credentials(self._cfg)
+        self._creds = creds
+        loaded = time.perf_counter()
+        self._service = build_gmail_service(creds)
+        finished = time.perf_counter()
+        self._connect_stats = {
+            "credentials_s": round(loaded - started, 4),
+            "service_s": round(finished - loaded, 4),
+            "total_s": round(finished - started, 4),
+        }
 
-        if self._cfg.token_path.exists():
-            creds = Credentials.from_authorized_user_file(str(self._cfg.token_path), SCOPES)
+        # Clear label cache after (re)connect to avoid stale mappings.
+        self._labels.clear()
+        if self._message_cache is None and self._cfg.message_cache_path is not None:
+            self._message_cache = MessageCache(self._cfg.message_cache_path)
 
-        # If there are no (valid) credentials available, let the user log in.
-        if not creds or not creds.valid:
-            if creds and creds.expired and creds.refresh_token:
-                creds.refresh(Request())
-            else:
-                flow = InstalledAppFlow.from_client_secrets_file(
-                    str(self._cfg.credentials_path),
-                    SCOPES,
-                )
-                # Use local server OAuth flow for installed apps.
-                creds = flow.run_local_server(port=0)
+    def fork(self) -> "GmailClient":
+        """
+        Return a connected client with its own service and HTTP transport.
 
-            # Save the credentials for the next run.
-            self._cfg.token_path.parent.mkdir(parents=True, exist_ok=True)
-            self._cfg.token_path.write_text(creds.to_json(), encoding="utf-8")
+        `googleapiclient` services (httplib2) are not thread-safe, so every worker
+        thread needs its own. Credentials are reused, so no new login is triggered.
+        """
+        if self._creds is None:
+            raise RuntimeError("GmailClient is not connected. Call connect() first.")
+        clone = GmailClient(self._cfg, retrier=self._retrier)
+        clone._creds = self._creds
+        clone._service = build_gmail_service(self._creds)
+        clone._labels = self._labels.copy()
+        clone._limiter = self._limiter
+        clone._message_cache = self._message_cache
+        return clone
 
-        self._creds = creds
-        self._service = build("gmail", "v1", credentials=creds)
+    def _charge(self, method: str, count: int = 1) -> None:
+        # Block until the call fits into the per-user quota budget.
+        if self._limiter is not None:
+            self._limiter.acquire(method, count)
 
-        # Clear label cache after (re)connect to avoid stale mappings.
-        self._label_cache.clear()
+    def _execute(self, method: str, request: Any) -> Any:
+        # Every attempt is charged, since Gmail bills retried calls as well.
+        call_type = gmail_call_type(method)
+
+        def attempt() -> Any:
+            self._charge(method)
+            return request.execute()
+
+        return self._retrier.call(call_type, attempt)
+
+    def connect_stats(self) -> Dict[str, float]:
+        """Latency of the last connect(): credential loading, service build and total."""
+        return dict(self._connect_stats)
+
+    def retry_stats(self) -> Dict[str, Any]:
+        """Retry attempts and backoff time so far (shared with forked clients)."""
+        return self._retrier.snapshot()
+
+    def message_cache_stats(self) -> Dict[str, Any]:
+        """Message cache hits/misses and size (empty when no cache is configured)."""
+        return self._message_cache.stats() if self._message_cache is not None else {}
+
+    def quota_usage(self) -> Dict[str, Any]:
+        """Quota units charged so far (across forked clients) and throttling time."""
+        return self._limiter.snapshot() if self._limiter is not None else {}
 
     @property
     def service(self) -> Any:
@@ -80,68 +228,389 @@ class GmailClient:
         List message IDs matching a Gmail search query.
         Example query: 'newer_than:7d in:inbox -category:promotions'
         """
-        resp = (
-            self.service.users()
-            .messages()
-            .list(userId=self._cfg.user_id, q=query, maxResults=max_results)
-            .execute()
-        )
-        msgs = resp.get("messages", [])
-        return [m["id"] for m in msgs]
+        return list(self.iter_message_ids(query=query, max_results=max_results))
+
+    def iter_message_ids(
+        self,
+        query: str = "",
+        *,
+        max_results: Optional[int] = None,
+        page_size: int = MAX_LIST_PAGE_SIZE,
+    ) -> Iterator[str]:
+        """
+        Lazily yield message IDs matching a Gmail search query, following page tokens.
 
-    def get_message(self, message_id: str, fmt: str = "full") -> Dict[str, Any]:
+        The next page is only requested once the caller has consumed the current one,
+        so payload loading can start while later pages are still being listed.
+        max_results: Optional overall cap; None means "all matching messages".
+        """
+        page_size = max(1, min(page_size, MAX_LIST_PAGE_SIZE))
+        if max_results is not None:
+            if max_results <= 0:
+                return
+            page_size = min(page_size, max_results)
+
+        yielded = 0
+        page_token: Optional[str] = None
+        while True:
+            params: Dict[str, Any] = {
+                "userId": self._cfg.user_id,
+                "q": query,
+                "maxResults": page_size,
+                "fields": LIST_MESSAGES_FIELDS,
+            }
+            if page_token:
+                params["pageToken"] = page_token
+            resp = self._execute("messages.list", self.service.users().messages().list(**params))
+
+            for m in resp.get("messages", []):
+                yield m["id"]
+                yielded += 1
+                if max_results is not None and yielded >= max_results:
+                    return
+
+            page_token = resp.get("nextPageToken")
+            if not page_token:
+                return
+
+    def iter_history_message_ids(self, start_history_id: str) -> Iterator[str]:
+        """
+        Yield IDs of messages added since `start_history_id`, following page tokens.
+
+        Drafts, spam and trash are skipped to mirror the search-query path.
+        Raises HistoryExpiredError if Gmail no longer has history for the cursor.
+        """
+        seen: set[str] = set()
+        page_token: Optional[str] = None
+        while True:
+            params: Dict[str, Any] = {
+                "userId": self._cfg.user_id,
+                "startHistoryId": start_history_id,
+                "historyTypes": ["messageAdded"],
+                "maxResults": MAX_LIST_PAGE_SIZE,
+                "fields": HISTORY_FIELDS,
+            }
+            if page_token:
+                params["pageToken"] = page_token
+            try:
+                resp = self._execute("history.list", self.service.users().history().list(**params))
+            except HttpError as exc:
+                if getattr(exc, "resp", None) and exc.resp.status == 404:
+                    raise HistoryExpiredError(
+                        f"History cursor expired: {start_history_id}"
+                    ) from exc
+                raise
+
+            for record in resp.get("history", []):
+                for added in record.get("messagesAdded", []):
+                    msg = added.get("message") or {}
+                    mid = msg.get("id")
+                    if not mid or mid in seen:
+                        continue
+                    if SKIPPED_HISTORY_LABELS & set(msg.get("labelIds") or []):
+                        continue
+                    seen.add(mid)
+                    yield mid
+
+            page_token = resp.get("nextPageToken")
+            if not page_token:
+                return
+
+    def get_message(
+        self,
+        message_id: str,
+        fmt: str = "full",
+        *,
+        metadata_headers: Optional[Sequence[str]] = None,
+        fields: Optional[str] = None,
+    ) -> Dict[str, Any]:
         """
         Fetch a full message resource.
         fmt: 'full' | 'metadata' | 'minimal' | 'raw'
+        metadata_headers: With fmt='metadata', only return these headers.
+        fields: Partial-response mask (see gmail.fields); None returns the whole resource.
+
+        Full resources are served from and stored in the message cache, if configured.
+        The cache holds no labels: a hit refetches labelIds with a minimal get.
         """
+        cache = self._message_cache if fmt == "full" else None
+        if cache is not None:
+            cached = cache.get(message_id, fields)
+            if cached is not None:
+                if wants_label_ids(fields):
+                    labels = self.get_message(message_id, "minimal", fields=MESSAGE_LABELS_FIELDS)
+                    cached["labelIds"] = labels.get("labelIds", [])
+                return cached
         try:
-            return (
-                self.service.users()
-                .messages()
-                .get(userId=self._cfg.user_id, id=message_id, format=fmt)
-                .execute()
+            msg = self._execute(
+                "messages.get", self._get_request(message_id, fmt, metadata_headers, fields)
             )
         except HttpError as exc:
-            # Treat deleted/moved messages as a soft skip for incremental runs.
-            if getattr(exc, "resp", None) and exc.resp.status == 404:
-                raise KeyError(f"Message not found: {message_id}") from exc
-            raise
-
-    def get_profile(self) -> Dict[str, Any]:
-        """Get the Gmail profile of the authenticated user."""
-        return self.service.users().getProfile(userId=self._cfg.user_id).execute()
+            raise self._soft_skip_error(exc, message_id) from exc
+        if cache is not None:
+            cache.put(message_id, msg, fields)
+        return msg
+
+    def get_messages(
+        self,
+        message_ids: Sequence[str],
+        fmt: str = "full",
+        *,
+        metadata_headers: Optional[Sequence[str]] = None,
+        fields: Optional[str] = None,
+        batch_size: int = MAX_BATCH_SIZE,
+    ) -> List[Any]:
+        """
+        Fetch many message resources through the Gmail batch endpoint.
+
+        Returns one entry per input ID, in input order. Failed items hold the exception
+        instead of a resource: a `KeyError` for deleted/moved messages (same soft skip as
+        `get_message`), otherwise the original error. Items that failed transiently
+        (429/5xx inside the batch) are re-batched with backoff before giving up.
+        Full resources found in the message cache are not requested again; only their
+        labelIds are, in minimal batch gets (labels change, so they are never cached).
+        """
+        cache = self._message_cache if fmt == "full" else None
+        if cache is None:
+            return self._fetch_messages(message_ids, fmt, metadata_headers, fields, batch_size)
+
+        cached: Dict[str, Any] = cache.get_many(message_ids, fields)
+        if cached and wants_label_ids(fields):
+            hit_ids = list(cached)
+            fresh = self._fetch_messages(
+                hit_ids, "minimal", None, MESSAGE_LABELS_FIELDS, batch_size
+            )
+            for mid, labels in zip(hit_ids, fresh):
+                # A failed refresh (e.g. KeyError: deleted since cached) replaces the hit.
+                cached[mid] = (
+                    labels
+                    if isinstance(labels, Exception)
+                    else {**cached[mid], "labelIds": labels.get("labelIds", [])}
+                )
+        missing = [mid for mid in message_ids if mid not in cached]
+        fetched = self._fetch_messages(missing, fmt, metadata_headers, fields, batch_size)
+        cache.put_many(
+            ((mid, msg) for mid, msg in zip(missing, fetched) if not isinstance(msg, Exception)),
+            fields,
+        )
+        by_id = dict(zip(missing, fetched))
+        return [cached[mid] if mid in cached else by_id[mid] for mid in message_ids]
+
+    def _fetch_messages(
+        self,
+        message_ids: Sequence[str],
+        fmt: str,
+        metadata_headers: Optional[Sequence[str]],
+        fields: Optional[str],
+        batch_size: int,
+    ) -> List[Any]:
+        batch_size = max(1, min(batch_size, MAX_BATCH_SIZE))
+        results: List[Any] = [None] * len(message_ids)
+
+        def on_response(request_id: str, response: Any, exception: Optional[Exception]) -> None:
+            index = int(request_id)
+            if exception is None:
+                results[index] = response
+            else:
+                results[index] = self._soft_skip_error(exception, message_ids[index])
+
+        def run_batch(indices: List[int]) -> None:
+            # Sub-requests are billed individually, the batch envelope itself is free.
+            self._charge("messages.get", len(indices))
+            batch = self.service.new_batch_http_request(callback=on_response)
+            for index in indices:
+                batch.add(
+                    self._get_request(message_ids[index], fmt, metadata_headers, fields),
+                    request_id=str(index),
+                )
+            batch.execute()
+
+        pending = list(range(len(message_ids)))
+        attempt = 1
+        while pending:
+            for start in range(0, len(pending), batch_size):
+                chunk = pending[start:start + batch_size]
+                self._retrier.call(GMAIL_READ, lambda: run_batch(chunk))
+
+            failed = [i for i in pending if isinstance(results[i], Exception)]
+            delays = [self._retrier.delay_for(GMAIL_READ, attempt, results[i]) for i in failed]
+            retry = [i for i, delay in zip(failed, delays) if delay is not None]
+            if not retry:
+                break
+            self._retrier.wait(GMAIL_READ, max(d for d in delays if d is not None))
+            pending = retry
+            attempt += 1
+        return results
+
+    def _get_request(
+        self,
+        message_id: str,
+        fmt: str,
+        metadata_headers: Optional[Sequence[str]],
+        fields: Optional[str] = None,
+    ) -> Any:
+        params: Dict[str, Any] = {"userId": self._cfg.user_id, "id": message_id, "format": fmt}
+        if fmt == "metadata" and metadata_headers:
+            params["metadataHeaders"] = list(metadata_headers)
+        if fields:
+            params["fields"] = fields
+        return self.service.users().messages().get(**params)
+
+    @staticmethod
+    def _soft_skip_error(exc: Exception, message_id: str) -> Exception:
+        # Treat deleted/moved messages as a soft skip for incremental runs.
+        if isinstance(exc, HttpError) and getattr(exc, "resp", None) and exc.resp.status == 404:
+            error = KeyError(f"Message not found: {message_id}")
+            error.__cause__ = exc
+            return error
+        return exc
+
+    def get_profile(self, fields: Optional[str] = PROFILE_FIELDS) -> Dict[str, Any]:
+        """Get the Gmail profile of the authenticated user (emailAddress and historyId)."""
+        params: Dict[str, Any] = {"userId": self._cfg.user_id}
+        if fields:
+            params["fields"] = fields
+        return self._execute("getProfile", self.service.users().getProfile(**params))
 
     def remove_label(self, message_id: str, label_name: str) -> None:
-        label_id = self.get_or_create_label_id(label_name)
-        self.service.users().messages().modify(
-            userId=self._cfg.user_id,
-            id=message_id,
-            body={"removeLabelIds": [label_id]},
-        ).execute()
+        self._modify_labels(message_id, remove=[label_name])
+
+    def _modify_labels(
+        self, message_id: str, *, add: Sequence[str] = (), remove: Sequence[str] = ()
+    ) -> None:
+        """messages.modify by label name, retried once if a registry label ID went stale."""
+        for attempt in (1, 2):
+            body: Dict[str, Any] = {}
+            if add:
+                body["addLabelIds"] = [self.get_or_create_label_id(name) for name in add]
+            if remove:
+                body["removeLabelIds"] = [self.get_or_create_label_id(name) for name in remove]
+            try:
+                self._execute(
+                    "messages.modify",
+                    self.service.users().messages().modify(
+                        userId=self._cfg.user_id, id=message_id, body=body
+                    ),
+                )
+                return
+            except HttpError as exc:
+                if (
+                    attempt == 2
+                    or not is_missing_label_error(exc)
+                    or not self.refresh_label_ids([*add, *remove])
+                ):
+                    raise
+
+    def archive(self, message_id: str) -> None:
+        """Archive a message (remove it from the inbox)."""
+        self._execute(
+            "messages.modify",
+            self.service.users().messages().modify(
+                userId=self._cfg.user_id,
+                id=message_id,
+                body={"removeLabelIds": ["INBOX"]},
+            ),
+        )
+
+    def batch_modify(
+        self,
+        message_ids: Sequence[str],
+        *,
+        add_label_ids: Sequence[str] = (),
+        remove_label_ids: Sequence[str] = (),
+    ) -> None:
+        """Apply the same label changes (by id) to up to 1,000 messages in one call."""
+        if len(message_ids) > MAX_BATCH_MODIFY_IDS:
+            raise ValueError(
+                f"batchModify accepts at most {MAX_BATCH_MODIFY_IDS} ids, got {len(message_ids)}"
+            )
+        if not message_ids or not (add_label_ids or remove_label_ids):
+            return
+        body: Dict[str, Any] = {"ids": list(message_ids)}
+        if add_label_ids:
+            body["addLabelIds"] = list(add_label_ids)
+        if remove_label_ids:
+            body["removeLabelIds"] = list(remove_label_ids)
+        self._execute(
+            "messages.batchModify",
+            self.service.users().messages().batchModify(userId=self._cfg.user_id, body=body),
+        )
 
     # -----------------------------
     # Label helpers (name -> id)
     # -----------------------------
 
+    def reconcile_labels(self, label_names: Iterable[str] = ()) -> None:
+        """
+        Make sure `label_names` and all colored labels exist with the expected colors.
+
+        Costs one labels.list (skipped when a fresh persisted registry exists), one create
+        per missing label and one patch per color that differs. Afterwards name -> id
+        lookups are served from memory for the rest of the connection.
+        """
+        if not self._labels.complete:
+            persisted = None
+            if self._cfg.label_registry_path is not None:
+                persisted = load_label_registry(self._cfg.label_registry_path)
+            if persisted is not None:
+                self._labels = persisted
+            else:
+                self._refresh_label_cache()
+
+        changed = False
+        for label_name in sorted(set(label_names) | set(LABEL_COLORS)):
+            label_id = self._labels.ids.get(label_name)
+            if not label_id:
+                self._create_label(label_name)
+                changed = True
+            elif self._update_label_color(label_id, label_name):
+                changed = True
+
+        if changed:
+            self._persist_labels()
+
+    def _persist_labels(self) -> None:
+        if self._cfg.label_registry_path is not None:
+            save_label_registry(self._cfg.label_registry_path, self._labels)
+
     def _refresh_label_cache(self) -> None:
         """Fetch all labels once and cache them by name."""
-        resp = self.service.users().labels().list(userId=self._cfg.user_id).execute()
-        labels = resp.get("labels", [])
-        self._label_cache = {lbl["name"]: lbl["id"] for lbl in labels}
+        resp = self._execute(
+            "labels.list",
+            self.service.users().labels().list(userId=self._cfg.user_id, fields=LIST_LABELS_FIELDS),
+        )
+        self._labels = LabelRegistry.from_labels(resp.get("labels", []))
+        self._persist_labels()
 
     def _get_label_id(self, label_name: str) -> Optional[str]:
         """Return label id if known, otherwise None."""
-        if not self._label_cache:
+        if not self._labels.complete:
             self._refresh_label_cache()
-        return self._label_cache.get(label_name)
+        return self._labels.ids.get(label_name)
+
+    def refresh_label_ids(self, label_names: Iterable[str]) -> bool:
+        """
+        Reload the registry after Gmail rejected a label ID (see is_missing_label_error).
+        True if any of `label_names` now maps to a different ID or is gone (and will be
+        recreated), i.e. retrying the rejected call can succeed.
+        """
+        names = list(label_names)
+        before = [self._labels.ids.get(name) for name in names]
+        self._refresh_label_cache()
+        return [self._labels.ids.get(name) for name in names] != before
+
+    def cached_label_id(self, label_name: str) -> Optional[str]:
+        """Label id from the in-memory registry only (None if unknown, never a Gmail call)."""
+        return self._labels.ids.get(label_name)
 
     def get_or_create_label_id(self, label_name: str) -> str:
+        # Colors are reconciled once in reconcile_labels(), not on every lookup.
         label_id = self._get_label_id(label_name)
         if label_id:
-            # Keep colors consistent for known labels.
-            self._update_label_color(label_id, label_name)
             return label_id
-        return self._create_label(label_name)
+        label_id = self._create_label(label_name)
+        self._persist_labels()
+        return label_id
 
     def _create_label(self, label_name: str) -> str:
         body = {
@@ -155,45 +624,53 @@ class GmailClient:
         if color:
             body["color"] = color
 
-        created = (
-            self.service.users()
-            .labels()
-            .create(userId=self._cfg.user_id, body=body)
-            .execute()
-        )
+        try:
+            created = self._execute(
+                "labels.create",
+                self.service.users().labels().create(userId=self._cfg.user_id, body=body),
+            )
+        except HttpError as exc:
+            # 409: the label exists but our (possibly persisted) registry is stale.
+            if getattr(exc, "resp", None) and exc.resp.status == 409:
+                self._refresh_label_cache()
+                label_id = self._labels.ids.get(label_name)
+                if label_id:
+                    return label_id
+            raise
 
         label_id = created["id"]
-        self._label_cache[label_name] = label_id
+        self._labels.ids[label_name] = label_id
+        if color:
+            self._labels.colors[label_name] = dict(color)
         return label_id
 
-    def _update_label_color(self, label_id: str, label_name: str) -> None:
+    def _update_label_color(self, label_id: str, label_name: str) -> bool:
+        """Patch the label color if it differs from LABEL_COLORS; True if patched."""
         color = LABEL_COLORS.get(label_name)
-        if not color:
-            return
-
-        self.service.users().labels().patch(
-            userId=self._cfg.user_id,
-            id=label_id,
-            body={"color": color},
-        ).execute()
+        if not color or self._labels.colors.get(label_name) == color:
+            return False
+
+        self._execute(
+            "labels.patch",
+            self.service.users().labels().patch(
+                userId=self._cfg.user_id,
+                id=label_id,
+                body={"color": color},
+            ),
+        )
+        self._labels.colors[label_name] = dict(color)
+        return True
 
     def add_label(self, message_id: str, label_name: str) -> None:
         """Add a label (by name) to a message."""
-        label_id = self.get_or_create_label_id(label_name)
-        self.service.users().messages().modify(
-            userId=self._cfg.user_id,
-            id=message_id,
-            body={"addLabelIds": [label_id]},
-        ).execute()
+        self._modify_labels(message_id, add=[label_name])
 
     def create_draft(self, message: EmailMessage) -> Dict[str, Any]:
         """Create a Gmail draft from an EmailMessage and return the API response."""
         raw_bytes = message.as_bytes()
         raw_b64 = base64.urlsafe_b64encode(raw_bytes).decode("utf-8")
         body = {"message": {"raw": raw_b64}}
-        return (
-            self.service.users()
-            .drafts()
-            .create(userId=self._cfg.user_id, body=body)
-            .execute()
+        return self._execute(
+            "drafts.create",
+            self.service.users().drafts().create(userId=self._cfg.user_id, body=body),
         )
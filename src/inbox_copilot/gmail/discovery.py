@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import json
+from threading import Lock
+from typing import Any, Dict, Optional
+
+from googleapiclient import discovery_cache
+from googleapiclient.discovery import build, build_from_document
+
+# Parsed Gmail v1 discovery document, shared by every service built in this process.
+_document: Optional[Dict[str, Any]] = None
+# build_from_document() normalizes the document in place, so builds are serialized.
+_build_lock = Lock()
+
+
+def gmail_discovery_document() -> Optional[Dict[str, Any]]:
+    """
+    The Gmail v1 discovery document bundled with google-api-python-client.
+
+    It is versioned together with the installed library, so no network fetch or on-disk
+    cache invalidation is needed. Returns None if this library version ships no copy.
+    """
+    global _document
+    if _document is None:
+        raw = discovery_cache.get_static_doc("gmail", "v1")
+        if raw is None:
+            return None
+        _document = json.loads(raw)
+    return _document
+
+
+def build_gmail_service(credentials: Any) -> Any:
+    """Build a Gmail service without re-reading and re-parsing the discovery document."""
+    with _build_lock:
+        document = gmail_discovery_document()
+        if document is None:
+            return build("gmail", "v1", credentials=credentials)
+        return build_from_document(document, credentials=credentials)
@@ -0,0 +1,24 @@
+from __future__ import annotations
+
+# Partial-response masks passed as `fields=` so Gmail only returns what we read
+# (https://developers.google.com/gmail/api/guides/performance#partial-response).
+
+# messages.list / history.list / labels.list / getProfile, as consumed by the clients.
+LIST_MESSAGES_FIELDS = "messages/id,nextPageToken"
+HISTORY_FIELDS = "history/messagesAdded/message(id,labelIds),nextPageToken"
+LIST_LABELS_FIELDS = "labels(id,name,color)"
+PROFILE_FIELDS = "emailAddress,historyId"
+
+# Body parts as read by parsing.parser.extract_body_from_payload. A mask cannot recurse,
+# so three levels are spelled out (the innermost `parts` returns whole subtrees).
+_PARTS = "parts(mimeType,body/data,parts(mimeType,body/data,parts))"
+
+# Headers, snippet and body text: what analysis and draft hydration read.
+MESSAGE_CONTENT_FIELDS = f"snippet,payload(mimeType,headers,body/data,{_PARTS})"
+# Metadata pass of the metadata-first fetch (format=metadata carries no body parts).
+MESSAGE_METADATA_FIELDS = "id,internalDate,labelIds,snippet,payload/headers"
+# Everything mail_from_message() reads to build a NormalizedEmail.
+MESSAGE_MAIL_FIELDS = f"id,internalDate,labelIds,{MESSAGE_CONTENT_FIELDS}"
+
+# Label refresh for messages served from the message cache (labels are never cached).
+MESSAGE_LABELS_FIELDS = "id,labelIds"
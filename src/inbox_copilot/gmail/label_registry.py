@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import json
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Optional
+
+from inbox_copilot.retry import _status_of
+from inbox_copilot.storage.state import atomic_write_text
+
+# Persisted registries older than this are ignored (labels may have been edited in Gmail).
+DEFAULT_MAX_AGE_S = 24 * 60 * 60
+
+
+@dataclass
+class LabelRegistry:
+    """Label name -> id (and color) map, reconciled once per connection."""
+
+    ids: Dict[str, str] = field(default_factory=dict)
+    colors: Dict[str, Dict[str, str]] = field(default_factory=dict)
+    # True once labels.list has been applied (or a fresh persisted copy was loaded).
+    complete: bool = False
+
+    @classmethod
+    def from_labels(cls, labels: list[dict]) -> "LabelRegistry":
+        """Build a registry from a users.labels.list response."""
+        registry = cls(complete=True)
+        for lbl in labels:
+            registry.ids[lbl["name"]] = lbl["id"]
+            if lbl.get("color"):
+                registry.colors[lbl["name"]] = dict(lbl["color"])
+        return registry
+
+    def copy(self) -> "LabelRegistry":
+        return LabelRegistry(
+            ids=dict(self.ids),
+            colors={name: dict(color) for name, color in self.colors.items()},
+            complete=self.complete,
+        )
+
+    def clear(self) -> None:
+        self.ids.clear()
+        self.colors.clear()
+        self.complete = False
+
+
+def is_missing_label_error(exc: BaseException) -> bool:
+    """
+    Gmail's answer to a modify/batchModify naming a label ID that no longer exists
+    (400 "Invalid label", or 404), e.g. a label deleted in Gmail that a persisted
+    registry still maps. A 404 may also mean a deleted message, so callers only retry
+    when reloading the registry actually changed a label ID.
+    """
+    return _status_of(exc) in (400, 404)
+
+
+def load_label_registry(
+    path: Path, *, max_age_s: float = DEFAULT_MAX_AGE_S
+) -> Optional[LabelRegistry]:
+    """Load a persisted registry, or None if it is missing, unreadable or too old."""
+    if not path.exists():
+        return None
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, UnicodeDecodeError, json.JSONDecodeError):
+        return None
+    if time.time() - float(data.get("saved_at") or 0) > max_age_s:
+        return None
+    return LabelRegistry(
+        ids=dict(data.get("ids") or {}),
+        colors=dict(data.get("colors") or {}),
+        complete=True,
+    )
+
+
+def save_label_registry(path: Path, registry: LabelRegistry) -> None:
+    # Atomic: forked clients and concurrent processes may save at the same time, and
+    # readers must never see a half-written file.
+    payload = {"saved_at": time.time(), "ids": registry.ids, "colors": registry.colors}
+    atomic_write_text(path, json.dumps(payload, indent=2))
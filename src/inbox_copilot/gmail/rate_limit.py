@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from threading import Lock
+from typing import Any, Callable, Dict
+
+# Gmail per-method quota cost in units (https://developers.google.com/gmail/api/reference/quota).
+GMAIL_QUOTA_UNITS: Dict[str, int] = {
+    "messages.list": 5,
+    "messages.get": 5,
+    "messages.modify": 5,
+    "messages.batchModify": 50,
+    "history.list": 2,
+    "labels.list": 1,
+    "labels.create": 5,
+    "labels.patch": 5,
+    "drafts.create": 10,
+    "getProfile": 1,
+}
+
+# Gmail allows 250 quota units per user per second (moving average).
+DEFAULT_UNITS_PER_SECOND = 250.0
+
+
+class QuotaRateLimiter:
+    """
+    Thread-safe token bucket measured in Gmail quota units.
+
+    Each call reserves its cost up front; if the bucket runs into debt the caller sleeps
+    until the debt is paid back, so concurrent workers share one budget fairly.
+    """
+
+    def __init__(
+        self,
+        units_per_second: float = DEFAULT_UNITS_PER_SECOND,
+        *,
+        burst: float | None = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        if units_per_second <= 0:
+            raise ValueError("units_per_second must be positive")
+        self.units_per_second = float(units_per_second)
+        self.capacity = float(burst if burst is not None else units_per_second)
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = Lock()
+        self._tokens = self.capacity
+        self._last = clock()
+        self._started = self._last
+        self._units_used = 0
+        self._calls = 0
+        self._throttled_s = 0.0
+
+    def acquire(self, method: str, count: int = 1) -> None:
+        """Charge `count` calls of `method`, blocking while over budget."""
+        wait = self.reserve(method, count)
+        if wait > 0:
+            self._sleep(wait)
+
+    async def acquire_async(self, method: str, count: int = 1) -> None:
+        """Like acquire(), but yields to the event loop instead of blocking the thread."""
+        wait = self.reserve(method, count)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def reserve(self, method: str, count: int = 1) -> float:
+        """Charge the calls and return how long the caller has to wait before sending."""
+        units = GMAIL_QUOTA_UNITS.get(method, 5) * count
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.units_per_second)
+            self._last = now
+            self._tokens -= units
+            wait = -self._tokens / self.units_per_second if self._tokens < 0 else 0.0
+            self._units_used += units
+            self._calls += count
+            self._throttled_s += wait
+        return wait
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Usage so far, including the share of the budget consumed since creation."""
+        with self._lock:
+            elapsed = max(self._clock() - self._started, 1e-9)
+            budget = self.units_per_second * elapsed
+            return {
+                "units_used": self._units_used,
+                "calls": self._calls,
+                "throttled_s": round(self._throttled_s, 3),
+                "units_per_second": self.units_per_second,
+                "budget_used_pct": round(min(100.0, 100.0 * self._units_used / budget), 1),
+            }
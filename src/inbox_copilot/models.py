@@ -14,6 +14,8 @@ class NormalizedEmail:
     internal_date_ms: int
     headers: Dict[str, str] = field(default_factory=dict)
     label_ids: List[str] = field(default_factory=list)
+    # False when body_text is only the snippet (metadata-only fetch or empty body).
+    has_full_body: bool = True
 
 
 @dataclass(frozen=True)
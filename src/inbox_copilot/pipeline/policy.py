@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import List
+from typing import Callable, Iterable, List, Optional
 
 from inbox_copilot.models import EmailAnalysis
 from inbox_copilot.rules.core import Action, ActionType
@@ -48,3 +48,30 @@ def actions_from_analysis(analysis: EmailAnalysis, message_id: str) -> List[Acti
         )
 
     return actions
+
+
+def drop_satisfied_actions(
+    actions: List[Action],
+    label_ids: Iterable[str],
+    resolve_label_id: Callable[[str], Optional[str]],
+) -> List[Action]:
+    """
+    Remove label/archive actions the message's current `label_ids` already satisfy.
+
+    `resolve_label_id` maps a label name to its ID (None if unknown); actions on labels
+    that cannot be resolved are kept, since their state cannot be checked. `label_ids`
+    must come from Gmail, not a stored copy: the message cache refetches them on every
+    hit, so resources from GmailClient.get_message(s) qualify.
+    """
+    current = set(label_ids)
+    planned: List[Action] = []
+    for action in actions:
+        if action.type == ActionType.ARCHIVE:
+            if "INBOX" not in current:
+                continue
+        elif action.type in (ActionType.ADD_LABEL, ActionType.REMOVE_LABEL) and action.label_name:
+            label_id = resolve_label_id(action.label_name)
+            if label_id is not None and (label_id in current) == (action.type == ActionType.ADD_LABEL):
+                continue
+        planned.append(action)
+    return planned
@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from threading import Lock
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Call types with their own retry policy.
+GMAIL_READ = "gmail_read"
+GMAIL_WRITE = "gmail_write"
+# Writes that are not idempotent (a repeat creates a duplicate), e.g. drafts.create.
+GMAIL_CREATE = "gmail_create"
+OPENAI = "openai"
+
+# HTTP statuses that are worth retrying within the same run.
+TRANSIENT_STATUSES = frozenset({408, 429, 500, 502, 503, 504})
+# Gmail signals per-user rate limiting with 403 + one of these reasons.
+_RATE_LIMIT_REASONS = ("rateLimitExceeded", "userRateLimitExceeded")
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    # Total attempts including the first one.
+    max_attempts: int = 5
+    base_delay_s: float = 1.0
+    max_delay_s: float = 32.0
+    # Upper bound for server-provided Retry-After values.
+    max_retry_after_s: float = 120.0
+    # Also retry failures after which the call may have been applied anyway (timeouts,
+    # dropped connections, 5xx). Off for non-idempotent calls: only rejections retry.
+    retry_ambiguous: bool = True
+
+
+DEFAULT_RETRY_POLICIES: Dict[str, RetryPolicy] = {
+    GMAIL_READ: RetryPolicy(),
+    GMAIL_WRITE: RetryPolicy(max_attempts=4),
+    GMAIL_CREATE: RetryPolicy(max_attempts=4, retry_ambiguous=False),
+    OPENAI: RetryPolicy(max_attempts=4, base_delay_s=2.0, max_delay_s=60.0),
+}
+
+
+def _status_of(exc: BaseException) -> Optional[int]:
+    # googleapiclient HttpError exposes .resp.status, openai APIStatusError .status_code.
+    resp = getattr(exc, "resp", None)
+    status = getattr(resp, "status", None) if resp is not None else None
+    if status is None:
+        status = getattr(exc, "status_code", None)
+    try:
+        return int(status) if status is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def is_transient(exc: BaseException) -> bool:
+    """True for rate limiting, server errors and dropped connections."""
+    if isinstance(exc, (ConnectionError, TimeoutError)):
+        return True
+    status = _status_of(exc)
+    if status in TRANSIENT_STATUSES:
+        return True
+    if status == 403:
+        return any(reason in str(exc) for reason in _RATE_LIMIT_REASONS)
+    # openai.APIConnectionError / APITimeoutError carry no status code.
+    return type(exc).__name__ in ("APIConnectionError", "APITimeoutError")
+
+
+def is_rejected(exc: BaseException) -> bool:
+    """True for rate limiting: the server refused the call without applying it."""
+    status = _status_of(exc)
+    if status == 429:
+        return True
+    return status == 403 and any(reason in str(exc) for reason in _RATE_LIMIT_REASONS)
+
+
+def retry_after_s(exc: BaseException) -> Optional[float]:
+    """Seconds requested by a Retry-After header, if the error carries one."""
+    headers: Any = getattr(exc, "resp", None)
+    if headers is None:
+        response = getattr(exc, "response", None)
+        headers = getattr(response, "headers", None)
+    if headers is None:
+        return None
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class Retrier:
+    """
+    Capped exponential backoff with full jitter, per call type.
+
+    Thread-safe: one instance is shared by the Gmail worker clients and the OpenAI
+    handler, so `snapshot()` covers the whole run.
+    """
+
+    def __init__(
+        self,
+        policies: Optional[Dict[str, RetryPolicy]] = None,
+        *,
+        sleep: Callable[[float], None] = time.sleep,
+        rand: Callable[[], float] = random.random,
+    ) -> None:
+        self.policies = {**DEFAULT_RETRY_POLICIES, **(policies or {})}
+        self._sleep = sleep
+        self._rand = rand
+        self._lock = Lock()
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def policy(self, call_type: str) -> RetryPolicy:
+        return self.policies.get(call_type) or RetryPolicy()
+
+    def delay_for(self, call_type: str, attempt: int, exc: BaseException) -> Optional[float]:
+        """Backoff before retry number `attempt` (1-based), or None to give up."""
+        policy = self.policy(call_type)
+        if attempt >= policy.max_attempts or not is_transient(exc):
+            return None
+        if not policy.retry_ambiguous and not is_rejected(exc):
+            return None
+        requested = retry_after_s(exc)
+        if requested is not None:
+            return min(requested, policy.max_retry_after_s)
+        cap = min(policy.max_delay_s, policy.base_delay_s * (2 ** (attempt - 1)))
+        return cap * self._rand()
+
+    def wait(self, call_type: str, delay: float) -> None:
+        """Sleep for a retry and record it in the metrics."""
+        self._record(call_type, delay)
+        self._sleep(delay)
+
+    async def wait_async(self, call_type: str, delay: float) -> None:
+        self._record(call_type, delay)
+        await asyncio.sleep(delay)
+
+    def _record(self, call_type: str, delay: float) -> None:
+        with self._lock:
+            stats = self._stats.setdefault(call_type, {"retries": 0, "backoff_s": 0.0})
+            stats["retries"] += 1
+            stats["backoff_s"] += delay
+
+    def call(self, call_type: str, fn: Callable[[], T]) -> T:
+        """Run `fn`, retrying transient failures according to the call type's policy."""
+        attempt = 1
+        while True:
+            try:
+                return fn()
+            except Exception as exc:
+                delay = self.delay_for(call_type, attempt, exc)
+                if delay is None:
+                    raise
+                self.wait(call_type, delay)
+                attempt += 1
+
+    async def call_async(self, call_type: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """Async variant of call(): backoff sleeps yield to the event loop."""
+        attempt = 1
+        while True:
+            try:
+                return await fn()
+            except Exception as exc:
+                delay = self.delay_for(call_type, attempt, exc)
+                if delay is None:
+                    raise
+                await self.wait_async(call_type, delay)
+                attempt += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Retry attempts and total backoff time, overall and per call type."""
+        with self._lock:
+            by_type = {
+                call_type: {"retries": int(s["retries"]), "backoff_s": round(s["backoff_s"], 3)}
+                for call_type, s in self._stats.items()
+            }
+        return {
+            "retries": sum(s["retries"] for s in by_type.values()),
+            "backoff_s": round(sum(s["backoff_s"] for s in by_type.values()), 3),
+            "by_type": by_type,
+        }
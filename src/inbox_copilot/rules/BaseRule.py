@@ -1,12 +1,13 @@
 from __future__ import annotations
 
-import re
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
 from typing import Iterable, Sequence
 
 # Adjust imports to your project
-from inbox_copilot.rules.core import MailItem, Action
+from inbox_copilot.rules.core import MailFeatures, MailItem, Action
+from inbox_copilot.rules.matcher import phrase_matcher
+from inbox_copilot.rules.patterns import RULE_PATTERNS, RulePattern
 
 
 @dataclass(frozen=True)
@@ -35,6 +36,14 @@ class BaseRule(ABC):
     # If True and the rule matches, the orchestrator may stop evaluating remaining rules
     stop_processing: bool = False
 
+    # False if match() only looks at sender and subject, so the body cannot change it
+    reads_body: bool = True
+
+    # What classify_email reports when this rule wins (category defaults to the name)
+    category: str = ""
+    labels: tuple[str, ...] = ()
+    confidence: float = 0.5
+
     def __repr__(self) -> str:
         return f"{self.__class__.__name__}(name={self.name!r}, priority={self.priority})"
 
@@ -44,27 +53,49 @@ class BaseRule(ABC):
         """Normalize text for matching (None-safe, lowercased)."""
         return (s or "").lower()
 
+    def features(self, mail: MailItem) -> MailFeatures:
+        """Normalized text of `mail` (shared, if the caller already built MailFeatures)."""
+        return MailFeatures.from_mail(mail)
+
     def header(self, mail: MailItem, name: str) -> str:
         """Get a header value normalized (lowercased)."""
+        if name == "Subject":
+            return self.subject(mail)
+        if name == "From":
+            return self.sender(mail)
         return self.norm(mail.headers.get(name))
 
     def subject(self, mail: MailItem) -> str:
-        return self.header(mail, "Subject")
+        return self.features(mail).subject
 
     def sender(self, mail: MailItem) -> str:
-        return self.header(mail, "From")
+        return self.features(mail).sender
+
+    def sender_domain(self, mail: MailItem) -> str:
+        return self.features(mail).sender_domain
 
     def snippet(self, mail: MailItem) -> str:
-        return self.norm(mail.snippet)
+        return self.features(mail).body
 
-    def contains_any(self, text: str | None, needles: Sequence[str]) -> bool:
-        """True if any needle is a substring of text (case-insensitive)."""
-        t = self.norm(text)
-        return any(n.lower() in t for n in needles)
+    def haystack(self, mail: MailItem) -> str:
+        """Subject, sender and body, normalized and joined by newlines."""
+        return self.features(mail).haystack
 
-    def regex(self, text: str | None, pattern: str) -> bool:
-        """Regex search on text (case-insensitive)."""
-        return bool(re.search(pattern, self.norm(text), flags=re.IGNORECASE))
+    def tokens(self, mail: MailItem) -> frozenset[str]:
+        return self.features(mail).tokens
+
+    def contains_any(self, text: str | None, needles: Sequence[str]) -> bool:
+        """True if any needle is a substring of text (case-insensitive, one pass over text)."""
+        return phrase_matcher(tuple(needles)).search(self.norm(text))
+
+    def regex(self, text: str | None, pattern: str | RulePattern) -> bool:
+        """
+        Regex search on text; string patterns are compiled once. Case-insensitivity comes
+        from the pattern flags (IGNORECASE by default), so the text is not copied.
+        """
+        if isinstance(pattern, str):
+            pattern = RULE_PATTERNS.for_source(pattern)
+        return pattern.search(text or "") is not None
 
     def any_header_contains(self, mail: MailItem, header_names: Sequence[str], needles: Sequence[str]) -> bool:
         """True if any of the given headers contains any needle."""
@@ -85,6 +116,19 @@ class BaseRule(ABC):
         """Yield actions to apply if match() is True."""
         raise NotImplementedError
 
+    # --- Classification result (see classify_email) ---
+
+    def labels_for(self, reason: str) -> Sequence[str]:
+        """Gmail labels suggested for a match with `reason`."""
+        return self.labels
+
+    def emitted_labels(self) -> Sequence[str]:
+        """Every label labels_for() can return (reconciled in Gmail before a run)."""
+        return self.labels
+
+    def match_note(self, reason: str) -> str:
+        return f"Matched rule: {self.name}"
+
     # Optional structured match (nice for debugging / logging later)
     def match_info(self, mail: MailItem) -> RuleMatch:
         """Default implementation: wrap match() in RuleMatch."""
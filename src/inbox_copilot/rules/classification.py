@@ -1,9 +1,10 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import List
+from typing import List, Optional, Tuple
 
-from inbox_copilot.rules.rules import GoogleSecurityAlertRule, JobAlertRule, NewsletterRule
+from inbox_copilot.rules.BaseRule import BaseRule
+from inbox_copilot.rules.registry import RULE_REGISTRY, RuleRegistry
 
 
 @dataclass(frozen=True)
@@ -15,26 +16,25 @@ class RuleResult:
     reason: str | None = None
 
 
-def classify_email(*, subject: str, from_email: str, body_text: str) -> RuleResult:
+def classify_email(
+    *,
+    subject: str,
+    from_email: str,
+    body_text: str,
+    registry: Optional[RuleRegistry] = None,
+) -> RuleResult:
     """
     Lightweight classification using the rule engine.
     Returns a neutral result that can be turned into actions by a policy layer.
     """
-    # Build a minimal MailItem-like object for the rules.
+    # Build a minimal MailItem for the rules, with its normalized text computed once.
     mail = _make_mail_item(subject=subject, from_email=from_email, body_text=body_text)
 
-    rules = [
-        GoogleSecurityAlertRule(),
-        NewsletterRule(),
-        JobAlertRule(),
-    ]
-    # Higher priority rules win when multiple could match.
-    rules = sorted(rules, key=lambda r: r.priority, reverse=True)
-
-    for rule in rules:
-        matched, reason = rule.match(mail)
-        if matched:
-            return _result_from_rule(rule.name, reason)
+    # Higher priority rules win when multiple could match (order resolved at registration).
+    match = (registry or RULE_REGISTRY).classify(mail)
+    if match is not None:
+        rule, reason = match
+        return _result_from_rule(rule, reason)
 
     return RuleResult(
         category="no_fit",
@@ -45,58 +45,49 @@ def classify_email(*, subject: str, from_email: str, body_text: str) -> RuleResu
     )
 
 
-def _result_from_rule(rule_name: str, reason: str) -> RuleResult:
-    if rule_name == "google_security_alert":
-        return RuleResult(
-            category="security",
-            labels=["Security"],
-            confidence=0.9,
-            notes=[f"Matched rule: {rule_name}"],
-            reason=reason,
-        )
-    if rule_name == "newsletter":
-        return RuleResult(
-            category="newsletter",
-            labels=["Newsletter"],
-            confidence=0.7,
-            notes=[f"Matched rule: {rule_name}"],
-            reason=reason,
-        )
-    if rule_name == "job_application":
-        label_suffix = _job_label_suffix(reason)
-        return RuleResult(
-            category="job_application",
-            labels=["Applications", f"Applications/{label_suffix}"],
-            confidence=0.85,
-            notes=[f"Matched rule: {rule_name} ({reason})"],
-            reason=reason,
-        )
+def needs_body(
+    *, subject: str, from_email: str, registry: Optional[RuleRegistry] = None
+) -> bool:
+    """False if the rules settle the mail on sender and subject alone."""
+    mail = _make_mail_item(subject=subject, from_email=from_email, body_text="")
+    return not (registry or RULE_REGISTRY).decided_without_body(mail)
+
 
+def _result_from_rule(rule: BaseRule, reason: str) -> RuleResult:
     return RuleResult(
-        category="no_fit",
-        labels=[],
-        confidence=0.2,
-        notes=[f"Unknown rule: {rule_name}"],
+        category=rule.category or rule.name,
+        labels=list(rule.labels_for(reason)),
+        confidence=rule.confidence,
+        notes=[rule.match_note(reason)],
         reason=reason,
     )
 
 
-def _job_label_suffix(reason: str) -> str:
-    # Map fine-grained reasons into a Gmail label hierarchy.
-    mapping = {
-        JobAlertRule.CONFIRM_REASON: "Confirmation",
-        JobAlertRule.INTERVIEW_REASON: "Interview",
-        JobAlertRule.REJECT_REASON: "Rejection",
-        JobAlertRule.NOFIT_REASON: "NoFit",
-    }
-    return mapping.get(reason, reason or "Unknown")
+# Bump when classification or policy code changes. Changes to the registered rules
+# (swaps, priorities, labels, phrases, patterns) are covered by the registry fingerprint;
+# see rules_version().
+RULES_VERSION = "1"
+
+
+def rules_version(registry: Optional[RuleRegistry] = None) -> str:
+    """
+    Version recorded with each processed mail: RULES_VERSION plus the rule registry's
+    fingerprint, so mails already in the processed ledger are handled again by later
+    runs once either changes.
+    """
+    return f"{RULES_VERSION}.{(registry or RULE_REGISTRY).fingerprint}"
+
+
+def emitted_labels(registry: Optional[RuleRegistry] = None) -> Tuple[str, ...]:
+    """Every label classify_email can suggest (used to reconcile Gmail labels up front)."""
+    return (registry or RULE_REGISTRY).emitted_labels
 
 
 def _make_mail_item(*, subject: str, from_email: str, body_text: str):
     # Import locally to avoid dependency cycles in type checking.
-    from inbox_copilot.rules.core import MailItem
+    from inbox_copilot.rules.core import MailFeatures
 
-    return MailItem(
+    return MailFeatures(
         id="analysis-only",
         thread_id=None,
         headers={"Subject": subject, "From": from_email},
@@ -1,6 +1,9 @@
 from __future__ import annotations
-from dataclasses import dataclass
-from typing import Iterable, Protocol, Optional, Literal, Dict
+import re
+from dataclasses import dataclass, field
+from email.utils import parseaddr
+from functools import cached_property
+from typing import FrozenSet, Iterable, Protocol, Optional, Literal, Dict
 from enum import Enum
 
 
@@ -13,6 +16,54 @@ class MailItem:
     internal_date_ms: int
 
 
+_TOKEN_RE = re.compile(r"\w+")
+
+
+@dataclass(frozen=True)
+class MailFeatures(MailItem):
+    """
+    A MailItem plus its normalized (lowercased) text, computed once per mail.
+
+    classify_email hands this to every rule, so the BaseRule helpers read shared strings
+    instead of lowercasing and copying the subject, sender and body again per rule.
+    """
+
+    subject: str = field(init=False)
+    sender: str = field(init=False)
+    sender_domain: str = field(init=False)
+    body: str = field(init=False)
+    # Subject, sender and body joined by newlines (what multi-field phrase scans read).
+    haystack: str = field(init=False)
+
+    def __post_init__(self) -> None:
+        subject = (self.headers.get("Subject") or "").lower()
+        sender = (self.headers.get("From") or "").lower()
+        body = (self.snippet or "").lower()
+        domain = parseaddr(sender)[1].rpartition("@")[2]
+        object.__setattr__(self, "subject", subject)
+        object.__setattr__(self, "sender", sender)
+        object.__setattr__(self, "sender_domain", domain)
+        object.__setattr__(self, "body", body)
+        object.__setattr__(self, "haystack", f"{subject}\n{sender}\n{body}")
+
+    @classmethod
+    def from_mail(cls, mail: MailItem) -> "MailFeatures":
+        if isinstance(mail, MailFeatures):
+            return mail
+        return cls(
+            id=mail.id,
+            thread_id=mail.thread_id,
+            headers=mail.headers,
+            snippet=mail.snippet,
+            internal_date_ms=mail.internal_date_ms,
+        )
+
+    @cached_property
+    def tokens(self) -> FrozenSet[str]:
+        """Distinct words of the haystack (built on first use)."""
+        return frozenset(_TOKEN_RE.findall(self.haystack))
+
+
 class ActionType(str, Enum):
     PRINT = "print"
     ADD_LABEL = "add_label"
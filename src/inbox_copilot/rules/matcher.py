@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+from collections import deque
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List, Mapping, Optional, Tuple
+
+
+class PhraseMatcher:
+    """
+    Aho-Corasick automaton over named phrase tables.
+
+    Built once from `{table_name: phrases}`; `scan(text)` then reports every table with at
+    least one phrase occurring in `text` (plain substring semantics, overlaps included) in
+    a single pass, so the cost is linear in the text length however many phrases there
+    are. Phrases are lowercased at build time; callers pass already normalized text.
+    """
+
+    def __init__(self, tables: Mapping[str, Iterable[str]]) -> None:
+        goto: List[Dict[str, int]] = [{}]
+        found: List[set[str]] = [set()]
+        for table, phrases in tables.items():
+            for phrase in phrases:
+                state = 0
+                for ch in phrase.lower():
+                    nxt = goto[state].get(ch)
+                    if nxt is None:
+                        goto.append({})
+                        found.append(set())
+                        nxt = goto[state][ch] = len(goto) - 1
+                    state = nxt
+                if state:
+                    found[state].add(table)
+
+        # Breadth-first: fold failure links into full transition tables (a DFA), so
+        # scanning takes exactly one dict lookup per character.
+        fail = [0] * len(goto)
+        delta: List[Dict[str, int]] = [dict(goto[0])] + [{} for _ in goto[1:]]
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            delta[state] = {**delta[fail[state]], **goto[state]}
+            for ch, nxt in goto[state].items():
+                fail[nxt] = delta[fail[state]].get(ch, 0)
+                found[nxt] |= found[fail[nxt]]
+                queue.append(nxt)
+
+        self._delta = delta
+        self._found: List[Optional[FrozenSet[str]]] = [
+            frozenset(tables_hit) if tables_hit else None for tables_hit in found
+        ]
+
+    def scan(self, text: str) -> FrozenSet[str]:
+        """Names of the tables with at least one phrase in `text`."""
+        state = 0
+        delta = self._delta
+        found = self._found
+        hits: set[str] = set()
+        for ch in text:
+            state = delta[state].get(ch, 0)
+            if found[state] is not None:
+                hits |= found[state]
+        return frozenset(hits)
+
+    def search(self, text: str) -> bool:
+        """True as soon as any phrase occurs in `text`."""
+        state = 0
+        delta = self._delta
+        found = self._found
+        for ch in text:
+            state = delta[state].get(ch, 0)
+            if found[state] is not None:
+                return True
+        return False
+
+
+@lru_cache(maxsize=256)
+def phrase_matcher(phrases: Tuple[str, ...]) -> PhraseMatcher:
+    """Shared single-table matcher for an ad-hoc phrase list (built on first use)."""
+    return PhraseMatcher({"": phrases})
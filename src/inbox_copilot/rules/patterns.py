@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, List, Optional
+
+# Ad-hoc patterns (see PatternRegistry.for_source) kept compiled at once, like re's cache.
+MAX_AD_HOC_PATTERNS = 256
+
+
+class _Counters:
+    __slots__ = ("calls", "hits", "time_s")
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.hits = 0
+        self.time_s = 0.0
+
+
+def _counters_since(
+    counters: Dict[str, Any], earlier: Optional[Dict[str, Any]]
+) -> Dict[str, Any]:
+    # An ad-hoc pattern evicted and compiled again restarts from zero.
+    if earlier is None or counters["calls"] < earlier["calls"]:
+        return counters
+    return {
+        "calls": counters["calls"] - earlier["calls"],
+        "hits": counters["hits"] - earlier["hits"],
+        "time_s": round(counters["time_s"] - earlier["time_s"], 6),
+    }
+
+
+class RulePattern:
+    """
+    A rule regex compiled once, counting calls and hits (and, when `timed`, time spent).
+
+    Counters are per thread, so searching takes no lock; timing costs two clock reads
+    per search and is off unless enabled through PatternRegistry.set_timed().
+    """
+
+    def __init__(
+        self, name: str, pattern: str, flags: int = re.IGNORECASE, *, timed: bool = False
+    ) -> None:
+        self.name = name
+        self.flags = flags
+        self.regex = re.compile(pattern, flags)
+        self.timed = timed
+        self._local = threading.local()
+        # One entry per thread that ever searched (worker pools are bounded).
+        self._counters: List[_Counters] = []
+        self._lock = Lock()
+
+    def _thread_counters(self) -> _Counters:
+        counters = self._local.counters = _Counters()
+        with self._lock:
+            self._counters.append(counters)
+        return counters
+
+    def search(self, text: str) -> Optional[re.Match[str]]:
+        try:
+            counters = self._local.counters
+        except AttributeError:
+            counters = self._thread_counters()
+        if self.timed:
+            started = time.perf_counter()
+            found = self.regex.search(text)
+            counters.time_s += time.perf_counter() - started
+        else:
+            found = self.regex.search(text)
+        counters.calls += 1
+        if found is not None:
+            counters.hits += 1
+        return found
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = list(self._counters)
+        return {
+            "calls": sum(c.calls for c in counters),
+            "hits": sum(c.hits for c in counters),
+            "time_s": round(sum(c.time_s for c in counters), 6),
+        }
+
+
+class PatternRegistry:
+    """
+    Named, precompiled rule patterns. Rules register theirs at class definition, so
+    matching never goes through the bounded `re` module cache; `snapshot()` shows which
+    patterns are searched most, and with set_timed(True) which dominate classification
+    time.
+    """
+
+    def __init__(self, *, max_ad_hoc: int = MAX_AD_HOC_PATTERNS) -> None:
+        self._patterns: Dict[str, RulePattern] = {}
+        # Least recently used first; bounded, unlike the named patterns.
+        self._ad_hoc: OrderedDict[str, RulePattern] = OrderedDict()
+        self.max_ad_hoc = max_ad_hoc
+        self._timed = False
+        self._lock = Lock()
+
+    def register(self, name: str, pattern: str, flags: int = re.IGNORECASE) -> RulePattern:
+        with self._lock:
+            existing = self._patterns.get(name)
+            if existing is not None:
+                if (existing.regex.pattern, existing.flags) != (pattern, flags):
+                    raise ValueError(f"Rule pattern {name!r} is already registered differently")
+                return existing
+            compiled = self._patterns[name] = RulePattern(name, pattern, flags, timed=self._timed)
+            return compiled
+
+    def for_source(self, pattern: str) -> RulePattern:
+        """Pattern for an ad-hoc regex string (kept under its own source, LRU-bounded)."""
+        with self._lock:
+            found = self._patterns.get(pattern)
+            if found is not None:
+                return found
+            found = self._ad_hoc.get(pattern)
+            if found is not None:
+                self._ad_hoc.move_to_end(pattern)
+                return found
+            compiled = self._ad_hoc[pattern] = RulePattern(pattern, pattern, timed=self._timed)
+            if len(self._ad_hoc) > self.max_ad_hoc:
+                self._ad_hoc.popitem(last=False)
+            return compiled
+
+    def set_timed(self, enabled: bool) -> None:
+        """Time every search (two clock reads each) for this and later patterns."""
+        with self._lock:
+            self._timed = enabled
+            for pattern in (*self._patterns.values(), *self._ad_hoc.values()):
+                pattern.timed = enabled
+
+    def snapshot(
+        self, since: Optional[Dict[str, Dict[str, Any]]] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Per-pattern counters, most expensive (or most used) first: since process start, or
+        since the earlier snapshot `since` (then only patterns searched in between).
+        """
+        with self._lock:
+            patterns = [*self._patterns.values(), *self._ad_hoc.values()]
+        stats = {pattern.name: pattern.snapshot() for pattern in patterns}
+        if since is not None:
+            stats = {
+                name: _counters_since(counters, since.get(name))
+                for name, counters in stats.items()
+            }
+            stats = {name: counters for name, counters in stats.items() if counters["calls"]}
+        ranked = sorted(
+            stats.items(), key=lambda item: (item[1]["time_s"], item[1]["calls"]), reverse=True
+        )
+        return dict(ranked)
+
+
+RULE_PATTERNS = PatternRegistry()
+
+
+def rule_pattern(name: str, pattern: str, flags: int = re.IGNORECASE) -> RulePattern:
+    """Compile and register a rule pattern in the shared registry."""
+    return RULE_PATTERNS.register(name, pattern, flags)
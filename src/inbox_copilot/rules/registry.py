@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import hashlib
+from threading import Lock
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+
+from inbox_copilot.rules.BaseRule import BaseRule
+from inbox_copilot.rules.core import MailItem
+from inbox_copilot.rules.patterns import RulePattern
+from inbox_copilot.rules.rules import GoogleSecurityAlertRule, JobAlertRule, NewsletterRule
+
+# (rule, its bound match method, stop_processing) in evaluation order.
+_Step = Tuple[BaseRule, Callable[[MailItem], Tuple[bool, str]], bool]
+
+# Rule attribute values that go into the registry fingerprint (phrase tables, reasons...).
+_SETTING_TYPES = (str, int, float, bool, tuple, list, frozenset, set)
+
+
+def _rule_settings(rule: BaseRule) -> Tuple[Any, ...]:
+    """A rule's class plus its public data attributes (class and instance), patterns as source."""
+    settings: dict[str, Any] = {}
+    for klass in reversed(type(rule).__mro__):
+        settings.update(vars(klass))
+    settings.update(vars(rule))
+    parts: List[Any] = [f"{type(rule).__module__}.{type(rule).__qualname__}"]
+    for key, value in sorted(settings.items()):
+        if key.startswith("_"):
+            continue
+        if isinstance(value, RulePattern):
+            parts.append((key, value.regex.pattern, value.flags))
+        elif isinstance(value, (frozenset, set)):
+            parts.append((key, sorted(map(repr, value))))
+        elif isinstance(value, dict):
+            parts.append((key, sorted(map(repr, value.items()))))
+        elif isinstance(value, _SETTING_TYPES):
+            parts.append((key, value))
+    return tuple(parts)
+
+
+class RuleRegistry:
+    """
+    Rule set with its evaluation order resolved once, not per mail.
+
+    Rules run by descending priority (registration order breaks ties). Registering,
+    removing or swapping rules rebuilds the plan; readers always see a complete one, so
+    rules can be changed while other threads classify. `fingerprint` changes whenever the
+    rule set does, so the processed ledger can tell which rules handled a mail.
+    """
+
+    def __init__(self, rules: Iterable[BaseRule] = ()) -> None:
+        self._rules: List[BaseRule] = []
+        self._plan: Tuple[_Step, ...] = ()
+        self._fingerprint = ""
+        self._emitted_labels: Tuple[str, ...] = ()
+        self._lock = Lock()
+        self.replace(rules)
+
+    def register(self, rule: BaseRule) -> BaseRule:
+        """Add `rule`, replacing a registered rule with the same name."""
+        with self._lock:
+            self._rules = [r for r in self._rules if r.name != rule.name] + [rule]
+            self._build()
+        return rule
+
+    def unregister(self, name: str) -> None:
+        with self._lock:
+            self._rules = [r for r in self._rules if r.name != name]
+            self._build()
+
+    def replace(self, rules: Iterable[BaseRule]) -> None:
+        """Swap in a whole new rule set."""
+        with self._lock:
+            self._rules = list(rules)
+            self._build()
+
+    def _build(self) -> None:
+        # sorted() is stable, so equal priorities keep their registration order.
+        ordered = sorted(self._rules, key=lambda r: r.priority, reverse=True)
+        self._plan = tuple((rule, rule.match, rule.stop_processing) for rule in ordered)
+        settings = repr([_rule_settings(rule) for rule in ordered])
+        self._fingerprint = hashlib.sha256(settings.encode("utf-8")).hexdigest()[:12]
+        self._emitted_labels = tuple(
+            dict.fromkeys(label for rule in ordered for label in rule.emitted_labels())
+        )
+
+    @property
+    def order(self) -> Tuple[BaseRule, ...]:
+        return tuple(step[0] for step in self._plan)
+
+    @property
+    def emitted_labels(self) -> Tuple[str, ...]:
+        """Every label a registered rule can suggest, without duplicates."""
+        return self._emitted_labels
+
+    @property
+    def fingerprint(self) -> str:
+        """Hash of the rules in evaluation order: classes, priorities, phrases, patterns."""
+        return self._fingerprint
+
+    def classify(self, mail: MailItem) -> Optional[Tuple[BaseRule, str]]:
+        """The highest-priority matching rule and its reason, or None."""
+        for rule, match, _stop in self._plan:
+            matched, reason = match(mail)
+            if matched:
+                return rule, reason
+        return None
+
+    def decided_without_body(self, mail: MailItem) -> bool:
+        """
+        True if the body cannot change classify(mail): the matching rule and every rule
+        evaluated before it ignore the body (see BaseRule.reads_body).
+        """
+        for rule, match, _stop in self._plan:
+            if rule.reads_body:
+                return False
+            matched, _reason = match(mail)
+            if matched:
+                return True
+        return False
+
+    def matches(self, mail: MailItem) -> List[Tuple[BaseRule, str]]:
+        """Every matching rule in evaluation order, up to the first stop_processing match."""
+        found: List[Tuple[BaseRule, str]] = []
+        for rule, match, stop in self._plan:
+            matched, reason = match(mail)
+            if matched:
+                found.append((rule, reason))
+                if stop:
+                    break
+        return found
+
+
+def default_rules() -> List[BaseRule]:
+    return [GoogleSecurityAlertRule(), NewsletterRule(), JobAlertRule()]
+
+
+# The rule set classify_email uses; register or swap rules here instead of editing it (each
+# rule brings its own category and labels, see BaseRule.labels_for).
+RULE_REGISTRY = RuleRegistry(default_rules())
@@ -1,16 +1,21 @@
 from __future__ import annotations
 
-import re
-from typing import Iterable
+from typing import Iterable, Sequence
 
 from inbox_copilot.rules.core import MailItem, Action, ActionType
 from inbox_copilot.rules.BaseRule import BaseRule   
+from inbox_copilot.rules.matcher import PhraseMatcher
+from inbox_copilot.rules.patterns import rule_pattern
 
 
 
 class GoogleSecurityAlertRule(BaseRule):
     name = "google_security_alert"
     priority = 100
+    reads_body = False
+    category = "security"
+    labels = ("Security",)
+    confidence = 0.9
 
     def match(self, mail: MailItem) -> tuple[bool, str]:
         from_ = self.sender(mail)
@@ -42,6 +47,13 @@ class GoogleSecurityAlertRule(BaseRule):
 class NewsletterRule(BaseRule):
     name = "newsletter"
     priority = 10
+    category = "newsletter"
+    labels = ("Newsletter",)
+    confidence = 0.7
+
+    UNSUBSCRIBE_PATTERN = rule_pattern(
+        "newsletter.unsubscribe", r"\b(unsubscribe|abbestellen|newsletter)\b"
+    )
 
     def match(self, mail: MailItem) -> tuple[bool, str]:
         from_ = self.sender(mail)
@@ -49,7 +61,7 @@ class NewsletterRule(BaseRule):
         snip = self.snippet(mail)
         sender_signal = self.contains_any(from_, ["newsletter", "mailchimp", "substack", "getrevue"])
         subject_signal = self.contains_any(subj, ["newsletter", "weekly", "digest", "roundup"])
-        unsubscribe_signal = self.regex(snip, r"\b(unsubscribe|abbestellen|newsletter)\b")
+        unsubscribe_signal = self.regex(snip, self.UNSUBSCRIBE_PATTERN)
         # Bare no-reply addresses are often transactional; require stronger signals.
         matched = sender_signal or subject_signal or unsubscribe_signal
         return matched, "NEWSLETTER"
@@ -70,6 +82,16 @@ class JobAlertRule(BaseRule):
 
     name = "job_application"
     priority = 50
+    category = "job_application"
+    confidence = 0.85
+
+    # Fine-grained reasons map into a Gmail label hierarchy below "Applications".
+    LABEL_SUFFIXES = {
+        CONFIRM_REASON: "Confirmation",
+        INTERVIEW_REASON: "Interview",
+        REJECT_REASON: "Rejection",
+        NOFIT_REASON: "NoFit",
+    }
 
     # Strong "we got your application" signals
     CONFIRM_PHRASES = (
@@ -217,79 +239,90 @@ class JobAlertRule(BaseRule):
         "successfactors",
     )
 
-    def match(self, mail: MailItem) -> tuple[bool, str]:
-        subj = self.subject(mail)
-        from_ = self.sender(mail)
-        snip = self.snippet(mail)
+    # One automaton over all tables above: a single pass over the mail finds every table hit.
+    PHRASES = PhraseMatcher({
+        "confirm": CONFIRM_PHRASES,
+        "rejection": REJECTION_PHRASES,
+        "interview": INTERVIEW_PHRASES,
+        "recruiting": RECRUITING_WORDS,
+        "direct": DIRECT_APPLICATION_SIGNALS,
+        "application_doc": APPLICATION_DOC_WORDS,
+        "ats": ATS_MARKERS,
+    })
+
+    # Regex fallbacks, compiled once. Alternatives that lead to the same outcome are
+    # fused into one pattern, so a single search answers all of them.
+    ROLE_PATTERN = rule_pattern(
+        "job.role", r"\b(m/w/d|junior|senior|data engineer|software|entwickler)\b"
+    )
+    CONFIRM_FALLBACK_PATTERN = rule_pattern(
+        "job.confirm_fallback",
+        r"\b(?:be)?dank\w*\b.*\bbewerb\w*\b"
+        r"|\bbewerb\w*\b.*\b(?:be)?dank\w*\b"
+        r"|\breceiv\w*\b.*\bapplicat\w*\b"
+        r"|\bapplicat\w*\b.*\breceiv\w*\b",
+    )
+    INTERVIEW_WORD_PATTERN = rule_pattern(
+        "job.interview_word", r"\b(interview|vorstellungsgespräch)\b"
+    )
+    INVITE_WORD_PATTERN = rule_pattern("job.invite_word", r"\b(einlad\w*|invite\w*|termin)\b")
 
-        hay = f"{subj}\n{from_}\n{snip}".lower()
+    def match(self, mail: MailItem) -> tuple[bool, str]:
+        hay = self.haystack(mail)
+        hits = self.PHRASES.scan(hay)
 
         # 1) Rejections first (usually unambiguous and should not be overridden).
-        if self.contains_any(hay, self.REJECTION_PHRASES):
-            if self.contains_any(hay, self.RECRUITING_WORDS) or self.contains_any(hay, self.APPLICATION_DOC_WORDS):
+        if "rejection" in hits:
+            if "recruiting" in hits or "application_doc" in hits:
                 return True, self.REJECT_REASON
 
         # 2) Interview invites / scheduling should override confirmation.
-        if self.contains_any(hay, self.INTERVIEW_PHRASES):
-            if self.contains_any(hay, self.RECRUITING_WORDS):
+        if "interview" in hits:
+            if "recruiting" in hits:
                 return True, self.INTERVIEW_REASON
-            if re.search(r"\b(m/w/d|junior|senior|data engineer|software|entwickler)\b", hay, flags=re.IGNORECASE):
+            if self.ROLE_PATTERN.search(hay):
                 return True, self.INTERVIEW_REASON
 
         # 3) Confirmation only if we are NOT seeing interview signals.
-        if self.contains_any(hay, self.CONFIRM_PHRASES):
+        if "confirm" in hits:
             return True, self.CONFIRM_REASON
 
         # 4) ATS marker + recruiting words is very likely an application mail.
-        if self.contains_any(hay, self.ATS_MARKERS) and self.contains_any(hay, self.RECRUITING_WORDS):
-            return True, self.CONFIRM_REASON
-
-        # 5) Regex fallbacks (confirmation) to catch phrasing variations.
-        if re.search(r"\bdank\w*\b.*\bbewerb\w*\b", hay, flags=re.IGNORECASE):
-            return True, self.CONFIRM_REASON
-        if re.search(r"\bbewerb\w*\b.*\bdank\w*\b", hay, flags=re.IGNORECASE):
-            return True, self.CONFIRM_REASON
-        if re.search(r"\bbedank\w*\b.*\bbewerb\w*\b", hay, flags=re.IGNORECASE):
-            return True, self.CONFIRM_REASON
-        if re.search(r"\bbewerb\w*\b.*\bbedank\w*\b", hay, flags=re.IGNORECASE):
+        if "ats" in hits and "recruiting" in hits:
             return True, self.CONFIRM_REASON
 
-        if re.search(r"\breceiv\w*\b.*\bapplicat\w*\b", hay, flags=re.IGNORECASE):
-            return True, self.CONFIRM_REASON
-        if re.search(r"\bapplicat\w*\b.*\breceiv\w*\b", hay, flags=re.IGNORECASE):
+        # 5) Regex fallbacks (confirmation) to catch phrasing variations:
+        #    dank/bedank + bewerb and receiv + applicat, in either order.
+        if self.CONFIRM_FALLBACK_PATTERN.search(hay):
             return True, self.CONFIRM_REASON
 
         # 6) Direct interview + invite/termin fallback for mixed-language emails.
-        if re.search(r"\b(interview|vorstellungsgespräch)\b", hay, flags=re.IGNORECASE) and re.search(
-            r"\b(einlad\w*|invite\w*|termin)\b", hay, flags=re.IGNORECASE
-        ):
+        if self.INTERVIEW_WORD_PATTERN.search(hay) and self.INVITE_WORD_PATTERN.search(hay):
             return True, self.INTERVIEW_REASON
 
         # 7) Fallback only on strong application-process signals.
         if (
-            self.contains_any(hay, self.DIRECT_APPLICATION_SIGNALS)
-            or (
-                self.contains_any(hay, self.ATS_MARKERS)
-                and self.contains_any(hay, self.RECRUITING_WORDS)
-            )
-            or (
-                self.contains_any(hay, self.APPLICATION_DOC_WORDS)
-                and self.contains_any(hay, self.RECRUITING_WORDS)
-            )
+            "direct" in hits
+            or ("ats" in hits and "recruiting" in hits)
+            or ("application_doc" in hits and "recruiting" in hits)
         ):
             return True, self.NOFIT_REASON
 
         return False, self.NOFIT_REASON
 
+    def labels_for(self, reason: str) -> Sequence[str]:
+        suffix = self.LABEL_SUFFIXES.get(reason, reason or "Unknown")
+        return ("Applications", f"Applications/{suffix}")
+
+    def emitted_labels(self) -> Sequence[str]:
+        suffixes = self.LABEL_SUFFIXES.values()
+        return ("Applications", *(f"Applications/{suffix}" for suffix in suffixes))
+
+    def match_note(self, reason: str) -> str:
+        return f"Matched rule: {self.name} ({reason})"
 
     def actions(self, mail: MailItem, reason: str) -> Iterable[Action]:
-        label_map = {
-            self.CONFIRM_REASON: "Confirmation",
-            self.INTERVIEW_REASON: "Interview",
-            self.REJECT_REASON: "Rejection",
-            self.NOFIT_REASON: "NoFit",
-        }
-        label_suffix = label_map.get(reason, reason)
+        label_suffix = self.LABEL_SUFFIXES.get(reason, reason)
 
         yield Action(
             type=ActionType.ADD_LABEL,
@@ -313,7 +346,12 @@ class JobAlertRule(BaseRule):
 
 
 class NoFitRule(BaseRule):
+    name = "no_fit"
     priority = 0
+    reads_body = False
+    category = "no_fit"
+    labels = ("NoFit",)
+    confidence = 0.2
 
     def match(self, mail: MailItem) -> tuple[bool, str]:
         return True, "NO_FIT"
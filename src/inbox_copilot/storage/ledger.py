@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import itertools
+import sqlite3
+import time
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+OUTCOME_DONE = "done"
+OUTCOME_ERROR = "error"
+# Listed, but gone (deleted/moved) by the time it was fetched.
+OUTCOME_DELETED = "deleted"
+
+# Listed IDs are looked up this many at a time (well below SQLite's parameter limit).
+_LOOKUP_CHUNK = 500
+
+# Runs that fail a message in a row before failed_ids() stops offering it for retry
+# (a permanent error would otherwise be fetched again, and cost quota, on every run).
+MAX_FAILED_ATTEMPTS = 5
+
+
+def ledger_path(state_path: Path) -> Path:
+    """Ledger database kept next to the state file at `state_path`."""
+    return state_path.parent / "processed.sqlite3"
+
+
+class ProcessedLedger:
+    """
+    Persistent record of every message a run has finished, with outcome and rule version.
+
+    Message IDs are the primary key of a WITHOUT ROWID table, so a lookup is a single
+    B-tree probe and each entry costs little more than its ID on disk, even with millions
+    of rows. Only `done` entries for the current rule version are skipped; errors are
+    kept for inspection and retried until they have failed MAX_FAILED_ATTEMPTS runs in
+    a row.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = Lock()
+        self._db = sqlite3.connect(str(path), timeout=30.0, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS processed (
+                message_id TEXT PRIMARY KEY,
+                outcome TEXT NOT NULL,
+                rule_version TEXT NOT NULL,
+                processed_at INTEGER NOT NULL,
+                failures INTEGER NOT NULL DEFAULT 0
+            ) WITHOUT ROWID
+            """
+        )
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(processed)")}
+        if "failures" not in columns:
+            # Ledgers written before failures were counted.
+            self._db.execute(
+                "ALTER TABLE processed ADD COLUMN failures INTEGER NOT NULL DEFAULT 0"
+            )
+        self._db.commit()
+        self.skipped = 0
+        self.recorded = 0
+
+    def unprocessed(self, message_ids: Iterable[str], rule_version: str) -> Iterator[str]:
+        """Yield the IDs not yet done under `rule_version`, preserving order and laziness."""
+        ids = iter(message_ids)
+        while True:
+            chunk = list(itertools.islice(ids, _LOOKUP_CHUNK))
+            if not chunk:
+                return
+            with self._lock:
+                done = {
+                    row[0]
+                    for row in self._db.execute(
+                        "SELECT message_id FROM processed "
+                        f"WHERE message_id IN ({','.join('?' * len(chunk))}) "
+                        "AND outcome = ? AND rule_version = ?",
+                        [*chunk, OUTCOME_DONE, rule_version],
+                    )
+                }
+                self.skipped += len(done)
+            for message_id in chunk:
+                if message_id not in done:
+                    yield message_id
+
+    def is_processed(self, message_id: str, rule_version: str) -> bool:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT 1 FROM processed WHERE message_id = ? AND outcome = ? AND rule_version = ?",
+                (message_id, OUTCOME_DONE, rule_version),
+            ).fetchone()
+            if row is not None:
+                self.skipped += 1
+        return row is not None
+
+    def failed_ids(self, max_attempts: int = MAX_FAILED_ATTEMPTS) -> List[str]:
+        """
+        IDs whose latest outcome is an error, oldest failure first (retried by runs), except
+        those that already failed `max_attempts` runs in a row.
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT message_id FROM processed WHERE outcome = ? AND failures < ? "
+                "ORDER BY processed_at, message_id",
+                (OUTCOME_ERROR, max_attempts),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def record_many(self, outcomes: Iterable[Tuple[str, str]], rule_version: str) -> None:
+        """
+        Store `(message_id, outcome)` pairs, replacing earlier entries for those IDs. An
+        error following an error counts one more failure in a row.
+        """
+        now = int(time.time())
+        rows = [
+            (message_id, outcome, rule_version, now, int(outcome == OUTCOME_ERROR))
+            for message_id, outcome in outcomes
+        ]
+        if not rows:
+            return
+        with self._lock:
+            self._db.executemany(
+                "INSERT INTO processed "
+                "(message_id, outcome, rule_version, processed_at, failures) "
+                "VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(message_id) DO UPDATE SET "
+                "outcome = excluded.outcome, "
+                "rule_version = excluded.rule_version, "
+                "processed_at = excluded.processed_at, "
+                "failures = CASE WHEN excluded.failures > 0 "
+                f"AND processed.outcome = '{OUTCOME_ERROR}' "
+                "THEN processed.failures + 1 ELSE excluded.failures END",
+                rows,
+            )
+            self._db.commit()
+            self.recorded += len(rows)
+
+    def stats(self) -> Dict[str, Any]:
+        """IDs skipped and recorded by this process, plus the number of stored entries."""
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM processed").fetchone()[0]
+        return {"skipped": self.skipped, "recorded": self.recorded, "entries": entries}
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+import time
+import zlib
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple
+
+from inbox_copilot.gmail.fields import MESSAGE_CONTENT_FIELDS, MESSAGE_MAIL_FIELDS
+
+# Compressed payload bytes kept on disk before least-recently-used entries are evicted.
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# Eviction trims down to this share of max_bytes, so it does not run on every put.
+_EVICT_TO = 0.9
+
+# Field masks that are supersets of other masks (None means the whole resource).
+_COVERED_FIELDS: Dict[Optional[str], frozenset] = {
+    MESSAGE_MAIL_FIELDS: frozenset({MESSAGE_MAIL_FIELDS, MESSAGE_CONTENT_FIELDS}),
+    MESSAGE_CONTENT_FIELDS: frozenset({MESSAGE_CONTENT_FIELDS}),
+}
+
+
+# Gmail changes these at any time (labels applied by the user, filters or other runs),
+# so they are never stored; clients refetch them with a minimal get on every hit.
+MUTABLE_FIELDS = frozenset({"labelIds", "historyId"})
+
+
+def wants_label_ids(fields: Optional[str]) -> bool:
+    """True if a request with mask `fields` expects labelIds in the resource."""
+    return fields is None or "labelIds" in fields
+
+
+def _immutable(resource: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: value for key, value in resource.items() if key not in MUTABLE_FIELDS}
+
+
+def fields_cover(stored: Optional[str], requested: Optional[str]) -> bool:
+    """True if a resource fetched with mask `stored` can answer a request for `requested`."""
+    if stored is None:
+        return True
+    return requested in _COVERED_FIELDS.get(stored, frozenset({stored}))
+
+
+class MessageCache:
+    """
+    Persistent, size-bounded cache of format=full Gmail message resources.
+
+    Entries are keyed by message ID and stored zlib-compressed in SQLite together with the
+    field mask they were fetched with. Only immutable content is kept (payload, headers,
+    snippet, internalDate); MUTABLE_FIELDS are dropped on write and on read.
+    Least-recently-read entries are evicted once the compressed total exceeds `max_bytes`.
+    Safe to share between threads and processes.
+    """
+
+    def __init__(self, path: Path, *, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = Lock()
+        self._db = sqlite3.connect(str(path), timeout=30.0, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS messages (
+                message_id TEXT PRIMARY KEY,
+                fields TEXT,
+                payload BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS messages_lru ON messages(accessed_at)")
+        self._db.commit()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, message_id: str, fields: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        return self.get_many([message_id], fields).get(message_id)
+
+    def get_many(
+        self, message_ids: Sequence[str], fields: Optional[str] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """Cached resources for `message_ids` that satisfy the `fields` mask."""
+        found: Dict[str, Dict[str, Any]] = {}
+        if not message_ids:
+            return found
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit.
+            for start in range(0, len(message_ids), 500):
+                chunk = list(message_ids[start:start + 500])
+                rows = self._db.execute(
+                    "SELECT message_id, fields, payload FROM messages "
+                    f"WHERE message_id IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+                for message_id, stored_fields, payload in rows:
+                    if fields_cover(stored_fields, fields):
+                        # Entries written before labels were dropped may still hold them.
+                        found[message_id] = _immutable(json.loads(zlib.decompress(payload)))
+            if found:
+                now = time.time()
+                self._db.executemany(
+                    "UPDATE messages SET accessed_at = ? WHERE message_id = ?",
+                    [(now, message_id) for message_id in found],
+                )
+                self._db.commit()
+            self._hits += len(found)
+            self._misses += len(message_ids) - len(found)
+        return found
+
+    def put(self, message_id: str, resource: Dict[str, Any], fields: Optional[str] = None) -> None:
+        self.put_many([(message_id, resource)], fields)
+
+    def put_many(
+        self, resources: Iterable[Tuple[str, Dict[str, Any]]], fields: Optional[str] = None
+    ) -> None:
+        now = time.time()
+        rows = []
+        for message_id, resource in resources:
+            payload = zlib.compress(
+                json.dumps(_immutable(resource), separators=(",", ":")).encode("utf-8")
+            )
+            rows.append((message_id, fields, payload, len(payload), now))
+        if not rows:
+            return
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO messages "
+                "(message_id, fields, payload, size, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._evict()
+            self._db.commit()
+
+    def _evict(self) -> None:
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM messages").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - int(self.max_bytes * _EVICT_TO)
+        freed = 0
+        doomed = []
+        for message_id, size in self._db.execute(
+            "SELECT message_id, size FROM messages ORDER BY accessed_at"
+        ):
+            doomed.append((message_id,))
+            freed += size
+            if freed >= excess:
+                break
+        self._db.executemany("DELETE FROM messages WHERE message_id = ?", doomed)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hits and misses in this process, plus what is currently stored."""
+        with self._lock:
+            entries, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM messages"
+            ).fetchone()
+            return {"hits": self._hits, "misses": self._misses, "entries": entries, "bytes": size}
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
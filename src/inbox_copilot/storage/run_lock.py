@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import IO, Any, Optional
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+
+class RunInProgressError(RuntimeError):
+    """Another run (CLI or backend, in any process) currently holds the run lock."""
+
+
+def run_lock_path(state_path: Path) -> Path:
+    """Lock file guarding the state file at `state_path`."""
+    return state_path.parent / "run.lock"
+
+
+class RunLock:
+    """
+    Exclusive, non-blocking lock on a file, shared by all processes on this machine.
+
+    The OS drops the lock when the holder exits, so a crashed run never leaves a stale
+    lock behind. The file content (holder PID) is informational only.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._file: Optional[IO[str]] = None
+
+    def acquire(self) -> None:
+        """Take the lock or raise RunInProgressError without waiting."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        f = open(self.path, "a+", encoding="utf-8")
+        try:
+            if os.name == "nt":
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError as exc:
+            try:
+                f.seek(0)
+                holder = f.read().strip() or "unknown"
+            except OSError:
+                # Windows refuses reads of the locked byte range.
+                holder = "unknown"
+            f.close()
+            raise RunInProgressError(
+                f"Another inbox-copilot run is in progress (pid {holder}, lock {self.path})"
+            ) from exc
+        f.seek(0)
+        f.truncate()
+        f.write(str(os.getpid()))
+        f.flush()
+        self._file = f
+
+    def release(self) -> None:
+        if self._file is None:
+            return
+        try:
+            if os.name == "nt":
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        finally:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> "RunLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *_exc: Any) -> None:
+        self.release()
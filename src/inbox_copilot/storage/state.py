@@ -1,13 +1,18 @@
 from __future__ import annotations
+import contextlib
 import json
+import os
+import tempfile
 from dataclasses import dataclass, asdict, field
 from pathlib import Path
 from typing import Optional
 
 @dataclass
 class AppState:
-    # Placeholder for Gmail History API tracking (not used yet).
+    # When last_history_id was stored (UTC, ISO 8601), to tell how old the cursor is.
     last_history_time: Optional[str] = None
+    # Gmail historyId cursor for users.history.list incremental sync.
+    last_history_id: Optional[str] = None
     last_internal_date_ms: Optional[int] = None
     # Message IDs already processed at the latest timestamp (same-second dedupe cursor).
     last_message_ids_at_latest_ts: list[str] = field(default_factory=list)
@@ -21,11 +26,37 @@ def load_state(path: Path) -> AppState:
     return AppState(
         # Backward compatibility: keep reading the legacy key if present.
         last_history_time=data.get("last_history_time") or data.get("last_history_TIME"),
+        last_history_id=data.get("last_history_id"),
         last_internal_date_ms=data.get("last_internal_date_ms"),
         last_message_ids_at_latest_ts=list(data.get("last_message_ids_at_latest_ts") or []),
         runs=int(data.get("runs") or 0),
     )
 
-def save_state(path: Path, state: AppState) -> None:
+def atomic_write_text(path: Path, text: str) -> None:
+    """
+    Replace `path` with `text` so readers see either the old or the new file, never a
+    truncated one: write a temp file next to it, fsync, then rename over the original.
+    """
     path.parent.mkdir(parents=True, exist_ok=True)
-    path.write_text(json.dumps(asdict(state), indent=2), encoding="utf-8")
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_name, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(tmp_name)
+        raise
+    # Persist the rename itself (not supported for directories on Windows).
+    if hasattr(os, "O_DIRECTORY"):
+        dir_fd = os.open(path.parent, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+def save_state(path: Path, state: AppState) -> None:
+    atomic_write_text(path, json.dumps(asdict(state), indent=2))
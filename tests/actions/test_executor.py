@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any
+
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+from inbox_copilot.actions.executor import ActionExecutor, ModifyBatcher
+from inbox_copilot.actions.handlers import AnalyzeApplicationHandler, ExecutionContext
+from inbox_copilot.app.run import mail_from_message
+from inbox_copilot.gmail.client import GmailClient, GmailClientConfig
+from inbox_copilot.gmail.fields import MESSAGE_MAIL_FIELDS
+from inbox_copilot.gmail.label_registry import LabelRegistry
+from inbox_copilot.models import NormalizedEmail
+from inbox_copilot.rules.core import Action, ActionType
+from inbox_copilot.storage.message_cache import MessageCache
+
+
+class _FakeClient:
+    def __init__(self, fail: bool = False) -> None:
+        self.fail = fail
+        self.calls: list[dict[str, Any]] = []
+
+    def get_or_create_label_id(self, name: str) -> str:
+        return f"id-{name}"
+
+    def batch_modify(self, ids: list[str], **labels: Any) -> None:
+        if self.fail:
+            raise RuntimeError("quota")
+        self.calls.append({"ids": list(ids), **labels})
+
+
+def _label(mid: str, name: str) -> Action:
+    return Action(type=ActionType.ADD_LABEL, message_id=mid, label_name=name)
+
+
+def test_batcher_groups_messages_by_label_set() -> None:
+    client = _FakeClient()
+    executor = ActionExecutor(
+        handlers={ActionType.ADD_LABEL: object(), ActionType.ARCHIVE: object()},
+        batcher=ModifyBatcher(),
+    )
+    for i in range(2500):
+        executor.run(client, [_label(f"n{i}", "Newsletter")])
+    executor.run(client, [_label("j1", "Applications"), _label("j1", "Applications/Interview")])
+    executor.run(client, [_label("s1", "Security"), Action(type=ActionType.ARCHIVE, message_id="s1")])
+
+    executor.flush(client)
+
+    sizes = sorted((len(c["ids"]), tuple(c["add_label_ids"])) for c in client.calls)
+    assert sizes == [
+        (1, ("id-Applications", "id-Applications/Interview")),
+        (1, ("id-Security",)),
+        (500, ("id-Newsletter",)),
+        (1000, ("id-Newsletter",)),
+        (1000, ("id-Newsletter",)),
+    ]
+    archived = [c for c in client.calls if c["ids"] == ["s1"]][0]
+    assert archived["remove_label_ids"] == ["INBOX"]
+
+
+def test_drop_satisfied_counts_skipped_noops() -> None:
+    client = SimpleNamespace(cached_label_id=lambda name: f"id-{name}")
+    executor = ActionExecutor(handlers={}, batcher=ModifyBatcher())
+
+    planned = executor.drop_satisfied(
+        client, [_label("n1", "Newsletter"), _label("n1", "Security")], ["id-Newsletter", "INBOX"]
+    )
+
+    assert [a.label_name for a in planned] == ["Security"]
+    assert executor.skipped_noops == 1
+
+
+def test_drop_satisfied_sees_labels_removed_after_caching(tmp_path: Path) -> None:
+    cfg = GmailClientConfig(
+        credentials_path=tmp_path / "c", token_path=tmp_path / "t", quota_units_per_second=None
+    )
+    client = GmailClient(cfg)
+    client._message_cache = MessageCache(tmp_path / "messages.sqlite3")
+    client._labels = LabelRegistry(ids={"Newsletter": "id-Newsletter"}, complete=True)
+    labels = ["INBOX", "id-Newsletter"]
+    client._fetch_messages = lambda ids, *_args: [  # type: ignore[method-assign]
+        {"id": mid, "internalDate": "1", "labelIds": list(labels)} for mid in ids
+    ]
+    client.get_messages(["n1"], fields=MESSAGE_MAIL_FIELDS)
+    # The user removes the label; the cached payload must not hide that.
+    labels.remove("id-Newsletter")
+
+    resource = client.get_messages(["n1"], fields=MESSAGE_MAIL_FIELDS)[0]
+    mail, _headers = mail_from_message("n1", resource)
+    executor = ActionExecutor(handlers={}, batcher=ModifyBatcher())
+
+    assert executor.drop_satisfied(client, [_label("n1", "Newsletter")], mail.label_ids) == [
+        _label("n1", "Newsletter")
+    ]
+    assert executor.skipped_noops == 0
+
+
+def test_batcher_reports_failures_per_message() -> None:
+    failed: list[str] = []
+    batcher = ModifyBatcher(on_error=lambda mid, exc: failed.append(mid))
+    batcher.add(_label("a", "Newsletter"))
+    batcher.add(_label("b", "Newsletter"))
+
+    assert batcher.flush(_FakeClient(fail=True)) == 0
+    assert sorted(failed) == ["a", "b"]
+
+
+class _FakeResponses:
+    def __init__(self) -> None:
+        self.prompts: list[str] = []
+
+    def create(self, **kwargs: Any) -> SimpleNamespace:
+        self.prompts.append(kwargs["input"][1]["content"])
+        return SimpleNamespace(output_text=json.dumps({"status": "other"}))
+
+
+class _NoFetchClient:
+    def get_message(self, *args: Any, **kwargs: Any) -> dict[str, Any]:
+        raise AssertionError("message should come from the execution context")
+
+
+def test_batcher_retries_once_after_reloading_stale_label_ids() -> None:
+    class _StaleLabelClient(_FakeClient):
+        def __init__(self) -> None:
+            super().__init__()
+            self.generation = 1
+            self.refreshed: list[set[str]] = []
+
+        def get_or_create_label_id(self, name: str) -> str:
+            return f"id{self.generation}-{name}"
+
+        def refresh_label_ids(self, names: Any) -> bool:
+            self.refreshed.append(set(names))
+            self.generation = 2
+            return True
+
+        def batch_modify(self, ids: list[str], **labels: Any) -> None:
+            if labels["add_label_ids"] != ["id2-Newsletter"]:
+                raise HttpError(httplib2.Response({"status": 400}), b"Invalid label")
+            super().batch_modify(ids, **labels)
+
+    client = _StaleLabelClient()
+    failed: list[str] = []
+    batcher = ModifyBatcher(on_error=lambda message_id, _exc: failed.append(message_id))
+    batcher.add(_label("n1", "Newsletter"))
+
+    assert batcher.flush(client) == 1
+    assert client.refreshed == [{"Newsletter"}]
+    assert client.calls == [
+        {"ids": ["n1"], "add_label_ids": ["id2-Newsletter"], "remove_label_ids": []}
+    ]
+    assert failed == []
+
+
+def test_analyze_handler_uses_mail_from_execution_context(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    handler = AnalyzeApplicationHandler()
+    responses = _FakeResponses()
+    handler.openai_client = SimpleNamespace(responses=responses)
+    mail = NormalizedEmail(
+        message_id="j1",
+        subject="Your application",
+        from_email="jobs@example.com",
+        snippet="Thanks for applying",
+        body_text="Thanks for applying to the Data Engineer role.",
+        internal_date_ms=1,
+    )
+    executor = ActionExecutor(handlers={ActionType.ANALYZE_APPLICATION: handler})
+
+    executor.run(
+        _NoFetchClient(),
+        [Action(type=ActionType.ANALYZE_APPLICATION, message_id="j1")],
+        ExecutionContext(mail=mail),
+    )
+
+    assert responses.prompts == [
+        "Subject: Your application\nFrom: jobs@example.com\n\n"
+        "EMAIL BODY:\nThanks for applying to the Data Engineer role."
+    ]
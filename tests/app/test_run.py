@@ -0,0 +1,499 @@
+from __future__ import annotations
+
+import base64
+import json
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable
+
+import pytest
+
+from inbox_copilot.actions.handlers import AnalyzeApplicationHandler
+from inbox_copilot.app import apply_plan as apply_module
+from inbox_copilot.app import run as run_module
+from inbox_copilot.app.run import (
+    FETCH_METADATA_FIRST,
+    LowWatermark,
+    fetch_message_chunks,
+    mail_from_message,
+)
+from inbox_copilot.gmail.client import GmailClientConfig
+from inbox_copilot.rules.classification import classify_email
+from inbox_copilot.rules.core import Action, ActionType
+from inbox_copilot.storage.ledger import ProcessedLedger, ledger_path
+
+
+class _FakeClient:
+    def __init__(self, forks: list["_FakeClient"] | None = None) -> None:
+        self.forks = forks if forks is not None else []
+        self.threads: set[int] = set()
+
+    def fork(self) -> "_FakeClient":
+        clone = _FakeClient(self.forks)
+        self.forks.append(clone)
+        return clone
+
+    def get_messages(self, ids: list[str], fmt: str = "full", **_kwargs: Any) -> list[Any]:
+        self.threads.add(threading.get_ident())
+        if "boom" in ids:
+            raise RuntimeError("batch failed")
+        return [{"id": mid} for mid in ids]
+
+
+def test_fetch_message_chunks_uses_one_client_per_worker_thread() -> None:
+    client = _FakeClient()
+    chunks = [[f"m{i}", f"n{i}"] for i in range(20)]
+
+    results = list(fetch_message_chunks(client, iter(chunks), workers=4))
+
+    assert [chunk for chunk, _ in results] == chunks
+    assert all([r["id"] for r in res] == chunk for chunk, res in results)
+    assert not client.threads  # the shared client is never used by workers
+    assert 1 <= len(client.forks) <= 4
+    assert all(len(fork.threads) == 1 for fork in client.forks)
+
+
+def test_fetch_message_chunks_marks_failed_batches_per_message() -> None:
+    client = _FakeClient()
+
+    [(chunk, results)] = list(fetch_message_chunks(client, [["a", "boom"]]))
+
+    assert chunk == ["a", "boom"]
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+def _encoded(text: str) -> str:
+    return base64.urlsafe_b64encode(text.encode("utf-8")).decode("ascii")
+
+
+class _MetadataClient:
+    def __init__(self) -> None:
+        self.calls: list[tuple[str, list[str]]] = []
+
+    def get_messages(self, ids: list[str], fmt: str = "full", **_kwargs: Any) -> list[Any]:
+        self.calls.append((fmt, list(ids)))
+        subjects = {
+            "sec": ("Security alert", "no-reply@accounts.google.com"),
+            "news": ("Weekly newsletter", "news@example.com"),
+            "job": ("Ihre Bewerbung", "jobs@example.com"),
+        }
+        results = []
+        for mid in ids:
+            subject, sender = subjects[mid]
+            headers = [{"name": "Subject", "value": subject}, {"name": "From", "value": sender}]
+            payload: dict[str, Any] = {"headers": headers}
+            if fmt == "full":
+                payload["body"] = {"data": _encoded("Vielen Dank für Ihre Bewerbung.")}
+            results.append({"id": mid, "snippet": "snip", "payload": payload})
+        return results
+
+
+def test_metadata_first_downloads_full_payload_only_when_body_matters() -> None:
+    client = _MetadataClient()
+
+    [(chunk, results)] = list(
+        fetch_message_chunks(client, [["sec", "news", "job"]], fetch_mode=FETCH_METADATA_FIRST)
+    )
+
+    # The newsletter look-alike needs its body: the job rule outranks the newsletter rule.
+    assert client.calls == [("metadata", ["sec", "news", "job"]), ("full", ["news", "job"])]
+    mails = [mail_from_message(mid, msg)[0] for mid, msg in zip(chunk, results)]
+    assert mails[0].body_text == "snip"
+    categories = [
+        classify_email(subject=m.subject, from_email=m.from_email, body_text=m.body_text).category
+        for m in mails
+    ]
+    assert categories == ["security", "job_application", "job_application"]
+
+
+class _RunClient:
+    """Just enough of GmailClient for run_once: 250 messages listed newest first."""
+
+    modified: list[dict[str, Any]] = []
+
+    def __init__(self, cfg: Any, retrier: Any = None) -> None:
+        self.batches = 0
+
+    def connect(self) -> None:
+        pass
+
+    def fork(self) -> "_RunClient":
+        return self
+
+    def get_profile(self) -> dict[str, Any]:
+        return {"emailAddress": "me@example.com", "historyId": "7"}
+
+    def reconcile_labels(self, _names: Any) -> None:
+        pass
+
+    def iter_message_ids(self, **_kwargs: Any) -> Any:
+        return iter(f"m{i:03d}" for i in range(249, -1, -1))
+
+    def get_messages(self, ids: list[str], fmt: str = "full", **_kwargs: Any) -> list[Any]:
+        self.batches += 1
+        return [
+            {
+                "id": mid,
+                "internalDate": str(1_000 * int(mid[1:])),
+                "snippet": "hi",
+                "payload": {"headers": [{"name": "From", "value": "a@example.com"}]},
+            }
+            for mid in ids
+        ]
+
+    def connect_stats(self) -> dict[str, Any]:
+        return {}
+
+    def quota_usage(self) -> dict[str, Any]:
+        return {}
+
+    def message_cache_stats(self) -> dict[str, Any]:
+        return {}
+
+    def cached_label_id(self, name: str) -> str | None:
+        return None
+
+    def get_or_create_label_id(self, name: str) -> str:
+        return f"id-{name}"
+
+    def batch_modify(self, ids: list[str], **labels: Any) -> None:
+        _RunClient.modified.append({"ids": list(ids), **labels})
+
+
+UseClient = Callable[[Callable[..., Any]], None]
+
+
+@pytest.fixture
+def use_client(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> UseClient:
+    """Make run_once and apply_plan talk to the given fake client class instead of Gmail."""
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+
+    def use(client_cls: Callable[..., Any]) -> None:
+        for module in (run_module, apply_module):
+            monkeypatch.setattr(module, "GmailClient", client_cls)
+            monkeypatch.setattr(
+                module,
+                "load_gmail_config",
+                lambda: GmailClientConfig(
+                    credentials_path=tmp_path / "c", token_path=tmp_path / "t"
+                ),
+            )
+
+    return use
+
+
+def test_run_once_stream_window_processes_while_loading(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, use_client: UseClient
+) -> None:
+    processed: list[tuple[str, int]] = []
+    use_client(_RunClient)
+    monkeypatch.setattr(
+        run_module,
+        "process_message",
+        lambda client, mail, executor, report_cb=None: processed.append(
+            (mail.message_id, client.batches)
+        ),
+    )
+
+    summary = run_module.run_once(
+        state_path=tmp_path / "state.json", logs_dir=tmp_path / "logs", stream_window=10
+    )
+
+    assert summary["processed"] == 250
+    assert summary["latest_internal_date_ms"] == 249_000
+    # The first mail is handled while later batches are still unfetched.
+    assert processed[0][1] == 1
+    # Mails still leave the window oldest first.
+    assert [mid for mid, _ in processed[-10:]] == [f"m{i:03d}" for i in range(240, 250)]
+
+
+def _mail(mid: str, ts: int) -> Any:
+    return mail_from_message(mid, {"internalDate": str(ts)})[0]
+
+
+def test_low_watermark_stops_at_first_unfinished_mail() -> None:
+    mails = [_mail("a", 1), _mail("b", 2), _mail("c", 2), _mail("d", 3)]
+    watermark = LowWatermark(reversed(mails))
+
+    watermark.mark_done(mails[3])
+    assert watermark.cursor().latest_ts is None
+
+    for mail in mails[:2]:
+        watermark.mark_done(mail)
+    cursor = watermark.cursor()
+    # Stops inside the ts=2 group: "c" is not done, so it stays eligible next run.
+    assert (cursor.latest_ts, cursor.latest_ids_at_ts) == (2, {"b"})
+    assert not watermark.complete
+
+    watermark.mark_done(mails[2])
+    assert watermark.cursor().latest_ts == 3
+    assert watermark.complete
+
+
+def test_run_once_process_workers_commit_only_the_low_watermark(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, use_client: UseClient
+) -> None:
+    use_client(_RunClient)
+    threads: set[int] = set()
+
+    def process(client: Any, mail: Any, executor: Any, report_cb: Any = None) -> None:
+        threads.add(threading.get_ident())
+        if mail.message_id == "m100":
+            raise RuntimeError("boom")
+
+    monkeypatch.setattr(run_module, "process_message", process)
+
+    summary = run_module.run_once(
+        state_path=tmp_path / "state.json", logs_dir=tmp_path / "logs", process_workers=4
+    )
+
+    assert (summary["processed"], summary["errors"]) == (249, 1)
+    assert threading.get_ident() not in threads
+    # Everything older than the failed mail is committed; m100 and newer are retried.
+    assert summary["latest_internal_date_ms"] == 99_000
+
+
+def test_run_once_failed_batch_modify_holds_back_the_cursor(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, use_client: UseClient
+) -> None:
+    use_client(_RunClient)
+    monkeypatch.setattr(
+        run_module,
+        "actions_from_analysis",
+        lambda analysis, message_id: [
+            Action(
+                type=ActionType.ADD_LABEL,
+                message_id=message_id,
+                label_name="Broken" if message_id == "m100" else "Newsletter",
+            )
+        ],
+    )
+
+    def batch_modify(self: Any, ids: list[str], **labels: Any) -> None:
+        if "id-Broken" in labels.get("add_label_ids", []):
+            raise RuntimeError("batchModify failed")
+
+    monkeypatch.setattr(_RunClient, "batch_modify", batch_modify)
+    state_path = tmp_path / "state.json"
+
+    summary = run_module.run_once(
+        state_path=state_path, logs_dir=tmp_path / "logs", batch_modify=True
+    )
+
+    assert (summary["processed"], summary["errors"]) == (249, 1)
+    # Sequential mode advanced past m100 before the deferred flush failed for it.
+    assert summary["latest_internal_date_ms"] == 99_000
+    state = json.loads(state_path.read_text(encoding="utf-8"))
+    assert state["last_internal_date_ms"] == 99_000
+    assert (state["last_history_id"], state["last_history_time"]) == (None, None)
+
+
+def test_run_once_failed_handler_fails_its_mail(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, use_client: UseClient
+) -> None:
+    use_client(_RunClient)
+    monkeypatch.setattr(
+        run_module,
+        "actions_from_analysis",
+        lambda analysis, message_id: [
+            Action(type=ActionType.ANALYZE_APPLICATION, message_id=message_id)
+        ],
+    )
+
+    def analyze(self: Any, client: Any, action: Action, context: Any = None) -> None:
+        if action.message_id == "m100":
+            raise RuntimeError("analysis failed")
+
+    monkeypatch.setattr(AnalyzeApplicationHandler, "handle", analyze)
+    state_path = tmp_path / "state.json"
+
+    summary = run_module.run_once(state_path=state_path, logs_dir=tmp_path / "logs")
+
+    assert (summary["processed"], summary["errors"]) == (249, 1)
+    assert summary["latest_internal_date_ms"] == 99_000
+    ledger = ProcessedLedger(ledger_path(state_path))
+    assert ledger.failed_ids() == ["m100"]
+    ledger.close()
+
+
+def test_run_once_checkpoints_keep_progress_of_a_killed_run(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, use_client: UseClient
+) -> None:
+    use_client(_RunClient)
+
+    def process(client: Any, mail: Any, executor: Any, report_cb: Any = None) -> None:
+        if mail.message_id == "m150":
+            raise KeyboardInterrupt
+
+    monkeypatch.setattr(run_module, "process_message", process)
+    state_path = tmp_path / "state.json"
+
+    with pytest.raises(KeyboardInterrupt):
+        run_module.run_once(
+            state_path=state_path,
+            logs_dir=tmp_path / "logs",
+            checkpoint_every=100,
+            checkpoint_interval_s=None,
+        )
+
+    state = json.loads(state_path.read_text(encoding="utf-8"))
+    assert state["last_internal_date_ms"] == 99_000
+    assert state["last_message_ids_at_latest_ts"] == ["m099"]
+    # Only a completed run advances the history cursor and the run counter.
+    assert state["last_history_id"] is None
+    assert state["runs"] == 0
+
+
+def test_run_once_skips_ledger_entries_before_fetching(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, use_client: UseClient
+) -> None:
+    use_client(_RunClient)
+    processed: list[str] = []
+
+    def process(client: Any, mail: Any, executor: Any, report_cb: Any = None) -> None:
+        processed.append(mail.message_id)
+        if mail.message_id == "m100" and processed.count("m100") == 1:
+            raise RuntimeError("boom")
+
+    monkeypatch.setattr(run_module, "process_message", process)
+    state_path = tmp_path / "state.json"
+    run_module.run_once(state_path=state_path, logs_dir=tmp_path / "logs")
+
+    # Losing the cursor re-lists everything, but only the failed mail is fetched again.
+    state_path.unlink()
+    summary = run_module.run_once(state_path=state_path, logs_dir=tmp_path / "logs")
+
+    assert processed[250:] == ["m100"]
+    assert summary["processed"] == 1
+    assert summary["ledger"] == {"skipped": 249, "recorded": 1, "entries": 250}
+
+
+def test_run_once_retries_failed_mails_without_losing_the_cursor(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, use_client: UseClient
+) -> None:
+    fetched: list[list[str]] = []
+
+    class _FlakyClient(_RunClient):
+        def iter_history_message_ids(self, start_history_id: str) -> list[str]:
+            return []
+
+        def get_messages(self, ids: list[str], fmt: str = "full", **kwargs: Any) -> list[Any]:
+            fetched.append(list(ids))
+            results = super().get_messages(ids, fmt, **kwargs)
+            if "m100" in ids and sum("m100" in chunk for chunk in fetched) == 1:
+                # The payload of m100 fails on the first run only.
+                results[ids.index("m100")] = RuntimeError("fetch failed")
+            return results
+
+    use_client(_FlakyClient)
+    processed: list[str] = []
+
+    def process(client: Any, mail: Any, executor: Any, report_cb: Any = None) -> None:
+        processed.append(mail.message_id)
+        if mail.message_id == "m200" and processed.count("m200") == 1:
+            raise RuntimeError("boom")
+
+    monkeypatch.setattr(run_module, "process_message", process)
+    state_path = tmp_path / "state.json"
+
+    first = run_module.run_once(state_path=state_path, logs_dir=tmp_path / "logs")
+    # The fetch failure has no timestamp, so the cursor moves past m100; m200 holds it.
+    assert (first["processed"], first["errors"]) == (248, 2)
+    assert first["latest_internal_date_ms"] == 199_000
+
+    second = run_module.run_once(state_path=state_path, logs_dir=tmp_path / "logs")
+
+    # Nothing new is listed, yet both failures are fetched and processed again.
+    assert second["sync_mode"] == "query"
+    assert sorted(fetched[-1]) == ["m100", "m200"]
+    assert processed[249:] == ["m100", "m200"]
+    assert (second["processed"], second["errors"]) == (2, 0)
+    assert second["latest_internal_date_ms"] == 200_000
+    assert second["ledger"]["entries"] == 250
+    # Nothing is left behind the watermark, so the history cursor is committed again.
+    state = json.loads(state_path.read_text(encoding="utf-8"))
+    assert state["last_history_id"] == "7"
+    assert datetime.fromisoformat(state["last_history_time"]).tzinfo is not None
+
+
+def test_planned_run_applies_later_in_bulk(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, use_client: UseClient
+) -> None:
+    monkeypatch.setattr(_RunClient, "modified", [])
+    use_client(_RunClient)
+    monkeypatch.setattr(
+        run_module,
+        "actions_from_analysis",
+        lambda analysis, message_id: (
+            [Action(type=ActionType.ADD_LABEL, message_id=message_id, label_name="Newsletter")]
+            if int(message_id[1:]) % 2 == 0
+            else []
+        ),
+    )
+    state_path = tmp_path / "state.json"
+    plan_path = tmp_path / "plan.json"
+
+    summary = run_module.run_once(
+        state_path=state_path, logs_dir=tmp_path / "logs", plan_path=plan_path
+    )
+
+    assert summary["plan"]["add_labels"] == {"Newsletter": 125}
+    assert summary["plan"]["api_calls"]["messages.batchModify"] == 1
+    assert summary["plan"]["quota_units"] == 50
+    # Nothing is applied or committed while planning.
+    assert _RunClient.modified == []
+    assert not state_path.exists()
+
+    applied = apply_module.apply_plan(state_path=state_path, plan_path=plan_path)
+
+    assert (applied["batch_modify_calls"], applied["state_committed"]) == (1, True)
+    assert len(_RunClient.modified[0]["ids"]) == 125
+    state = json.loads(state_path.read_text(encoding="utf-8"))
+    assert (state["last_internal_date_ms"], state["last_history_id"]) == (249_000, "7")
+
+
+def test_apply_plan_marks_mails_with_failed_actions_as_errors(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, use_client: UseClient
+) -> None:
+    monkeypatch.setattr(_RunClient, "modified", [])
+    use_client(_RunClient)
+    monkeypatch.setattr(
+        run_module,
+        "actions_from_analysis",
+        lambda analysis, message_id: [
+            Action(type=ActionType.ADD_LABEL, message_id=message_id, label_name="Applications"),
+            Action(type=ActionType.ANALYZE_APPLICATION, message_id=message_id),
+        ],
+    )
+    analyzed: list[str] = []
+
+    def analyze(self: Any, client: Any, action: Action, context: Any = None) -> None:
+        analyzed.append(action.message_id)
+        if action.message_id == "m100":
+            raise RuntimeError("analysis failed")
+
+    monkeypatch.setattr(AnalyzeApplicationHandler, "handle", analyze)
+    events: list[tuple[str, dict[str, Any]]] = []
+    state_path = tmp_path / "state.json"
+    plan_path = tmp_path / "plan.json"
+
+    run_module.run_once(
+        state_path=state_path,
+        logs_dir=tmp_path / "logs",
+        plan_path=plan_path,
+        progress_cb=lambda step, payload: events.append((step, payload)),
+    )
+
+    actions = [payload for step, payload in events if step == "action"]
+    assert len(actions) == 250
+    assert {payload["detail"] for payload in actions} == {"Label planned"}
+    assert analyzed == []
+
+    applied = apply_module.apply_plan(state_path=state_path, plan_path=plan_path)
+
+    assert len(analyzed) == 250
+    assert (applied["failed"], applied["state_committed"]) == (1, False)
+    ledger = ProcessedLedger(ledger_path(state_path))
+    assert ledger.failed_ids() == ["m100"]
+    ledger.close()
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from pathlib import Path
+from typing import Any, AsyncIterator
+
+import pytest
+
+from inbox_copilot.app import run as run_module
+from inbox_copilot.app import run_async as run_async_module
+from inbox_copilot.gmail.client import GmailClientConfig
+
+
+class _AsyncRunClient:
+    fetched: list[str] = []
+    in_flight = 0
+    max_in_flight = 0
+
+    def __init__(self, cfg: Any, retrier: Any = None, max_in_flight: int = 0) -> None:
+        pass
+
+    async def __aenter__(self) -> "_AsyncRunClient":
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        pass
+
+    def connect_stats(self) -> dict[str, Any]:
+        return {}
+
+    async def get_profile(self) -> dict[str, Any]:
+        return {"emailAddress": "me@example.com", "historyId": "7"}
+
+    async def reconcile_labels(self, _names: Any) -> None:
+        pass
+
+    async def history_message_ids(self, start_history_id: str) -> list[str]:
+        return []
+
+    async def iter_message_ids(self, **_kwargs: Any) -> AsyncIterator[str]:
+        for i in range(49, -1, -1):
+            yield f"m{i:03d}"
+
+    async def get_message(self, mid: str, fmt: str = "full", **_kwargs: Any) -> dict[str, Any]:
+        _AsyncRunClient.fetched.append(mid)
+        _AsyncRunClient.in_flight += 1
+        _AsyncRunClient.max_in_flight = max(
+            _AsyncRunClient.max_in_flight, _AsyncRunClient.in_flight
+        )
+        await asyncio.sleep(0)
+        _AsyncRunClient.in_flight -= 1
+        return {
+            "id": mid,
+            "internalDate": str(1_000 * int(mid[1:])),
+            "payload": {"headers": [{"name": "From", "value": "a@example.com"}]},
+        }
+
+    def quota_usage(self) -> dict[str, Any]:
+        return {}
+
+    def message_cache_stats(self) -> dict[str, Any]:
+        return {}
+
+
+def _use_fake_client(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setattr(_AsyncRunClient, "fetched", [])
+    monkeypatch.setattr(_AsyncRunClient, "max_in_flight", 0)
+    monkeypatch.setattr(run_async_module, "AsyncGmailClient", _AsyncRunClient)
+    monkeypatch.setattr(
+        run_async_module,
+        "load_gmail_config",
+        lambda: GmailClientConfig(credentials_path=tmp_path / "c", token_path=tmp_path / "t"),
+    )
+
+
+def test_run_once_async_skips_done_mails_and_retries_failures(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    _use_fake_client(tmp_path, monkeypatch)
+    planned: list[str] = []
+
+    def plan(mail: Any, report_cb: Any = None, skip_satisfied: Any = None) -> list[Any]:
+        planned.append(mail.message_id)
+        if mail.message_id == "m020" and planned.count("m020") == 1:
+            raise RuntimeError("boom")
+        return []
+
+    monkeypatch.setattr(run_module, "plan_message_actions", plan)
+    state_path = tmp_path / "state.json"
+
+    def run() -> dict[str, Any]:
+        return asyncio.run(
+            run_async_module.run_once_async(state_path=state_path, logs_dir=tmp_path / "logs")
+        )
+
+    first = run()
+    assert (first["processed"], first["errors"]) == (49, 1)
+    assert first["ledger"] == {"skipped": 0, "recorded": 50, "entries": 50}
+    # Oldest first, one mail at a time; the failed mail holds the cursor back.
+    assert planned == [f"m{i:03d}" for i in range(50)]
+    state = json.loads(state_path.read_text(encoding="utf-8"))
+    assert state["last_internal_date_ms"] == 19_000
+    assert state["last_history_id"] is None
+
+    second = run()
+
+    # Done mails are never fetched again; the failed one is retried.
+    assert _AsyncRunClient.fetched[50:] == ["m020"]
+    assert planned[50:] == ["m020"]
+    assert (second["processed"], second["errors"]) == (1, 0)
+    assert second["ledger"]["entries"] == 50
+    state = json.loads(state_path.read_text(encoding="utf-8"))
+    assert state["last_history_id"] == "7"
+
+
+def test_run_once_async_bounds_in_flight_fetches(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    _use_fake_client(tmp_path, monkeypatch)
+    monkeypatch.setattr(run_module, "plan_message_actions", lambda mail, *args, **kwargs: [])
+
+    summary = asyncio.run(
+        run_async_module.run_once_async(
+            state_path=tmp_path / "state.json", logs_dir=tmp_path / "logs", concurrency=4
+        )
+    )
+
+    assert summary["processed"] == 50
+    assert _AsyncRunClient.max_in_flight == 4
@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any
+
+import pytest
+
+from backend.app.api import run as run_api
+
+
+def test_concurrent_requests_share_one_run(monkeypatch: pytest.MonkeyPatch) -> None:
+    calls: list[dict[str, Any]] = []
+
+    async def fake_run_once_async(**kwargs: Any) -> dict[str, Any]:
+        calls.append(kwargs)
+        await asyncio.sleep(0.01)
+        return {"processed": len(calls)}
+
+    monkeypatch.setattr(run_api, "run_once_async", fake_run_once_async)
+
+    async def two_requests() -> list[dict]:
+        return list(await asyncio.gather(run_api.run_endpoint(), run_api.run_endpoint()))
+
+    first, second = asyncio.run(two_requests())
+
+    assert len(calls) == 1
+    assert first["summary"] == second["summary"] == {"processed": 1}
+    assert [first["coalesced"], second["coalesced"]] == [False, True]
@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from types import SimpleNamespace
+from typing import Any
+
+import httpx
+import pytest
+
+from inbox_copilot.gmail.async_client import GMAIL_API_ROOT, AsyncGmailClient
+from inbox_copilot.gmail.client import GmailClientConfig, HistoryExpiredError
+from inbox_copilot.gmail.fields import MESSAGE_MAIL_FIELDS
+from inbox_copilot.retry import Retrier
+
+
+def _client(handler: Any) -> AsyncGmailClient:
+    cfg = GmailClientConfig(
+        credentials_path="unused", token_path="unused", quota_units_per_second=None
+    )
+    client = AsyncGmailClient(cfg, retrier=Retrier(sleep=lambda _: None, rand=lambda: 0.0))
+    client._creds = SimpleNamespace(valid=True, token="token")
+    client._http = httpx.AsyncClient(
+        base_url=f"{GMAIL_API_ROOT}/me", transport=httpx.MockTransport(handler)
+    )
+    return client
+
+
+def test_iter_message_ids_follows_page_tokens() -> None:
+    pages = {
+        None: {"messages": [{"id": "a"}, {"id": "b"}], "nextPageToken": "p2"},
+        "p2": {"messages": [{"id": "c"}]},
+    }
+    seen_tokens: list[str | None] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        token = request.url.params.get("pageToken")
+        seen_tokens.append(token)
+        return httpx.Response(200, json=pages[token])
+
+    async def collect() -> list[str]:
+        client = _client(handler)
+        try:
+            return [mid async for mid in client.iter_message_ids("in:inbox")]
+        finally:
+            await client.aclose()
+
+    assert asyncio.run(collect()) == ["a", "b", "c"]
+    assert seen_tokens == [None, "p2"]
+
+
+def test_get_messages_keeps_order_and_retries_transient_errors() -> None:
+    attempts: dict[str, int] = {}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        mid = request.url.path.rsplit("/", 1)[-1]
+        attempts[mid] = attempts.get(mid, 0) + 1
+        if mid == "gone":
+            return httpx.Response(404, json={})
+        if mid == "flaky" and attempts[mid] == 1:
+            return httpx.Response(429, headers={"Retry-After": "0"}, json={})
+        assert request.headers["Authorization"] == "Bearer token"
+        assert request.url.params["fields"] == MESSAGE_MAIL_FIELDS
+        return httpx.Response(200, json={"id": mid})
+
+    async def fetch() -> tuple[list[Any], dict[str, Any]]:
+        client = _client(handler)
+        try:
+            results = await client.get_messages(
+                ["a", "gone", "flaky"], "full", fields=MESSAGE_MAIL_FIELDS
+            )
+            return results, client.retry_stats()
+        finally:
+            await client.aclose()
+
+    results, retries = asyncio.run(fetch())
+    assert results[0] == {"id": "a"}
+    assert isinstance(results[1], KeyError)
+    assert results[2] == {"id": "flaky"}
+    assert retries["retries"] == 1
+
+
+def test_history_expired_raises() -> None:
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(404, json={})
+
+    async def history() -> None:
+        client = _client(handler)
+        try:
+            await client.history_message_ids("42")
+        finally:
+            await client.aclose()
+
+    with pytest.raises(HistoryExpiredError):
+        asyncio.run(history())
+
+
+def test_add_label_resolves_id_once() -> None:
+    calls: list[tuple[str, str]] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append((request.method, request.url.path.rsplit("/", 1)[-1]))
+        if request.url.path.endswith("/labels"):
+            return httpx.Response(200, json={"labels": [{"id": "L1", "name": "Jobs"}]})
+        assert json.loads(request.content) == {"addLabelIds": ["L1"]}
+        return httpx.Response(200, json={})
+
+    async def label() -> None:
+        client = _client(handler)
+        try:
+            await client.add_label("m1", "Jobs")
+            await client.add_label("m2", "Jobs")
+        finally:
+            await client.aclose()
+
+    asyncio.run(label())
+    assert calls == [("GET", "labels"), ("POST", "modify"), ("POST", "modify")]
+
+
+def test_transport_errors_are_retried() -> None:
+    failures = [httpx.ConnectError("connection dropped"), httpx.ReadTimeout("read timed out")]
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if failures:
+            raise failures.pop(0)
+        return httpx.Response(200, json={"emailAddress": "me@example.com"})
+
+    async def profile() -> tuple[dict[str, Any], dict[str, Any]]:
+        client = _client(handler)
+        try:
+            return await client.get_profile(), client.retry_stats()
+        finally:
+            await client.aclose()
+
+    result, retries = asyncio.run(profile())
+    assert result == {"emailAddress": "me@example.com"}
+    assert retries["retries"] == 2
@@ -0,0 +1,411 @@
+from __future__ import annotations
+
+import json
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+import pytest
+from google.oauth2.credentials import Credentials
+
+from inbox_copilot.gmail import client as client_module
+from inbox_copilot.gmail.LabelColors import LABEL_COLORS
+from inbox_copilot.gmail.fields import (
+    LIST_MESSAGES_FIELDS,
+    MESSAGE_CONTENT_FIELDS,
+    MESSAGE_LABELS_FIELDS,
+    MESSAGE_MAIL_FIELDS,
+)
+from inbox_copilot.gmail.label_registry import LabelRegistry
+from inbox_copilot.storage.message_cache import MessageCache
+from inbox_copilot.retry import Retrier
+from inbox_copilot.gmail.client import (
+    GmailClient,
+    GmailClientConfig,
+    HistoryExpiredError,
+    load_credentials,
+)
+
+
+class _Request:
+    def __init__(self, response: dict[str, Any]) -> None:
+        self._response = response
+
+    def execute(self) -> dict[str, Any]:
+        return self._response
+
+
+class _FakeMessages:
+    def __init__(self, pages: list[dict[str, Any]] | None = None) -> None:
+        self._pages = pages or []
+        self.list_calls: list[dict[str, Any]] = []
+
+    def list(self, **params: Any) -> _Request:
+        self.list_calls.append(params)
+        return _Request(self._pages[len(self.list_calls) - 1])
+
+    def get(self, **params: Any) -> dict[str, Any]:
+        return params
+
+
+class _FakeBatch:
+    def __init__(self, callback: Any, sizes: list[int]) -> None:
+        self._callback = callback
+        self._sizes = sizes
+        self._requests: list[tuple[str, dict[str, Any]]] = []
+
+    def add(self, request: dict[str, Any], request_id: str) -> None:
+        self._requests.append((request_id, request))
+
+    def execute(self) -> None:
+        self._sizes.append(len(self._requests))
+        # Answer out of order to prove results are mapped back by request id.
+        for request_id, request in reversed(self._requests):
+            if request["id"] == "gone":
+                error = HttpError(httplib2.Response({"status": 404}), b"")
+                self._callback(request_id, None, error)
+            elif request["id"] == "flaky" and self._sizes.count(1) == 0:
+                error = HttpError(httplib2.Response({"status": 429}), b"")
+                self._callback(request_id, None, error)
+            else:
+                self._callback(request_id, {"id": request["id"]}, None)
+
+
+class _FakeHistory:
+    def __init__(self, pages: list[dict[str, Any]] | None) -> None:
+        self._pages = pages
+        self.calls: list[dict[str, Any]] = []
+
+    def list(self, **params: Any) -> _Request:
+        self.calls.append(params)
+        if self._pages is None:
+            raise HttpError(httplib2.Response({"status": 404}), b"")
+        return _Request(self._pages[len(self.calls) - 1])
+
+
+class _FakeService:
+    def __init__(self, messages: _FakeMessages, history: _FakeHistory | None = None) -> None:
+        self._messages = messages
+        self._history = history
+        self.batch_sizes: list[int] = []
+
+    def history(self) -> _FakeHistory | None:
+        return self._history
+
+    def users(self) -> "_FakeService":
+        return self
+
+    def messages(self) -> _FakeMessages:
+        return self._messages
+
+    def new_batch_http_request(self, callback: Any) -> _FakeBatch:
+        return _FakeBatch(callback, self.batch_sizes)
+
+
+def _client_with_pages(
+    pages: list[dict[str, Any]], history_pages: list[dict[str, Any]] | None = None
+) -> tuple[GmailClient, _FakeMessages]:
+    cfg = GmailClientConfig(
+        credentials_path=Path("c"), token_path=Path("t"), quota_units_per_second=None
+    )
+    client = GmailClient(cfg)
+    messages = _FakeMessages(pages)
+    client._service = _FakeService(messages, _FakeHistory(history_pages))
+    return client, messages
+
+
+def test_iter_message_ids_follows_page_tokens() -> None:
+    client, messages = _client_with_pages(
+        [
+            {"messages": [{"id": "a"}, {"id": "b"}], "nextPageToken": "p2"},
+            {"messages": [{"id": "c"}]},
+        ]
+    )
+
+    assert list(client.iter_message_ids(query="q")) == ["a", "b", "c"]
+    assert "pageToken" not in messages.list_calls[0]
+    assert messages.list_calls[0]["fields"] == LIST_MESSAGES_FIELDS
+    assert messages.list_calls[1]["pageToken"] == "p2"
+
+
+def test_iter_message_ids_is_lazy_and_respects_cap() -> None:
+    client, messages = _client_with_pages(
+        [
+            {"messages": [{"id": "a"}, {"id": "b"}], "nextPageToken": "p2"},
+            {"messages": [{"id": "c"}, {"id": "d"}], "nextPageToken": "p3"},
+        ]
+    )
+
+    ids = client.iter_message_ids(max_results=3, page_size=2)
+    assert next(ids) == "a"
+    assert len(messages.list_calls) == 1
+
+    assert list(ids) == ["b", "c"]
+    assert len(messages.list_calls) == 2
+
+
+def test_get_messages_batches_in_input_order_with_soft_skips() -> None:
+    client, _messages = _client_with_pages([])
+    ids = [f"m{i}" for i in range(150)]
+    ids[3] = "gone"
+
+    results = client.get_messages(ids)
+
+    assert client._service.batch_sizes == [100, 50]
+    assert isinstance(results[3], KeyError)
+    assert [r["id"] for i, r in enumerate(results) if i != 3] == [
+        mid for i, mid in enumerate(ids) if i != 3
+    ]
+
+
+def test_get_messages_retries_transiently_failed_items_only() -> None:
+    client, _messages = _client_with_pages([])
+    sleeps: list[float] = []
+    client._retrier = Retrier(sleep=sleeps.append, rand=lambda: 0.5)
+
+    results = client.get_messages(["a", "flaky", "gone"])
+
+    assert client._service.batch_sizes == [3, 1]
+    assert results[1] == {"id": "flaky"}
+    assert isinstance(results[2], KeyError)
+    assert sleeps == [0.5]
+
+
+def test_get_messages_serves_full_resources_from_message_cache(tmp_path: Path) -> None:
+    client, _messages = _client_with_pages([])
+    client._message_cache = MessageCache(tmp_path / "messages.sqlite3")
+
+    first = client.get_messages(["a", "b", "gone"], fields=MESSAGE_MAIL_FIELDS)
+    second = client.get_messages(["b", "c", "a"], fields=MESSAGE_CONTENT_FIELDS)
+
+    assert client._service.batch_sizes == [3, 1]
+    assert [r["id"] for r in first[:2]] == ["a", "b"]
+    assert [r["id"] for r in second] == ["b", "c", "a"]
+    # Metadata requests never use the cache.
+    client.get_messages(["a"], fmt="metadata")
+    assert client._service.batch_sizes == [3, 1, 1]
+
+
+def test_message_cache_hits_refetch_labels(tmp_path: Path) -> None:
+    client, _messages = _client_with_pages([])
+    client._message_cache = MessageCache(tmp_path / "messages.sqlite3")
+    labels = {"a": ["INBOX"], "b": ["INBOX"]}
+    calls: list[tuple[list[str], str, str | None]] = []
+
+    def fetch(ids: Any, fmt: str, _headers: Any, fields: str | None, _size: int) -> list[Any]:
+        if ids:
+            calls.append((list(ids), fmt, fields))
+        return [
+            {"id": mid, "labelIds": list(labels[mid])} if mid in labels else KeyError(mid)
+            for mid in ids
+        ]
+
+    client._fetch_messages = fetch  # type: ignore[method-assign]
+    client.get_messages(["a", "b"], fields=MESSAGE_MAIL_FIELDS)
+    labels["a"] = ["Newsletter"]
+    del labels["b"]
+
+    results = client.get_messages(["a", "b"], fields=MESSAGE_MAIL_FIELDS)
+
+    assert calls[1] == (["a", "b"], "minimal", MESSAGE_LABELS_FIELDS)
+    assert results[0]["labelIds"] == ["Newsletter"]
+    # Deleted since it was cached: the refresh reports it like a fresh fetch would.
+    assert isinstance(results[1], KeyError)
+    # Content-only requests need no labels, so they stay free.
+    client.get_messages(["a"], fields=MESSAGE_CONTENT_FIELDS)
+    assert len(calls) == 2
+
+
+def _added(mid: str, *labels: str) -> dict[str, Any]:
+    return {"message": {"id": mid, "labelIds": list(labels)}}
+
+
+def test_iter_history_message_ids_dedupes_and_skips_drafts() -> None:
+    client, _messages = _client_with_pages(
+        [],
+        history_pages=[
+            {
+                "history": [
+                    {"messagesAdded": [_added("a", "INBOX"), _added("d", "DRAFT")]},
+                    {"messagesAdded": [_added("a", "INBOX")]},
+                ],
+                "nextPageToken": "p2",
+            },
+            {"history": [{"messagesAdded": [_added("b", "INBOX")]}, {"labelsAdded": []}]},
+        ],
+    )
+
+    assert list(client.iter_history_message_ids("100")) == ["a", "b"]
+    assert client._service.history().calls[1]["pageToken"] == "p2"
+
+
+def test_iter_history_message_ids_raises_when_cursor_expired() -> None:
+    client, _messages = _client_with_pages([], history_pages=None)
+
+    with pytest.raises(HistoryExpiredError):
+        list(client.iter_history_message_ids("1"))
+
+
+class _FakeLabels:
+    def __init__(self, existing: list[dict[str, Any]]) -> None:
+        self.existing = existing
+        self.calls: list[str] = []
+
+    def list(self, **_params: Any) -> _Request:
+        self.calls.append("list")
+        return _Request({"labels": self.existing})
+
+    def create(self, body: dict[str, Any], **_params: Any) -> _Request:
+        self.calls.append(f"create:{body['name']}")
+        return _Request({"id": f"new-{body['name']}"})
+
+    def patch(self, id: str, **_params: Any) -> _Request:
+        self.calls.append(f"patch:{id}")
+        return _Request({})
+
+
+class _ModifyRequest:
+    def __init__(self, body: dict[str, Any], valid_ids: set[str]) -> None:
+        self._body = body
+        self._valid_ids = valid_ids
+
+    def execute(self) -> dict[str, Any]:
+        if not set(self._body.get("addLabelIds", [])) <= self._valid_ids:
+            raise HttpError(httplib2.Response({"status": 400}), b"Invalid label")
+        return {}
+
+
+class _ModifyMessages:
+    def __init__(self, valid_ids: set[str]) -> None:
+        self.valid_ids = valid_ids
+        self.bodies: list[dict[str, Any]] = []
+
+    def modify(self, body: dict[str, Any], **_params: Any) -> _ModifyRequest:
+        self.bodies.append(body)
+        return _ModifyRequest(body, self.valid_ids)
+
+
+class _LabelService:
+    def __init__(self, labels: _FakeLabels, messages: _ModifyMessages | None = None) -> None:
+        self._labels = labels
+        self._messages = messages
+
+    def users(self) -> "_LabelService":
+        return self
+
+    def labels(self) -> _FakeLabels:
+        return self._labels
+
+    def messages(self) -> _ModifyMessages | None:
+        return self._messages
+
+
+def _label_client(tmp_path: Path, existing: list[dict[str, Any]]) -> tuple[GmailClient, _FakeLabels]:
+    cfg = GmailClientConfig(
+        credentials_path=Path("c"),
+        token_path=Path("t"),
+        label_registry_path=tmp_path / "labels.json",
+        quota_units_per_second=None,
+    )
+    client = GmailClient(cfg)
+    labels = _FakeLabels(existing)
+    client._service = _LabelService(labels)
+    return client, labels
+
+
+def test_reconcile_labels_patches_only_differing_colors_and_caches(tmp_path: Path) -> None:
+    colors = {name: dict(color) for name, color in LABEL_COLORS.items()}
+    existing = [
+        {"id": f"id-{name}", "name": name, "color": color}
+        for name, color in colors.items()
+        if name != "Security"
+    ]
+    existing.append({"id": "id-Security", "name": "Security", "color": {"backgroundColor": "#000000"}})
+    client, labels = _label_client(tmp_path, existing)
+
+    client.reconcile_labels(["Applications/Interview"])
+    for _ in range(3):
+        assert client.get_or_create_label_id("Security") == "id-Security"
+
+    assert labels.calls == ["list", "create:Applications/Interview", "patch:id-Security"]
+
+    # A second connection reuses the persisted registry: no API calls at all.
+    second, second_labels = _label_client(tmp_path, existing)
+    second.reconcile_labels(["Applications/Interview"])
+    assert second.get_or_create_label_id("Applications/Interview") == "new-Applications/Interview"
+    assert second_labels.calls == []
+
+
+def test_modify_reloads_a_stale_label_registry_once(tmp_path: Path) -> None:
+    # "Newsletter" was deleted and recreated in Gmail after the registry was persisted.
+    client, labels = _label_client(tmp_path, [{"id": "id2-Newsletter", "name": "Newsletter"}])
+    messages = _ModifyMessages({"id2-Newsletter"})
+    client._service = _LabelService(labels, messages)
+    client._labels = LabelRegistry(ids={"Newsletter": "id-Newsletter"}, complete=True)
+
+    client.add_label("m1", "Newsletter")
+
+    assert [body["addLabelIds"] for body in messages.bodies] == [
+        ["id-Newsletter"],
+        ["id2-Newsletter"],
+    ]
+    assert labels.calls == ["list"]
+    # The reloaded registry replaced the persisted one in a single atomic write.
+    saved = json.loads((tmp_path / "labels.json").read_text(encoding="utf-8"))
+    assert saved["ids"] == {"Newsletter": "id2-Newsletter"}
+    assert [path.name for path in tmp_path.iterdir()] == ["labels.json"]
+
+    # Rejected although the registry is current: no second retry.
+    messages.valid_ids.clear()
+    with pytest.raises(HttpError):
+        client.add_label("m1", "Newsletter")
+    assert len(messages.bodies) == 3
+    assert labels.calls == ["list", "list"]
+
+
+def _write_token(path: Path, expires_in: timedelta) -> None:
+    expiry = datetime.now(timezone.utc).replace(tzinfo=None) + expires_in
+    path.write_text(
+        json.dumps(
+            {
+                "token": "access",
+                "refresh_token": "refresh",
+                "client_id": "id",
+                "client_secret": "secret",
+                "expiry": expiry.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            }
+        ),
+        encoding="utf-8",
+    )
+
+
+def test_load_credentials_refreshes_only_near_expiry(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(client_module, "_credentials_cache", {})
+    refreshed: list[str] = []
+
+    def fake_refresh(creds: Credentials, _request: Any) -> None:
+        refreshed.append(creds.token)
+        creds.token = "fresh"
+        creds.expiry = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(hours=1)
+
+    monkeypatch.setattr(Credentials, "refresh", fake_refresh)
+    cfg = GmailClientConfig(credentials_path=tmp_path / "c.json", token_path=tmp_path / "t.json")
+
+    _write_token(cfg.token_path, timedelta(hours=1))
+    first = load_credentials(cfg)
+    # The second connect reuses the in-memory credentials without touching the file.
+    cfg.token_path.unlink()
+    assert load_credentials(cfg) is first
+    assert refreshed == []
+
+    monkeypatch.setattr(client_module, "_credentials_cache", {})
+    _write_token(cfg.token_path, timedelta(minutes=2))
+    creds = load_credentials(cfg)
+    assert refreshed == ["access"]
+    assert creds.token == "fresh"
+    assert json.loads(cfg.token_path.read_text(encoding="utf-8"))["token"] == "fresh"
@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+from inbox_copilot.gmail.rate_limit import QuotaRateLimiter
+
+
+class _FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+        self.sleeps: list[float] = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_limiter_charges_method_costs_and_throttles_over_budget() -> None:
+    clock = _FakeClock()
+    limiter = QuotaRateLimiter(100, clock=clock, sleep=clock.sleep)
+
+    limiter.acquire("messages.get", 20)  # 100 units: exactly the burst
+    assert clock.sleeps == []
+
+    limiter.acquire("messages.batchModify")  # 50 units of debt -> wait 0.5s
+    assert clock.sleeps == [0.5]
+
+    usage = limiter.snapshot()
+    assert usage["units_used"] == 150
+    assert usage["calls"] == 21
+    assert usage["throttled_s"] == 0.5
+
+
+def test_limiter_refills_over_time() -> None:
+    clock = _FakeClock()
+    limiter = QuotaRateLimiter(10, clock=clock, sleep=clock.sleep)
+
+    limiter.acquire("messages.list", 2)
+    clock.now += 1.0
+    limiter.acquire("messages.list", 2)
+
+    assert clock.sleeps == []
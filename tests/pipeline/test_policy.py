@@ -1,8 +1,8 @@
 from __future__ import annotations
 
 from inbox_copilot.models import EmailAnalysis
-from inbox_copilot.pipeline.policy import actions_from_analysis
-from inbox_copilot.rules.core import ActionType
+from inbox_copilot.pipeline.policy import actions_from_analysis, drop_satisfied_actions
+from inbox_copilot.rules.core import Action, ActionType
 
 
 def test_actions_from_analysis_prefers_most_specific_labels() -> None:
@@ -30,3 +30,26 @@ def test_actions_from_analysis_prefers_most_specific_labels() -> None:
     assert "Applications/Interview" in added_labels
     assert "Interview/Application" in added_labels
     assert len(added_labels) == 2
+
+
+def test_drop_satisfied_actions_keeps_only_real_changes() -> None:
+    label_ids = {"Security": "Label_1", "Newsletter": "Label_2", "Old": "Label_3"}
+    actions = [
+        Action(type=ActionType.ADD_LABEL, message_id="m", label_name="Security"),
+        Action(type=ActionType.ADD_LABEL, message_id="m", label_name="Newsletter"),
+        Action(type=ActionType.ADD_LABEL, message_id="m", label_name="Unknown"),
+        Action(type=ActionType.REMOVE_LABEL, message_id="m", label_name="Old"),
+        Action(type=ActionType.REMOVE_LABEL, message_id="m", label_name="Security"),
+        Action(type=ActionType.ARCHIVE, message_id="m"),
+        Action(type=ActionType.ANALYZE_APPLICATION, message_id="m"),
+    ]
+
+    planned = drop_satisfied_actions(actions, ["Label_1", "UNREAD"], label_ids.get)
+
+    assert [(a.type, a.label_name) for a in planned] == [
+        (ActionType.ADD_LABEL, "Newsletter"),
+        # Unresolvable labels are kept: their state cannot be checked.
+        (ActionType.ADD_LABEL, "Unknown"),
+        (ActionType.REMOVE_LABEL, "Security"),
+        (ActionType.ANALYZE_APPLICATION, None),
+    ]
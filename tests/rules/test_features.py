@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+from inbox_copilot.rules.core import MailFeatures, MailItem
+from inbox_copilot.rules.rules import NewsletterRule
+
+
+def test_features_normalize_once_and_are_shared_by_rule_helpers() -> None:
+    item = MailItem(
+        id="m1",
+        thread_id=None,
+        headers={"Subject": "Weekly DIGEST", "From": "News <News@Mailer.Example.COM>"},
+        snippet="Click here to Unsubscribe.",
+        internal_date_ms=0,
+    )
+    features = MailFeatures.from_mail(item)
+
+    assert MailFeatures.from_mail(features) is features
+    assert features.subject == "weekly digest"
+    assert features.sender_domain == "mailer.example.com"
+    assert features.haystack == (
+        "weekly digest\nnews <news@mailer.example.com>\nclick here to unsubscribe."
+    )
+    assert {"weekly", "unsubscribe", "mailer"} <= features.tokens
+
+    rule = NewsletterRule()
+    assert rule.subject(features) is features.subject
+    assert rule.match(features) == rule.match(item) == (True, "NEWSLETTER")
@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+from inbox_copilot.rules.matcher import PhraseMatcher
+from inbox_copilot.rules.rules import JobAlertRule
+from inbox_copilot.rules.core import MailItem
+
+
+def test_scan_reports_every_table_hit_including_overlaps() -> None:
+    matcher = PhraseMatcher(
+        {
+            "rejection": ("wir bedauern", "bedauern"),
+            "recruiting": ("hr", "bewerbung"),
+            "ats": ("greenhouse",),
+            "confirm": ("Thank You For Applying",),
+        }
+    )
+
+    # "bedauern" sits inside "wir bedauern"; "hr" inside "ihre" is a plain substring hit.
+    assert matcher.scan("leider bedauern wir ihre bewerbung") == {"rejection", "recruiting"}
+    assert matcher.scan("thank you for applying via greenhouse") == {"confirm", "ats"}
+    assert matcher.scan("nothing relevant") == frozenset()
+    assert matcher.search("greenhouses")
+    assert not matcher.search("green house")
+
+
+def test_job_rule_reads_table_hits_from_one_scan() -> None:
+    mail = MailItem(
+        id="m1",
+        thread_id=None,
+        headers={"Subject": "Ihre Bewerbung", "From": "jobs@example.com"},
+        snippet="Leider müssen wir Ihnen mitteilen, dass wir bedauerlicherweise absagen.",
+        internal_date_ms=0,
+    )
+
+    assert JobAlertRule().match(mail) == (True, JobAlertRule.REJECT_REASON)
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import threading
+
+import pytest
+
+from inbox_copilot.rules.patterns import PatternRegistry
+from inbox_copilot.rules.rules import JobAlertRule
+
+
+def test_registry_compiles_once_and_counts_per_pattern() -> None:
+    registry = PatternRegistry()
+    word = registry.register("word", r"\bunsubscribe\b")
+
+    assert registry.register("word", r"\bunsubscribe\b") is word
+    assert registry.for_source(r"\bnewsletter\b") is registry.for_source(r"\bnewsletter\b")
+    with pytest.raises(ValueError):
+        registry.register("word", r"\babbestellen\b")
+
+    assert word.search("Click UNSUBSCRIBE here")
+    assert not word.search("subscribe")
+    stats = registry.snapshot()
+    assert (stats["word"]["calls"], stats["word"]["hits"]) == (2, 1)
+
+
+def test_counters_are_per_thread_and_timing_is_opt_in() -> None:
+    registry = PatternRegistry()
+    word = registry.register("word", r"\bunsubscribe\b")
+
+    threads = [
+        threading.Thread(target=lambda text=text: [word.search(text) for _ in range(100)])
+        for text in ("unsubscribe", "subscribe")
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert registry.snapshot()["word"] == {"calls": 200, "hits": 100, "time_s": 0.0}
+
+    registry.set_timed(True)
+    word.search("unsubscribe " * 1000)
+    assert registry.snapshot()["word"]["time_s"] > 0
+
+
+def test_snapshot_since_reports_only_the_difference() -> None:
+    registry = PatternRegistry()
+    word = registry.register("word", r"\bunsubscribe\b")
+    registry.register("idle", r"\bidle\b")
+    word.search("unsubscribe")
+    word.search("subscribe")
+
+    start = registry.snapshot()
+    word.search("unsubscribe")
+
+    # Earlier calls are not counted again, and patterns not searched since are left out.
+    assert registry.snapshot(since=start) == {"word": {"calls": 1, "hits": 1, "time_s": 0.0}}
+    assert registry.snapshot()["word"]["calls"] == 3
+
+
+def test_ad_hoc_patterns_are_bounded() -> None:
+    registry = PatternRegistry(max_ad_hoc=2)
+    registry.register("named", "n")
+    first = registry.for_source("a")
+    registry.for_source("b")
+    assert registry.for_source("a") is first
+    registry.for_source("c")
+
+    # "b" was least recently used; named patterns are never evicted.
+    assert set(registry.snapshot()) == {"named", "a", "c"}
+    assert registry.for_source("a") is first
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "vielen dank, ihre bewerbung ist da",
+        "ihre bewerbung: wir bedanken uns",
+        "we have received your application",
+        "your application was received",
+    ],
+)
+def test_fused_confirm_fallback_covers_every_alternative(text: str) -> None:
+    assert JobAlertRule.CONFIRM_FALLBACK_PATTERN.search(text)
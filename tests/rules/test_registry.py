@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+from typing import Iterable
+
+from inbox_copilot.rules.BaseRule import BaseRule
+from inbox_copilot.models import NormalizedEmail
+from inbox_copilot.pipeline.orchestrator import analyze_email
+from inbox_copilot.pipeline.policy import actions_from_analysis
+from inbox_copilot.rules.classification import (
+    RULES_VERSION,
+    classify_email,
+    emitted_labels,
+    rules_version,
+)
+from inbox_copilot.rules.core import Action, ActionType, MailItem
+from inbox_copilot.rules.registry import RULE_REGISTRY, RuleRegistry, default_rules
+
+
+class _Always(BaseRule):
+    def __init__(self, name: str, priority: int, stop: bool = False) -> None:
+        self.name = name
+        self.priority = priority
+        self.stop_processing = stop
+
+    def match(self, mail: MailItem) -> tuple[bool, str]:
+        return True, self.name.upper()
+
+    def actions(self, mail: MailItem, reason: str) -> Iterable[Action]:
+        return ()
+
+
+def _mail() -> MailItem:
+    return MailItem(id="m", thread_id=None, headers={}, snippet="", internal_date_ms=0)
+
+
+def test_order_is_resolved_at_registration_and_honors_stop_processing() -> None:
+    registry = RuleRegistry([_Always("low", 1), _Always("high", 9), _Always("mid", 5, stop=True)])
+
+    assert [rule.name for rule in registry.order] == ["high", "mid", "low"]
+    assert registry.classify(_mail())[1] == "HIGH"
+    assert [rule.name for rule, _ in registry.matches(_mail())] == ["high", "mid"]
+
+    registry.register(_Always("high", 0))
+    assert [rule.name for rule in registry.order] == ["mid", "low", "high"]
+    registry.unregister("mid")
+    assert [rule.name for rule in registry.order] == ["low", "high"]
+
+
+def test_classify_email_uses_a_swapped_rule_set() -> None:
+    registry = RuleRegistry(default_rules())
+    mail = {"subject": "Weekly digest", "from_email": "news@example.com", "body_text": ""}
+    assert classify_email(**mail, registry=registry).category == "newsletter"
+
+    registry.replace([])
+    assert classify_email(**mail, registry=registry).category == "no_fit"
+
+
+def test_rules_version_follows_the_registered_rules() -> None:
+    registry = RuleRegistry(default_rules())
+    version = rules_version(registry)
+    assert version.startswith(f"{RULES_VERSION}.")
+    assert rules_version(RuleRegistry(default_rules())) == version
+
+    registry.register(_Always("low", 1))
+    swapped = rules_version(registry)
+    assert swapped != version
+    registry.register(_Always("low", 2))
+    assert rules_version(registry) not in (version, swapped)
+    registry.unregister("low")
+    assert rules_version(registry) == version
+
+
+class _InvoiceRule(BaseRule):
+    name = "invoice"
+    priority = 200
+    category = "finance"
+    labels = ("Finance/Invoices",)
+    confidence = 0.8
+
+    def match(self, mail: MailItem) -> tuple[bool, str]:
+        return self.contains_any(self.subject(mail), ["invoice"]), "INVOICE"
+
+    def actions(self, mail: MailItem, reason: str) -> Iterable[Action]:
+        return ()
+
+
+def test_a_registered_rule_supplies_its_own_result() -> None:
+    mail = NormalizedEmail(
+        message_id="m1",
+        subject="Your invoice",
+        from_email="billing@example.com",
+        snippet="",
+        body_text="",
+        internal_date_ms=0,
+    )
+    assert "Finance/Invoices" not in emitted_labels()
+
+    RULE_REGISTRY.register(_InvoiceRule())
+    try:
+        analysis = analyze_email(mail)
+        actions = actions_from_analysis(analysis, message_id="m1")
+        assert "Finance/Invoices" in emitted_labels()
+    finally:
+        RULE_REGISTRY.unregister("invoice")
+
+    assert (analysis.category, analysis.confidence) == ("finance", 0.8)
+    assert analysis.notes[0] == "Matched rule: invoice"
+    assert [(a.type, a.label_name) for a in actions] == [
+        (ActionType.ADD_LABEL, "Finance/Invoices")
+    ]
+    assert "Finance/Invoices" not in emitted_labels()
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import sqlite3
+from pathlib import Path
+
+from inbox_copilot.storage.ledger import (
+    MAX_FAILED_ATTEMPTS,
+    OUTCOME_DONE,
+    OUTCOME_ERROR,
+    ProcessedLedger,
+)
+
+
+def test_only_done_entries_of_the_current_rule_version_are_skipped(tmp_path: Path) -> None:
+    ledger = ProcessedLedger(tmp_path / "processed.sqlite3")
+    ledger.record_many([("a", OUTCOME_DONE), ("b", OUTCOME_ERROR), ("c", OUTCOME_DONE)], "1")
+
+    assert list(ledger.unprocessed(iter(["d", "c", "b", "a"]), "1")) == ["d", "b"]
+    assert list(ledger.unprocessed(["a", "c"], "2")) == ["a", "c"]
+    assert ledger.is_processed("a", "1")
+    assert not ledger.is_processed("b", "1")
+
+    # A later success replaces the error entry, and entries survive reopening.
+    ledger.record_many([("b", OUTCOME_DONE)], "1")
+    ledger.close()
+    reopened = ProcessedLedger(tmp_path / "processed.sqlite3")
+    assert list(reopened.unprocessed(["a", "b", "c"], "1")) == []
+    assert reopened.stats() == {"skipped": 3, "recorded": 0, "entries": 3}
+
+
+def test_failed_ids_lists_only_latest_errors(tmp_path: Path) -> None:
+    ledger = ProcessedLedger(tmp_path / "processed.sqlite3")
+    ledger.record_many([("a", OUTCOME_ERROR), ("b", OUTCOME_ERROR), ("c", OUTCOME_DONE)], "1")
+    ledger.record_many([("a", OUTCOME_DONE)], "1")
+
+    assert ledger.failed_ids() == ["b"]
+
+
+def test_failed_ids_give_up_after_max_attempts_in_a_row(tmp_path: Path) -> None:
+    ledger = ProcessedLedger(tmp_path / "processed.sqlite3")
+    for _ in range(MAX_FAILED_ATTEMPTS - 1):
+        ledger.record_many([("a", OUTCOME_ERROR), ("b", OUTCOME_ERROR)], "1")
+    # A success in between starts b's count over.
+    ledger.record_many([("b", OUTCOME_DONE)], "1")
+    ledger.record_many([("a", OUTCOME_ERROR), ("b", OUTCOME_ERROR)], "1")
+
+    assert ledger.failed_ids() == ["b"]
+    assert ledger.failed_ids(max_attempts=MAX_FAILED_ATTEMPTS + 1) == ["a", "b"]
+    # Given-up IDs are still not done, so they are handled again whenever they are listed.
+    assert list(ledger.unprocessed(["a"], "1")) == ["a"]
+
+
+def test_ledgers_without_failure_counts_are_migrated(tmp_path: Path) -> None:
+    path = tmp_path / "processed.sqlite3"
+    db = sqlite3.connect(str(path))
+    db.execute(
+        "CREATE TABLE processed (message_id TEXT PRIMARY KEY, outcome TEXT NOT NULL, "
+        "rule_version TEXT NOT NULL, processed_at INTEGER NOT NULL) WITHOUT ROWID"
+    )
+    db.execute("INSERT INTO processed VALUES ('a', 'error', '1', 0)")
+    db.commit()
+    db.close()
+
+    ledger = ProcessedLedger(path)
+    ledger.record_many([("a", OUTCOME_ERROR)], "1")
+    assert ledger.failed_ids() == ["a"]
+    assert ledger.failed_ids(max_attempts=1) == []
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from inbox_copilot.gmail.fields import MESSAGE_CONTENT_FIELDS, MESSAGE_MAIL_FIELDS
+from inbox_copilot.storage.message_cache import MessageCache
+
+
+def _resource(mid: str, body: str = "hello") -> dict:
+    return {"id": mid, "snippet": body, "payload": {"body": {"data": body * 50}}}
+
+
+def test_round_trip_respects_field_masks(tmp_path: Path) -> None:
+    cache = MessageCache(tmp_path / "messages.sqlite3")
+    cache.put("m1", _resource("m1"), MESSAGE_MAIL_FIELDS)
+
+    # A mail-mask entry also answers content-only requests, but not whole-resource ones.
+    assert cache.get("m1", MESSAGE_MAIL_FIELDS) == _resource("m1")
+    assert cache.get("m1", MESSAGE_CONTENT_FIELDS) == _resource("m1")
+    assert cache.get("m1", None) is None
+    assert cache.get("missing", MESSAGE_MAIL_FIELDS) is None
+
+    # Entries survive reopening the database.
+    cache.close()
+    reopened = MessageCache(tmp_path / "messages.sqlite3")
+    assert reopened.get_many(["m1", "m2"], MESSAGE_CONTENT_FIELDS) == {"m1": _resource("m1")}
+    assert reopened.stats()["hits"] == 1
+    assert reopened.stats()["misses"] == 1
+
+
+def test_evicts_least_recently_read_entries(tmp_path: Path) -> None:
+    cache = MessageCache(tmp_path / "messages.sqlite3")
+    cache.put("old", _resource("old", "a"))
+    cache.put("kept", _resource("kept", "b"))
+    entry_size = cache.stats()["bytes"] // 2
+    cache.max_bytes = int(entry_size * 2.5)
+
+    assert cache.get("old") is not None
+    assert cache.get("kept") is not None
+    assert cache.get("old") is not None
+    cache.put("new", _resource("new", "c"))
+
+    assert cache.get("kept") is None
+    assert cache.get("old") is not None
+    assert cache.get("new") is not None
+
+
+def test_mutable_fields_are_never_cached(tmp_path: Path) -> None:
+    cache = MessageCache(tmp_path / "messages.sqlite3")
+    cache.put("m1", {**_resource("m1"), "labelIds": ["INBOX"], "historyId": "9"})
+
+    assert cache.get("m1") == _resource("m1")
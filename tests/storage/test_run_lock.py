@@ -0,0 +1,20 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from inbox_copilot.storage.run_lock import RunInProgressError, RunLock, run_lock_path
+
+
+def test_second_holder_is_rejected_until_release(tmp_path: Path) -> None:
+    path = run_lock_path(tmp_path / "state.json")
+    first = RunLock(path)
+    first.acquire()
+
+    with pytest.raises(RunInProgressError, match="pid"):
+        RunLock(path).acquire()
+
+    first.release()
+    with RunLock(path):
+        pass
@@ -1,9 +1,12 @@
 from __future__ import annotations
 
 import json
+import os
 from pathlib import Path
 
-from inbox_copilot.storage.state import load_state, save_state
+import pytest
+
+from inbox_copilot.storage.state import AppState, load_state, save_state
 
 
 def test_load_state_supports_legacy_history_key(tmp_path: Path) -> None:
@@ -38,3 +41,30 @@ def test_save_state_writes_normalized_history_key(tmp_path: Path) -> None:
 
     assert payload.get("last_history_time") == "new-key-value"
     assert "last_history_TIME" not in payload
+
+
+def test_history_id_cursor_round_trips(tmp_path: Path) -> None:
+    state_path = tmp_path / "state.json"
+    state = load_state(state_path)
+    assert state.last_history_id is None
+
+    state.last_history_id = "98765"
+    save_state(state_path, state)
+
+    assert load_state(state_path).last_history_id == "98765"
+
+
+def test_save_state_is_atomic(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    state_path = tmp_path / "state.json"
+    save_state(state_path, AppState(runs=1))
+
+    def fail_replace(src: str, dst: str) -> None:
+        raise OSError("disk full")
+
+    monkeypatch.setattr(os, "replace", fail_replace)
+    with pytest.raises(OSError):
+        save_state(state_path, AppState(runs=2))
+
+    # The previous state survives and no temp file is left behind.
+    assert load_state(state_path).runs == 1
+    assert [p.name for p in tmp_path.iterdir()] == ["state.json"]
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+from inbox_copilot.retry import GMAIL_CREATE, GMAIL_READ, OPENAI, Retrier, RetryPolicy
+
+
+def _http_error(status: int, **headers: str) -> HttpError:
+    return HttpError(httplib2.Response({"status": status, **headers}), b"")
+
+
+def _flaky(failures: list[Exception]):
+    calls = {"n": 0}
+
+    def fn() -> str:
+        calls["n"] += 1
+        if failures:
+            raise failures.pop(0)
+        return "ok"
+
+    return fn, calls
+
+
+def test_retrier_backs_off_on_transient_errors_and_records_metrics() -> None:
+    sleeps: list[float] = []
+    retrier = Retrier(sleep=sleeps.append, rand=lambda: 1.0)
+    fn, calls = _flaky([_http_error(503), _http_error(429)])
+
+    assert retrier.call(GMAIL_READ, fn) == "ok"
+    assert calls["n"] == 3
+    assert sleeps == [1.0, 2.0]
+    assert retrier.snapshot() == {
+        "retries": 2,
+        "backoff_s": 3.0,
+        "by_type": {GMAIL_READ: {"retries": 2, "backoff_s": 3.0}},
+    }
+
+
+def test_retrier_honors_retry_after_header() -> None:
+    sleeps: list[float] = []
+    retrier = Retrier(sleep=sleeps.append, rand=lambda: 1.0)
+    fn, _calls = _flaky([_http_error(429, **{"retry-after": "7"})])
+
+    retrier.call(GMAIL_READ, fn)
+
+    assert sleeps == [7.0]
+
+
+def test_retrier_gives_up_after_policy_attempts_and_skips_permanent_errors() -> None:
+    retrier = Retrier({OPENAI: RetryPolicy(max_attempts=2)}, sleep=lambda _s: None)
+
+    fn, calls = _flaky([_http_error(500), _http_error(500), _http_error(500)])
+    with pytest.raises(HttpError):
+        retrier.call(OPENAI, fn)
+    assert calls["n"] == 2
+
+    fn, calls = _flaky([_http_error(400)])
+    with pytest.raises(HttpError):
+        retrier.call(GMAIL_READ, fn)
+    assert calls["n"] == 1
+
+
+def test_non_idempotent_calls_retry_only_rejections() -> None:
+    retrier = Retrier(sleep=lambda _s: None)
+
+    # A timeout or 5xx may have created the draft already: never repeat it.
+    for failure in (_http_error(503), TimeoutError()):
+        fn, calls = _flaky([failure])
+        with pytest.raises(type(failure)):
+            retrier.call(GMAIL_CREATE, fn)
+        assert calls["n"] == 1
+
+    fn, calls = _flaky([_http_error(429)])
+    assert retrier.call(GMAIL_CREATE, fn) == "ok"
+    assert calls["n"] == 2